@@ -0,0 +1,73 @@
+"""Throughput of lockfile section parsing.
+
+Run from repository root::
+
+    python benchmarks/bench_dependency.py
+
+Parses sections of project's own lock files to measure throughput,
+and sections with growing number of hashes and comments to check
+that parsing time grows linearly with section length.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from pipcompilemulti.dependency import Dependency
+from pipcompilemulti.lockfile import concatenated, parse_sections
+
+
+def lockfile_sections():
+    """Return sections of all lock files in requirements directory."""
+    sections = []
+    for path in sorted(glob.glob(os.path.join(ROOT, 'requirements', '*.*'))):
+        if path.endswith('.in'):
+            continue
+        with open(path, encoding='utf-8') as fp:
+            sections.extend(parse_sections(concatenated(fp)))
+    return sections
+
+
+def long_section(size):
+    """Section with size hashes and comment lines that is not a valid requirement."""
+    return (
+        'six==1.0' + ' --hash=sha256:abc' * size
+        + ' # via' + ' #' * size
+        + '\n    # via pkg' * size + '\n    x'
+    )
+
+
+def parse_all(sections):
+    """Parse every section once."""
+    for section in sections:
+        Dependency(section)
+
+
+def main():
+    """Print benchmark results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    sections = lockfile_sections()
+    seconds = min(timeit.repeat(
+        lambda: parse_all(sections), number=1, repeat=args.repeat,
+    ))
+    print('{0} sections in {1:.4f}s: {2:.0f} sections/s'.format(
+        len(sections), seconds, len(sections) / seconds,
+    ))
+    for size in [10, 100, 1000, 10000]:
+        section = long_section(size)
+        seconds = min(timeit.repeat(
+            lambda section=section: Dependency(section), number=1, repeat=args.repeat,
+        ))
+        print('{0:>7} chars: {1:.6f}s'.format(len(section), seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+"""End-to-end timings of locking synthetic requirement trees.
+
+Run from repository root::
+
+    python benchmarks/bench_e2e.py --envs 20 --depth 4 --fan-in 2 --packages 5 \\
+        --output results.json
+
+Generates a tree of ``--envs`` environments split into ``--depth`` layers,
+where every environment references ``--fan-in`` environments of the previous layer
+and requires ``--packages`` packages of its own.
+Packages depend on shared libraries, so referenced environments overlap
+and deduplication has work to do.
+
+All packages are generated as wheels in a local wheelhouse,
+and the resolver is pointed to it with ``PIP_FIND_LINKS`` and ``PIP_NO_INDEX``,
+so no network access is needed.
+
+Time spent in each stage is measured separately:
+
+* ``recompile`` - the rest of locking, e.g. scheduling and writing files.
+* ``discover`` - finding environments and references between them.
+* ``resolve`` - running resolver.
+* ``fix_lockfile`` - post-processing of locked files.
+* ``deduplicate`` - merging packages of referenced environments.
+* ``verify_cold`` and ``verify_warm`` - ``verify`` without and with digest cache.
+
+Nested stages are excluded from outer ones running in the same thread.
+With ``--jobs`` above 1, stages of worker threads are summed across threads,
+so they can add up to more than the wall time,
+and ``recompile`` excludes only stages that ran in the main thread,
+i.e. it's the wall time of scheduling and waiting for workers.
+Results are printed as JSON and optionally written to ``--output``.
+Pass JSON of a previous run as ``--baseline`` to print relative change of every stage.
+"""
+
+import argparse
+import contextlib
+import glob
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from pipcompilemulti import actions, verify
+from pipcompilemulti.deduplicate import PackageDeduplicator
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+class StageTimer(object):
+    """Accumulate wall time of stages, excluding time of nested stages of the same thread."""
+
+    def __init__(self):
+        self.totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def _stack(self):
+        """Time spent in nested stages of each open stage of the current thread."""
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Attribute time spent in the block to stage name."""
+        stack = self._stack
+        started = time.perf_counter()
+        stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            nested = stack.pop()
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + elapsed - nested
+            if stack:
+                stack[-1] += elapsed
+
+    def wrap(self, owner, attribute, name):
+        """Time every call of owner.attribute as stage name."""
+        original = getattr(owner, attribute)
+
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attribute, timed)
+
+
+def make_wheel(wheelhouse, name, version, requires):
+    """Write minimal pure Python wheel."""
+    dist = name.replace('-', '_')
+    info = '{0}-{1}.dist-info'.format(dist, version)
+    files = {
+        dist + '.py': '',
+        info + '/METADATA': ''.join(
+            ['Metadata-Version: 2.1\nName: {0}\nVersion: {1}\n'.format(name, version)]
+            + ['Requires-Dist: {0}\n'.format(req) for req in requires]
+        ),
+        info + '/WHEEL': (
+            'Wheel-Version: 1.0\nGenerator: bench_e2e\n'
+            'Root-Is-Purelib: true\nTag: py3-none-any\n'
+        ),
+    }
+    files[info + '/RECORD'] = ''.join(
+        '{0},,\n'.format(path) for path in list(files) + [info + '/RECORD']
+    )
+    path = os.path.join(wheelhouse, '{0}-{1}-py3-none-any.whl'.format(dist, version))
+    with zipfile.ZipFile(path, 'w') as archive:
+        for arcname, content in files.items():
+            archive.writestr(arcname, content)
+
+
+def make_libraries(wheelhouse, count):
+    """Write wheels of shared libraries, each depending on the next one."""
+    libraries = ['synth-lib-{0}'.format(index) for index in range(count)]
+    for index, library in enumerate(libraries):
+        make_wheel(wheelhouse, library, '1.0', libraries[index + 1:index + 2])
+    return libraries
+
+
+def make_tree(directory, wheelhouse, shape):
+    """Generate requirements directory and wheelhouse for it.
+
+    Shape has envs, depth, fan_in, packages and seed attributes.
+    """
+    rng = random.Random(shape.seed)
+    libraries = make_libraries(wheelhouse, max(2, shape.packages * 2))
+    layers = [[] for _ in range(shape.depth)]
+    for index in range(shape.envs):
+        layers[index * shape.depth // shape.envs].append('env{0}'.format(index))
+    for level, layer in enumerate(layers):
+        for env in layer:
+            refs = []
+            if level:
+                refs = rng.sample(layers[level - 1], min(shape.fan_in, len(layers[level - 1])))
+            names = ['synth-{0}-{1}'.format(env, index) for index in range(shape.packages)]
+            for name in names:
+                make_wheel(wheelhouse, name, '1.0', rng.sample(libraries, 2))
+            with open(os.path.join(directory, env + '.in'), 'wt', encoding='utf-8') as fp:
+                fp.write(''.join('-r {0}.in\n'.format(ref) for ref in sorted(refs)))
+                fp.write(''.join(name + '\n' for name in names))
+
+
+def measure_recompile(directory, timer):
+    """Lock all environments, timing resolution, post-processing and deduplication."""
+    timer.wrap(Environment, '_resolve', 'resolve')
+    timer.wrap(Environment, 'fix_lockfile', 'fix_lockfile')
+    timer.wrap(PackageDeduplicator, 'ignored_packages', 'deduplicate')
+    timer.wrap(PackageDeduplicator, 'register_packages_for_env', 'deduplicate')
+    timer.wrap(actions, 'discover', 'discover')
+    with timer.stage('recompile'):
+        actions.recompile()
+    assert len(glob.glob(os.path.join(directory, '*.txt'))) == len(
+        glob.glob(os.path.join(directory, '*.in'))
+    )
+
+
+def measure_verify(directory, timer):
+    """Verify locked files without and with digest cache."""
+    # Digest cache skips files modified just now:
+    past = time.time() - 60
+    for path in glob.glob(os.path.join(directory, '*')):
+        os.utime(path, (past, past))
+    for stage in ['verify_cold', 'verify_warm']:
+        with timer.stage(stage):
+            assert verify.verify_environments()
+
+
+def git_revision():
+    """Return current commit of the repository or None."""
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, baseline):
+    """Print relative change of every stage compared to baseline."""
+    for stage, seconds in sorted(result['timings'].items()):
+        before = baseline['timings'].get(stage)
+        if before:
+            print('{0:>14}: {1:8.3f}s -> {2:8.3f}s ({3:+.0%})'.format(
+                stage, before, seconds, seconds / before - 1,
+            ))
+
+
+def main():
+    """Generate tree, lock it and print timings."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--envs', type=int, default=12)
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--fan-in', type=int, default=2)
+    parser.add_argument('--packages', type=int, default=3)
+    parser.add_argument('--jobs', type=int, default=1)
+    parser.add_argument('--in-process', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output')
+    parser.add_argument('--baseline')
+    parser.add_argument('--workdir', help='Keep generated files in this empty directory')
+    args = parser.parse_args()
+    workdir = args.workdir or tempfile.mkdtemp(prefix='pcm-bench-')
+    directory = os.path.join(workdir, 'requirements')
+    wheelhouse = os.path.join(workdir, 'wheelhouse')
+    os.makedirs(directory)
+    os.makedirs(wheelhouse)
+    try:
+        make_tree(directory, wheelhouse, args)
+        os.environ.update({
+            'PIP_FIND_LINKS': wheelhouse,
+            'PIP_NO_INDEX': '1',
+            'XDG_CACHE_HOME': os.path.join(workdir, 'cache'),
+        })
+        OPTIONS.update({
+            FEATURES.base_dir.OPTION_NAME: directory,
+            FEATURES.lock_cache.OPTION_NAME: False,
+            FEATURES.jobs.OPTION_NAME: args.jobs,
+            FEATURES.in_process.OPTION_NAME: args.in_process,
+        })
+        timer = StageTimer()
+        measure_recompile(directory, timer)
+        measure_verify(directory, timer)
+        result = {
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'parameters': vars(args),
+            'timings': timer.totals,
+        }
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    serialized = json.dumps(result, indent=2, sort_keys=True)
+    print(serialized)
+    if args.output:
+        with open(args.output, 'wt', encoding='utf-8') as fp:
+            fp.write(serialized + '\n')
+    if args.baseline:
+        with open(args.baseline, 'rt', encoding='utf-8') as fp:
+            compare(result, json.load(fp))
+
+
+if __name__ == '__main__':
+    main()
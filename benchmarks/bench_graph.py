@@ -0,0 +1,92 @@
+"""Cost of reference graph queries on large synthetic environment sets.
+
+Run from repository root::
+
+    python benchmarks/bench_graph.py
+
+Builds forests of environments where every environment references
+a few earlier ones in the same tree, and times hash propagation
+(reference cluster of every environment) with edge scanning
+that was used before and with union-find in EnvGraph.
+"""
+
+import argparse
+import os
+import random
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from pipcompilemulti.graph import EnvGraph
+from pipcompilemulti.utils import fix_reference_path
+
+
+def synthetic_envs(size, trees=10, seed=0):
+    """Return size environment configurations split into trees."""
+    rng = random.Random(seed)
+    envs = []
+    for index in range(size):
+        earlier = range(index % trees, index, trees)
+        refs = rng.sample(earlier, min(len(earlier), 3))
+        envs.append({
+            'in_path': 'env{0}.in'.format(index),
+            'refs': {'env{0}.in'.format(ref) for ref in refs},
+        })
+    return envs
+
+
+def scanning_cluster(envs, in_path):
+    """Edge scanning reference cluster as it was before EnvGraph."""
+    edges = [
+        set([env['in_path'], fix_reference_path(env['in_path'], ref)])
+        for env in envs
+        for ref in env['refs']
+    ]
+    prev, cluster = set(), set([in_path])
+    while prev != cluster:
+        prev = set(cluster)
+        to_visit = []
+        for edge in edges:
+            if cluster & edge:
+                cluster |= edge
+            else:
+                to_visit.append(edge)
+        edges = to_visit
+    return cluster
+
+
+def scanning_all(envs):
+    """Propagate hashes from every environment with edge scanning."""
+    return [scanning_cluster(envs, env['in_path']) for env in envs]
+
+
+def graph_all(envs):
+    """Propagate hashes from every environment with EnvGraph."""
+    graph = EnvGraph(envs)
+    return [graph.cluster(env['in_path']) for env in envs]
+
+
+def main():
+    """Print benchmark results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 300, 1000])
+    args = parser.parse_args()
+    print('{0:>7} {1:>12} {2:>12}'.format('envs', 'scanning', 'union-find'))
+    for size in args.sizes:
+        envs = synthetic_envs(size)
+        assert [set(c) for c in graph_all(envs)] == scanning_all(envs)
+        timings = [
+            min(timeit.repeat(
+                lambda func=func, envs=envs: func(envs), number=1, repeat=args.repeat,
+            ))
+            for func in [scanning_all, graph_all]
+        ]
+        print('{0:>7} {1:>11.4f}s {2:>11.4f}s'.format(size, *timings))
+
+
+if __name__ == '__main__':
+    main()
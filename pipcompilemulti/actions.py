@@ -2,12 +2,15 @@
 """High level actions to be called from CLI"""
 
 import logging
+import functools
 
 from .discover import discover
 from .environment import Environment
-from .verify import generate_robust_hash_comment
+from .digest import DigestCache, generate_robust_hash_comment
 from .features import FEATURES
 from .deduplicate import PackageDeduplicator
+from .resolver import RUNNING
+from .scheduler import run_topologically
 
 
 logger = logging.getLogger("pip-compile-multi")
@@ -15,28 +18,89 @@ logger = logging.getLogger("pip-compile-multi")
 
 def recompile():
     """Compile requirements files for all environments."""
-    env_confs = FEATURES.on_discover(
-        discover(FEATURES.compose_input_file_path('*'))
-    )
+    try:
+        with FEATURES.trace.span('recompile'):
+            _recompile()
+    finally:
+        FEATURES.trace.save()
+        FEATURES.resolver_stats.report()
+
+
+def _recompile():
+    with FEATURES.trace.span('discover'):
+        cache = DigestCache()
+        env_confs = discover(FEATURES.compose_input_file_paths('*'), cache)
+        cache.save()
+    env_confs = FEATURES.on_discover(env_confs)
+    with FEATURES.trace.span('preflight'):
+        FEATURES.preflight.check(env_confs)
     deduplicator = PackageDeduplicator()
     deduplicator.on_discover(env_confs)
-    sink_in_path = FEATURES.sink_in_path()
-    if sink_in_path:
-        sink_env = Environment(in_path=sink_in_path)
-        logger.info(
-            "Creating a temporary file with all dependencies at %s",
-            sink_env.outfile,
-        )
+    sink_confs = [
+        {'in_path': sink_in_path, 'refs': set()}
+        for sink_in_path in FEATURES.sink_in_paths()
+        if FEATURES.changed.affected(sink_in_path)
+    ]
+    limiter = FEATURES.adaptive_jobs.limiter(RUNNING.pids)
+    FEATURES.resume.start()
+    # Sinks of different directories are independent:
+    run_topologically(
+        sink_confs,
+        create_sink_lockfile,
+        jobs=FEATURES.jobs.workers,
+        limiter=limiter,
+    )
+    compile_topologically(env_confs, deduplicator, limiter)
+    FEATURES.resume.finish()
+
+
+def create_sink_lockfile(conf):
+    """Compile sink environment without references to constrain other environments."""
+    sink_env = Environment(in_path=conf['in_path'])
+    logger.info(
+        "Creating a temporary file with all dependencies at %s",
+        sink_env.outfile,
+    )
+    if sink_env.resumed():
+        sink_env.fix_lockfile()
+    else:
         sink_env.create_lockfile()
-    compile_topologically(env_confs, deduplicator)
+    FEATURES.resolve_once.on_sink_locked(
+        sink_env.in_path, sink_env.resolved or sink_env.lockfile,
+    )
+    sink_env.save()
+
+
+def compile_topologically(env_confs, deduplicator, limiter=None):
+    """Compile environments in topological order of reference.
+
+    Independent environments are compiled in parallel if ``--jobs`` is above 1,
+    as long as limiter admits them.
+    When one of them fails, resolvers of the others are stopped.
+    """
+    try:
+        run_topologically(
+            env_confs,
+            functools.partial(compile_environment, deduplicator=deduplicator),
+            jobs=FEATURES.jobs.workers,
+            on_failure=RUNNING.cancel,
+            limiter=limiter,
+        )
+    finally:
+        RUNNING.reset()
 
 
-def compile_topologically(env_confs, deduplicator):
-    """Compile environments in topological order of reference."""
-    for conf in env_confs:
+def compile_environment(conf, deduplicator):
+    """Compile single environment after all its references are compiled."""
+    trace = functools.partial(FEATURES.trace.span, env=conf['in_path'])
+    with trace('compile_environment'):
         env = Environment(in_path=conf['in_path'], deduplicator=deduplicator)
         if env.maybe_create_lockfile():
-            # Only munge lockfile if it was written.
+            # Only munge lockfile if it was created.
             header_text = generate_robust_hash_comment(env.infile) + FEATURES.get_header_text()
-            env.replace_header(header_text)
-            env.add_references(conf['refs'])
+            with trace('replace_header'):
+                env.replace_header(header_text)
+            with trace('add_references'):
+                env.add_references(conf['refs'])
+        with trace('save'):
+            env.save()
@@ -4,10 +4,9 @@ import logging
 
 import click
 
-from .actions import recompile
 from .config import read_config, read_sections
+from .features import FEATURES
 from .options import OPTIONS
-from .verify import verify_environments
 
 logger = logging.getLogger("pip-compile-multi")
 DEFAULT_OPTIONS = {
@@ -16,6 +15,16 @@ DEFAULT_OPTIONS = {
     'out_ext': 'txt',
     'autoresolve': True,
 }
+# Options of lock and upgrade commands, that configuration can set too:
+RUN_FEATURES = [
+    FEATURES.changed,
+    FEATURES.trace,
+    FEATURES.resolver_stats,
+    FEATURES.log_dir,
+    FEATURES.resume,
+    FEATURES.resolve_timeout,
+    FEATURES.retries,
+]
 
 
 @click.group()
@@ -25,22 +34,52 @@ def cli():
 
 
 @cli.command()
-def lock():
+@FEATURES.changed.bind
+@FEATURES.trace.bind
+@FEATURES.resolver_stats.bind
+@FEATURES.log_dir.bind
+@FEATURES.resume.bind
+@FEATURES.resolve_timeout.bind
+@FEATURES.retries.bind
+def lock(**run_options):
     """Lock new dependencies without upgrading."""
-    run_configurations(recompile, read_config, upgrade=False)
+    from .actions import recompile  # pylint: disable=import-outside-toplevel
+    run_configurations(recompile, read_config, upgrade=False, **_run_options(run_options))
 
 
 @cli.command()
 @click.argument('packages', nargs=-1)
-def upgrade(packages):
+@FEATURES.trace.bind
+@FEATURES.resolver_stats.bind
+@FEATURES.log_dir.bind
+@FEATURES.resume.bind
+@FEATURES.resolve_timeout.bind
+@FEATURES.retries.bind
+def upgrade(packages, **run_options):
     """Upgrade locked dependency versions."""
-    run_configurations(recompile, read_config, upgrade=True, upgrade_packages=packages)
+    from .actions import recompile  # pylint: disable=import-outside-toplevel
+    run_configurations(
+        recompile, read_config, upgrade=True, upgrade_packages=packages, **_run_options(run_options)
+    )
+
+
+def _run_options(run_options):
+    """Override options only when they're passed, so that configuration can set them.
+
+    Features not bound to the command are skipped.
+    """
+    return {
+        feature.OPTION_NAME: run_options[feature.CLICK_OPTION.argument_name]
+        for feature in RUN_FEATURES
+        if run_options.get(feature.CLICK_OPTION.argument_name)
+    }
 
 
 @cli.command()
 @click.pass_context
 def verify(ctx):
     """Verify environments."""
+    from .verify import verify_environments  # pylint: disable=import-outside-toplevel
     oks = run_configurations(
         skipper(verify_environments),
         read_sections,
@@ -57,7 +96,7 @@ def skipper(func):
     @functools.wraps(func)
     def wrapped():
         """Dummy docstring to make pylint happy."""
-        key = (OPTIONS['directory'], OPTIONS['in_ext'], OPTIONS['out_ext'])
+        key = (tuple(FEATURES.base_dir.roots()), OPTIONS['in_ext'], OPTIONS['out_ext'])
         if key not in seen:
             seen[key] = func()
         return seen[key]
@@ -76,6 +115,10 @@ def run_configurations(callback, sections_reader, **overrides):
     if sections is None:
         logger.info("Configuration not found in pyproject.toml "
                     "or one of .ini files. Running with default settings")
+        for feature in RUN_FEATURES:
+            if feature.OPTION_NAME in overrides:
+                OPTIONS[feature.OPTION_NAME] = overrides[feature.OPTION_NAME]
+        from .actions import recompile  # pylint: disable=import-outside-toplevel
         recompile()
         return []
     elif sections == []:
@@ -89,7 +132,9 @@ def run_configurations(callback, sections_reader, **overrides):
         OPTIONS.update(overrides)
         logger.debug("Running configuration from section \"%s\". OPTIONS: %r",
                      section, OPTIONS)
+        FEATURES.trace.section = section
         results.append(callback())
+    FEATURES.trace.section = None
     return results
 
 
@@ -1,40 +1,86 @@
 """Remove packages included in referenced environments."""
 
 import logging
+import os
+import threading
 
-from pipcompilemulti.utils import recursive_refs, merged_packages
+from pipcompilemulti.graph import EnvGraph
+from pipcompilemulti.utils import raise_for_conflicts
 
 
 logger = logging.getLogger("pip-compile-multi")
 
 
 class PackageDeduplicator:
-    """Remove packages included in referenced environments."""
+    """Remove packages included in referenced environments.
+
+    Safe to use from multiple threads compiling independent environments.
+
+    Packages of each environment together with all its references
+    are merged once from already merged maps of direct references,
+    so that version conflicts are checked once per reference.
+    """
 
     def __init__(self):
         self.env_packages = {}
-        self.env_confs = None
+        self.graph = None
+        self._cumulative = {}
+        self._lock = threading.Lock()
 
     def on_discover(self, env_confs):
         """Save environment references."""
-        self.env_confs = env_confs
+        self.graph = EnvGraph.of(env_confs)
 
     def register_packages_for_env(self, in_path, packages):
         """Save environment packages."""
-        self.env_packages[in_path] = packages
+        with self._lock:
+            self.env_packages[in_path] = dict(packages)
+            # Merged maps of this environment and environments referencing it are stale:
+            stale = self.graph.descendants(in_path) if self.graph else self._cumulative
+            for path in [os.path.normpath(in_path)] + list(stale):
+                self._cumulative.pop(path, None)
 
     def ignored_packages(self, in_path):
         """Get package mapping from name to version for referenced environments."""
-        if self.env_confs is None:
+        if self.graph is None:
             return {}
-        rrefs = recursive_refs(self.env_confs, in_path)
-        return IgnoredPackages(merged_packages(self.env_packages, rrefs))
+        with self._lock:
+            return IgnoredPackages.merged(
+                self._cumulative_packages(ref)
+                for ref in self.graph.references(in_path)
+            )
+
+    def _cumulative_packages(self, in_path):
+        """Return packages of in_path and all environments it references.
+
+        Merged maps of references are built first, without recursion,
+        as reference chains can be long.
+        """
+        to_visit = [in_path]
+        while to_visit:
+            path = to_visit[-1]
+            if path in self._cumulative:
+                to_visit.pop()
+                continue
+            missing = [
+                ref for ref in self.graph.references(path)
+                if ref not in self._cumulative
+            ]
+            if missing:
+                to_visit.extend(missing)
+                continue
+            to_visit.pop()
+            self._cumulative[path] = IgnoredPackages.merged(
+                [self._cumulative[ref] for ref in self.graph.references(path)]
+                + [IgnoredPackages(self.env_packages[path])]
+            )
+        return self._cumulative[in_path]
 
     def recursive_refs(self, in_path):
         """Return recursive list of environment names referenced by in_path."""
-        if self.env_confs is None:
-            return {}
-        return recursive_refs(self.env_confs, in_path)
+        if self.graph is None:
+            return frozenset()
+        return self.graph.ancestors(in_path)
 
 
 class IgnoredPackages:
@@ -45,12 +91,54 @@ class IgnoredPackages:
     """
     _DELIMITERS = ('_', '-', '.')
 
-    def __init__(self, package_versions):
+    def __init__(self, package_versions, stems=None):
         self._package_versions = package_versions
-        self._stems = {
-            self._make_stem(name): name
-            for name in self._package_versions
-        }
+        if stems is None:
+            stems = {
+                self._make_stem(name): name
+                for name in self._package_versions
+            }
+        self._stems = stems
+
+    @classmethod
+    def merged(cls, parts):
+        """Return union of IgnoredPackages parts.
+
+        Raise RuntimeError if package has different versions in different parts.
+
+        >>> merged = IgnoredPackages.merged([
+        ...     IgnoredPackages({'zope.interface': '1'}),
+        ...     IgnoredPackages({'six': '1', 'zope.interface': '1'}),
+        ... ])
+        >>> merged['zope-interface'], len(merged)
+        ('1', 2)
+        """
+        parts = sorted(parts, key=len, reverse=True)
+        if not parts:
+            return cls({})
+        if len(parts) == 1:
+            return parts[0]
+        return parts[0].extended(parts[1:])
+
+    def extended(self, others):
+        """Return copy of self with packages of others added."""
+        versions = dict(self._package_versions)
+        stems = dict(self._stems)
+        errors = set()
+        for other in others:
+            for name, version in other.items():
+                known = versions.get(name)
+                if known is None:
+                    versions[name] = version
+                    stems.setdefault(self._make_stem(name), name)
+                elif known != version:
+                    errors.add((name, max(version, known), min(version, known)))
+        raise_for_conflicts(errors)
+        return IgnoredPackages(versions, stems)
+
+    def items(self):
+        """Return pairs of package name and version."""
+        return self._package_versions.items()
 
     def __getitem__(self, key):
         canonical_key = self._stems[self._make_stem(key)]
@@ -59,6 +147,9 @@ class IgnoredPackages:
     def __contains__(self, key):
         return self._make_stem(key) in self._stems
 
+    def __len__(self):
+        return len(self._package_versions)
+
     @classmethod
     def _make_stem(cls, name):
         for delim in cls._DELIMITERS:
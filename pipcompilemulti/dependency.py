@@ -3,6 +3,7 @@
 import re
 
 from .features import FEATURES
+from .tokenizer import SectionTokenizer
 
 
 class Dependency(object):  # pylint: disable=too-many-instance-attributes
@@ -44,43 +45,9 @@ class Dependency(object):  # pylint: disable=too-many-instance-attributes
 
     COMMENT_JUSTIFICATION = 26
 
-    # Example:
-    # unidecode==0.4.21         # via myapp
-    # [package]  [version]      [comment]
-    RE_DEPENDENCY = re.compile(
-        r'(?iu)(?P<package>\S+)'
-        r'=='
-        r'(?P<version>\S+)'
-        r'(?P<markers>\s+;\s+.+?)?'
-        r'(?P<hashes>(?:\s*--hash=\S+)+)?'
-        r'(?P<comment>(?:\s*#.*)+)?$'
-    )
     RE_EDITABLE_FLAG = re.compile(
         r'^-e '
     )
-    # -e git+https://github.com/ansible/docutils.git@master#egg=docutils
-    # -e "git+https://github.com/zulip/python-zulip-api.git@
-    #                 0.4.1#egg=zulip==0.4.1_git&subdirectory=zulip"
-    RE_VCS_DEPENDENCY = re.compile(
-        r'(?iu)(?P<editable>-e)?'
-        r'\s*'
-        r'(?P<prefix>\S+#egg=)'
-        r'(?P<package>[a-z0-9-_.]+)'
-        r'(?P<postfix>\S*)'
-        r'(?P<markers>\s+;\s+.+?)?'
-        r'(?P<comment>(?:\s*#.*)+)?$'
-    )
-    # New format, replacing old VCS dependency:
-    # docutils @ git+https://github.com/ansible/docutils.git@master
-    RE_AT_DEPENDENCY = re.compile(
-        r'(?iu)(?P<editable>-e)?'
-        r'\s*'
-        r'(?P<package>[a-z0-9-_.]+)'
-        r' @ '
-        r'(?P<url>\S+)'
-        r'(?P<markers>\s+;\s+.+?)?'
-        r'(?P<comment>(?:\s*#.*)+)?$'
-    )
     # Example: 2022.02.1 -> 2022.2.1
     RE_IGNORED_ZEROS = re.compile(r"(?<=\.)0+(?=\d)")
 
@@ -89,36 +56,19 @@ class Dependency(object):  # pylint: disable=too-many-instance-attributes
         self.is_at = False
         self.valid = True
         self.line = line
-        vcs = self.RE_VCS_DEPENDENCY.match(line)
-        if vcs:
-            self.is_vcs = True
-            self.package = vcs.group('package')
-            self.version = ''
-            self.markers = vcs.group('markers') or ''
-            self.hashes = ''  # No way!
-            self.comment = (vcs.group('comment') or '').rstrip()
-            self.comment_span = self._adjust_span(vcs.span('comment'), vcs)
+        tokens = SectionTokenizer(line).tokenize()
+        if tokens is None:
+            self.valid = False
             return
-        at_url = self.RE_AT_DEPENDENCY.match(line)
-        if at_url:
-            self.is_at = True
-            self.package = at_url.group('package')
-            self.version = ''
-            self.markers = at_url.group('markers') or ''
-            self.hashes = ''  # ???
-            self.comment = (at_url.group('comment') or '').rstrip()
-            self.comment_span = self._adjust_span(at_url.span('comment'), at_url)
-            return
-        regular = self.RE_DEPENDENCY.match(line)
-        if regular:
-            self.package = regular.group('package')
-            self.version = self.RE_IGNORED_ZEROS.sub("", regular.group('version').strip())
-            self.markers = regular.group('markers') or ''
-            self.hashes = (regular.group('hashes') or '').strip()
-            self.comment = (regular.group('comment') or '').rstrip()
-            self.comment_span = self._adjust_span(regular.span('comment'), regular)
-            return
-        self.valid = False
+        self.is_vcs = tokens.kind == SectionTokenizer.VCS
+        self.is_at = tokens.kind == SectionTokenizer.AT
+        self.package = tokens.package
+        self.version = self.RE_IGNORED_ZEROS.sub("", tokens.version)
+        self.markers = tokens.markers
+        self.hashes = tokens.hashes
+        comment_start, comment_end = tokens.comment_span
+        self.comment = line[comment_start:comment_end].rstrip()
+        self.comment_span = tokens.comment_span
 
     def serialize(self):
         """
@@ -173,10 +123,3 @@ class Dependency(object):  # pylint: disable=too-many-instance-attributes
     def drop_post(self, in_path):
         """Remove .postXXXX postfix from version if needed."""
         self.version = FEATURES.drop_post(in_path, self.package, self.version)
-
-    @staticmethod
-    def _adjust_span(span, matchobj):
-        if span == (-1, -1):
-            length = matchobj.span()[1]
-            return (length, length)
-        return span
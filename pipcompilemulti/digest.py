@@ -0,0 +1,190 @@
+"""Hash comments identifying input files of generated files."""
+
+import os
+import json
+import time
+import hashlib
+import threading
+
+from .utils import user_cache_dir
+
+
+def generate_hash_comment(file_path):
+    """
+    Read file with given file_path and return string of format
+
+        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
+
+    which is hex representation of SHA1 file content hash
+    """
+    with open(file_path, 'rb') as fp:
+        return _hash_comment(fp.read())
+
+
+def generate_robust_hash_comment(file_path):
+    """
+    Read file with given file_path and return string of format
+
+        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
+
+    which is hex representation of SHA1 file content hash.
+    File content is pre-processed by stripping comments, whitespace and newlines.
+    """
+    with open(file_path, 'rb') as fp:
+        return _robust_hash_comment(fp.read())
+
+
+def input_hash_comments(file_path):
+    """
+    Read file with given file_path once and return pair of
+    robust hash comment (see ``generate_robust_hash_comment``)
+    and plain hash comment (see ``generate_hash_comment``).
+    """
+    with open(file_path, 'rb') as fp:
+        content = fp.read()
+    return _robust_hash_comment(content), _hash_comment(content)
+
+
+def _hash_comment(content):
+    hexdigest = hashlib.sha1(content.strip()).hexdigest()
+    return f"# SHA1:{hexdigest}\n"
+
+
+def _robust_hash_comment(content):
+    # Split lines the same way as reading file in text mode with universal newlines:
+    lines = content.decode("utf-8").replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    essense = ''.join(sorted(
+        line.split('#')[0].strip()
+        for line in lines
+    ))
+    hexdigest = hashlib.sha1(essense.encode("utf-8")).hexdigest()
+    return f"# SHA1:{hexdigest}\n"
+
+
+def parse_hash_comment(file_path):
+    """
+    Read file with given file_path line by line,
+    return the first line that starts with "# SHA1:", like this:
+
+        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
+    """
+    with open(file_path, encoding="utf-8") as fp:
+        for line in fp:
+            if line.startswith("# SHA1:"):
+                return line
+    return ''
+
+
+class DigestCache(object):
+    """On-disk cache of file digests keyed by file path, size, modification time and inode.
+
+    Files modified less than ``RACY_SECONDS`` before the cache was loaded
+    are hashed, but not stored,
+    because they can change again without changing size and modification time.
+    Cache is stored in ``$XDG_CACHE_HOME/pip-compile-multi/digests.json``.
+    """
+
+    INPUTS = 'inputs'
+    COMMENT = 'comment'
+    REFS = 'refs'
+    RACY_SECONDS = 2
+    MAX_ENTRIES = 100000
+
+    def __init__(self, path=None):
+        self.path = path or user_cache_dir('digests.json')
+        self._cwd = os.getcwd()
+        self._loaded_at_ns = time.time_ns()
+        self._entries = self._load()
+        self._used = set()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def input_hash_comments(self, file_path):
+        """Cached version of ``input_hash_comments``."""
+        return self.get(self.INPUTS, file_path, input_hash_comments)
+
+    def parse_hash_comment(self, file_path):
+        """Cached version of ``parse_hash_comment``."""
+        return self.get(self.COMMENT, file_path, parse_hash_comment)
+
+    def parse_references(self, file_path, parse):
+        """Cached set of references returned by ``parse(file_path)``."""
+        return set(self.get(self.REFS, file_path, lambda path: sorted(parse(path))))
+
+    def lookup(self, kind, file_path):
+        """Return cached value of given kind if it is up to date with the file or None."""
+        entry = self._fresh_entry(kind, file_path, self._stat(file_path))
+        return None if entry is None else self._value(kind, entry)
+
+    def save(self):
+        """Write cache to disk if anything changed, ignoring failures."""
+        if not self._dirty:
+            return
+        entries = self._entries
+        if len(entries) > self.MAX_ENTRIES:
+            entries = {key: entries[key] for key in self._used}
+        import tempfile  # pylint: disable=import-outside-toplevel
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    'wt', encoding='utf-8', dir=os.path.dirname(self.path),
+                    suffix='.tmp', delete=False) as fp:
+                json.dump(entries, fp)
+            os.replace(fp.name, self.path)
+        except OSError:
+            pass
+        self._dirty = False
+
+    def get(self, kind, file_path, compute):
+        """Return value of given kind for the file, calling compute(file_path) if it changed.
+
+        Value must be serializable to JSON.
+        """
+        stat = os.stat(file_path)
+        entry = self._fresh_entry(kind, file_path, stat)
+        if entry is not None:
+            return self._value(kind, entry)
+        value = compute(file_path)
+        if stat.st_mtime_ns < self._loaded_at_ns - self.RACY_SECONDS * 10 ** 9:
+            with self._lock:
+                self._entries[self._key(kind, file_path)] = self._signature(stat) + [value]
+                self._dirty = True
+        return value
+
+    def _fresh_entry(self, kind, file_path, stat):
+        if stat is None:
+            return None
+        key = self._key(kind, file_path)
+        with self._lock:
+            self._used.add(key)
+        entry = self._entries.get(key)
+        if entry and entry[:-1] == self._signature(stat):
+            return entry
+        return None
+
+    @staticmethod
+    def _signature(stat):
+        # File replaced by rename can keep size and modification time:
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    def _key(self, kind, file_path):
+        return kind + ':' + os.path.normpath(os.path.join(self._cwd, file_path))
+
+    def _value(self, kind, entry):
+        # JSON turns tuples into lists:
+        return tuple(entry[-1]) if kind == self.INPUTS else entry[-1]
+
+    @staticmethod
+    def _stat(file_path):
+        try:
+            return os.stat(file_path)
+        except OSError:
+            return None
+
+    def _load(self):
+        try:
+            with open(self.path, 'rt', encoding='utf-8') as fp:
+                entries = json.load(fp)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
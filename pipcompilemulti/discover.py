@@ -12,12 +12,14 @@ from .utils import fix_reference_path, extract_env_name
 __all__ = ('discover',)
 
 
-def discover(glob_pattern):
+def discover(glob_pattern, cache=None):
     """
-    Find all files matching given glob_pattern,
+    Find all files matching given glob_pattern (or any of list of patterns),
     parse them, and return list of environments:
 
     Recursively follow referenced files not matched by glob_pattern.
+    If ``DigestCache`` is passed, only files that changed
+    since it was saved are parsed.
 
     >>> import os
     >>> envs = discover(os.path.join('requirements', '*.in'))
@@ -34,18 +36,22 @@ def discover(glob_pattern):
     ... ]
     True
     """
-    to_visit = deque(map(os.path.normpath, glob.glob(glob_pattern)))
+    patterns = [glob_pattern] if isinstance(glob_pattern, str) else glob_pattern
+    to_visit = deque(
+        os.path.normpath(path)
+        for pattern in patterns
+        for path in glob.glob(pattern)
+    )
     envs, all_in_paths = {}, set()
     while to_visit:
         in_path = to_visit.pop()
-        # name =
         if in_path in all_in_paths:
             continue
         all_in_paths.add(in_path)
         envs[in_path] = {
             'in_path': in_path,
             'name': extract_env_name(in_path),
-            'refs': Environment.parse_references(in_path),
+            'refs': _parse_references(in_path, cache),
         }
         for ref in envs[in_path]['refs']:
             to_visit.append(fix_reference_path(
@@ -55,6 +61,12 @@ def discover(glob_pattern):
     return order_by_refs(envs.values())
 
 
+def _parse_references(in_path, cache):
+    if cache is None:
+        return Environment.parse_references(in_path)
+    return cache.parse_references(in_path, Environment.parse_references)
+
+
 def order_by_refs(envs):
     """Return topologicaly sorted list of environments.
 
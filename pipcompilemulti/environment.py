@@ -3,23 +3,27 @@
 import os
 import re
 import sys
+import shutil
 import logging
-import subprocess
+import tempfile
+import contextlib
 
 from .dependency import Dependency
 from .features import FEATURES
+from .lockfile import LockFile, concatenated, parse_sections, split_header
 from .deduplicate import PackageDeduplicator
-from .utils import extract_env_name
+from .resolver import IN_PROCESS, RUNNING, run_subprocess, total_usage
+from .utils import extract_env_name, fix_reference_path
 
 
 logger = logging.getLogger("pip-compile-multi")
 
 
-class Environment(object):
+class Environment(object):  # pylint: disable=too-many-instance-attributes
     """requirements file"""
 
     RE_REF = re.compile(r'^(?:-r|--requirement)\s*(?P<path>\S+).*$')
-    RE_COMMENT = re.compile(r'^\s*#.*$')
+    RE_CONSTRAINT = re.compile(r'^(?:-c|--constraint)\s*(?P<path>\S+).*$')
 
     def __init__(self, in_path, deduplicator=None):
         """
@@ -30,14 +34,19 @@ class Environment(object):
         self._dedup = deduplicator or PackageDeduplicator()
         self.ignore = self._dedup.ignored_packages(in_path)
         self.packages = {}
+        self.lockfile = None
+        # Lockfile as resolver produced it, before fix_lockfile:
+        self.resolved = None
+        self._output_path = None
+        self._seed_path = None
         self._outfile_pkg_names = None
 
     def maybe_create_lockfile(self):
         """
-        Write recursive dependencies list to outfile unless the goal is
+        Compose recursive dependencies list unless the goal is
         to upgrade specific package(s) which don't already appear.
         Populate package ignore set in either case and return
-        boolean indicating whether outfile was written.
+        boolean indicating whether lockfile was created.
         """
         logger.info(
             "Locking %s to %s. References: %r",
@@ -45,42 +54,241 @@ class Environment(object):
             self.outfile,
             sorted(self._dedup.recursive_refs(self.in_path)),
         )
-        if not FEATURES.affected(self.in_path):
+        if not FEATURES.affected(self.in_path) or self.resumed():
             self.fix_lockfile()  # populate ignore set
             return False
         self.create_lockfile()
         return True
 
+    def resumed(self):
+        """Whether outfile was locked by the interrupted run with the same inputs."""
+        if FEATURES.resume.completed(self.in_path, self.inputs_digest):
+            logger.info("Keeping %s locked by the interrupted run", self.outfile)
+            return True
+        return False
+
     def create_lockfile(self):
         """
-        Write recursive dependencies list to outfile
+        Compose recursive dependencies list
         with hard-pinned versions.
         Then fix it.
         """
-        original_in_file = ""
-        sink_out_path = FEATURES.sink_out_path()
-        try:
-            if sink_out_path and sink_out_path != self.outfile:
-                original_in_file = self._read_infile()
-                self._inject_sink()
-            with subprocess.Popen(self.pin_command, **FEATURES.pipe_arguments()) as process:
-                stdout, stderr = process.communicate()
-        finally:
-            if original_in_file:
-                self._restore_in_file(original_in_file)
-        if process.returncode == 0:
+        with FEATURES.trace.span('create_lockfile', env=self.in_path):
+            self._create_lockfile()
+
+    def _create_lockfile(self):
+        derived = FEATURES.resolve_once.lockfile_for(
+            self.in_path, self._dedup.recursive_refs(self.in_path),
+        )
+        if derived is not None:
+            self.lockfile = derived
+            self.fix_lockfile()
+            return
+        cache_key = self._lock_cache_key()
+        if cache_key and self._restore_cached_lockfile(cache_key):
+            return
+        with self._resolver_output() as output_path, self._seed_constraints():
+            result = self._resolve()
+            if result.returncode == 0:
+                self.lockfile = LockFile.read(output_path)
+        if result.returncode == 0:
+            self.resolved = LockFile(header=self.lockfile.header, sections=self.lockfile.sections)
             self.fix_lockfile()
+            if cache_key:
+                self._save_cached_lockfile(cache_key)
         else:
             logger.critical("ERROR executing %s", ' '.join(self.pin_command))
-            logger.critical("Exit code: %s", process.returncode)
-            if stdout:
-                logger.critical(stdout.decode('utf-8'))
-            if stderr:
-                logger.critical(stderr.decode('utf-8'))
+            logger.critical("Exit code: %s", result.returncode)
+            if result.timed_out:
+                logger.critical(
+                    "Resolver was stopped after %s seconds", FEATURES.resolve_timeout.seconds,
+                )
+            if result.stdout:
+                logger.critical(result.stdout.decode('utf-8'))
+            if result.stderr:
+                logger.critical(result.stderr.decode('utf-8'))
+            log_path = FEATURES.log_dir.log_path(self.in_path)
+            if log_path:
+                logger.critical("Complete output is in %s", log_path)
             raise RuntimeError("Failed to pip-compile {0}".format(self.infile))
 
+    @contextlib.contextmanager
+    def _resolver_output(self):
+        """Point resolver to a temporary copy of outfile.
+
+        Copy keeps existing pins for resolver, and lives in the same directory,
+        so that relative references in it still work.
+        Outfile itself is only replaced on save.
+        """
+        fd, output_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.outfile) or '.',
+            prefix='.{0}.'.format(os.path.basename(self.outfile)),
+            suffix='.tmp',
+        )
+        os.close(fd)
+        try:
+            if os.path.exists(self.outfile):
+                shutil.copyfile(self.outfile, output_path)
+            self._output_path = output_path
+            yield output_path
+        finally:
+            self._output_path = None
+            os.remove(output_path)
+
+    @contextlib.contextmanager
+    def _seed_constraints(self):
+        """Write versions locked in referenced environments to a temporary constraints file."""
+        lines = [] if self._sink_constraint() else FEATURES.seed_constraints.constraint_lines(
+            self.ignore
+        )
+        if not lines:
+            yield
+            return
+        fd, seed_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.outfile) or '.',
+            prefix='.{0}.'.format(os.path.basename(self.outfile)),
+            suffix='.constraints.tmp',
+        )
+        with os.fdopen(fd, 'wt', encoding='utf-8') as fp:
+            fp.write(''.join(line + '\n' for line in lines))
+        try:
+            self._seed_path = seed_path
+            yield
+        finally:
+            self._seed_path = None
+            os.remove(seed_path)
+
+    def _resolve(self):
+        """Run resolver, retrying transient failures, and return result of the last run."""
+        results = [self._run_resolver(attempt=1)]
+        while True:
+            delay = FEATURES.retries.delay(len(results), results[-1])
+            if delay is None:
+                break
+            logger.warning(
+                "Resolver of %s failed with %s, retrying in %d seconds",
+                self.in_path, 'timeout' if results[-1].timed_out else 'network error', delay,
+            )
+            RUNNING.sleep(delay)
+            results.append(self._run_resolver(attempt=len(results) + 1))
+        usages = [result.usage for result in results if result.usage is not None]
+        FEATURES.resolver_stats.record(
+            self.in_path,
+            total_usage(usages) if usages else None,
+            retries=len(results) - 1,
+            timeouts=sum(result.timed_out for result in results),
+        )
+        return results[-1]
+
+    def _run_resolver(self, attempt):
+        """Run resolver once and return ResolverResult."""
+        if FEATURES.resolve_in_process():
+            with FEATURES.trace.span('resolve', env=self.in_path, backend='in-process'):
+                return IN_PROCESS.run(
+                    FEATURES.pin_command() + self.pin_arguments,
+                    self._resolver_file_paths(),
+                    FEATURES.log_dir.log_path(self.in_path),
+                    attempt=attempt,
+                )
+        with FEATURES.trace.span('resolve', env=self.in_path, backend='subprocess'):
+            return run_subprocess(
+                self.pin_command,
+                FEATURES.log_dir.log_path(self.in_path),
+                FEATURES.resolve_timeout.seconds,
+                attempt=attempt,
+            )
+
+    def _resolver_file_paths(self):
+        """Paths of requirements files read by resolver."""
+        paths = self._input_paths() + [self._output_path or self.outfile]
+        sink_out_path = self._sink_constraint()
+        if sink_out_path:
+            paths.append(sink_out_path)
+        if self._seed_path:
+            paths.append(self._seed_path)
+        paths.extend(
+            FEATURES.compose_output_file_path(ref)
+            for ref in self._dedup.recursive_refs(self.in_path)
+        )
+        return paths
+
+    def _lock_cache_key(self, pins_lines=None):
+        """Compose lock cache key for current inputs and given output pins.
+
+        By default use pins from the existing output file.
+        """
+        if not FEATURES.lock_cache.enabled:
+            return None
+        return FEATURES.lock_cache.key(**self._digest_parts(pins_lines))
+
+    def inputs_digest(self):
+        """Return digest of current inputs and pins of the existing output file."""
+        return FEATURES.lock_cache.digest(**self._digest_parts())
+
+    def _digest_parts(self, pins_lines=None):
+        if pins_lines is None:
+            pins_lines = self._read_outfile_lines()
+        reference_paths = [
+            FEATURES.compose_output_file_path(ref)
+            for ref in sorted(self._dedup.recursive_refs(self.in_path))
+        ]
+        sink_out_path = self._sink_constraint()
+        if sink_out_path:
+            reference_paths.append(sink_out_path)
+        return {
+            'input_paths': self._input_paths(),
+            'reference_paths': reference_paths,
+            'pin_command': self.pin_command[1:],
+            'pins': FEATURES.lock_cache.pins_digest(pins_lines),
+            'post_process': FEATURES.post_process_options(self.in_path),
+        }
+
+    def _restore_cached_lockfile(self, cache_key):
+        entry = FEATURES.lock_cache.load(cache_key)
+        if entry is None:
+            return False
+        logger.info("Restored %s from lock cache", self.outfile)
+        self.lockfile = LockFile.parse(entry['content'].splitlines(True))
+        self.packages = entry['packages']
+        self._dedup.register_packages_for_env(self.in_path, self.packages)
+        return True
+
+    def _save_cached_lockfile(self, cache_key):
+        """Save fixed lockfile under the key of current run.
+
+        Also save it under the key of the next run, that will have
+        current output as existing pins.
+        """
+        content = self.lockfile.serialize()
+        FEATURES.lock_cache.save(
+            keys={cache_key, self._lock_cache_key(content.splitlines(True))},
+            content=content,
+            packages=self.packages,
+        )
+
+    def _read_outfile_lines(self):
+        try:
+            with open(self.outfile, 'rt', encoding="utf-8") as fp:
+                return fp.readlines()
+        except OSError:
+            return []
+
+    def _input_paths(self):
+        """Return sorted list of input file and all files it references or constrains."""
+        to_visit, seen = [self.in_path], set()
+        while to_visit:
+            path = os.path.normpath(to_visit.pop())
+            if path in seen or not os.path.isfile(path):
+                continue
+            seen.add(path)
+            to_visit.extend(
+                fix_reference_path(path, ref)
+                for ref in self.parse_references(path, self.RE_REF, self.RE_CONSTRAINT)
+            )
+        return sorted(seen)
+
     @classmethod
-    def parse_references(cls, filename):
+    def parse_references(cls, filename, *patterns):
         """
         Read filename line by line searching for pattern:
 
@@ -90,13 +298,17 @@ class Environment(object):
 
         return set of matched file names.
         E.g. {'file1.in', 'file2.in'}
+
+        Other line patterns with ``path`` group can be passed instead.
         """
+        patterns = patterns or (cls.RE_REF,)
         references = set()
         with open(filename, encoding="utf-8") as fobj:
             for line in fobj:
-                matched = cls.RE_REF.match(line)
-                if matched:
-                    references.add(matched.group('path'))
+                for pattern in patterns:
+                    matched = pattern.match(line)
+                    if matched:
+                        references.add(matched.group('path'))
         return references
 
     @property
@@ -120,69 +332,52 @@ class Environment(object):
         # Use the same interpreter binary
         parts = [sys.executable or 'python', '-m']
         parts.extend(FEATURES.pin_command())
-        parts.extend(FEATURES.pin_options(self.in_path))
-        parts.extend(['--output-file', self.outfile, self.infile])
+        parts.extend(self.pin_arguments)
+        return parts
+
+    @property
+    def pin_arguments(self):
+        """Resolver options followed by output and input file paths.
+
+        Sink output is passed as a constraint, so that input file is never modified.
+        While resolver runs, versions of referenced environments are passed as a constraint too.
+        """
+        parts = list(FEATURES.pin_options(self.in_path))
+        sink_out_path = self._sink_constraint()
+        if sink_out_path:
+            parts.extend(['--constraint', sink_out_path])
+        if self._seed_path:
+            parts.extend(['--constraint', self._seed_path])
+        parts.extend(['--output-file', self._output_path or self.outfile, self.infile])
         return parts
 
+    def _sink_constraint(self):
+        """Return path of sink output to constrain this environment or None."""
+        sink_out_path = FEATURES.sink_out_path(self.in_path)
+        if sink_out_path and sink_out_path != self.outfile:
+            return sink_out_path
+        return None
+
     def fix_lockfile(self):
-        """Run each section of outfile through fix_pin"""
-        with open(self.outfile, 'rt', encoding="utf-8") as fp:
-            sections = [
-                self.fix_pin(section)
-                for section in self.parse_sections(self.concatenated(fp))
-            ]
-        with open(self.outfile, 'wt', encoding="utf-8") as fp:
-            fp.writelines([
-                section + '\n'
-                for section in sections
-                if section is not None
-            ])
-        self._dedup.register_packages_for_env(self.in_path, self.packages)
+        """Run each section of lockfile through fix_pin.
+
+        Read lockfile from outfile, unless it's already loaded.
+        """
+        with FEATURES.trace.span('fix_lockfile', env=self.in_path):
+            if self.lockfile is None:
+                self.lockfile = LockFile.read(self.outfile)
+            self.lockfile.fix_sections(self.fix_pin)
+            self._dedup.register_packages_for_env(self.in_path, self.packages)
 
     @staticmethod
     def concatenated(fp):
-        r"""Read lines from fp concatenating on backslash (\\)
-
-        >>> env = Environment('')
-        >>> list(env.concatenated([
-        ...     'pkg', 'pkg  # comment', 'pkg', '# comment', '# one more',
-        ...     'foo', '  # via', '', '  # pkg',
-        ... ]))
-        ['pkg', 'pkg  # comment', 'pkg', '# comment', '# one more', 'foo', '  # via', '', '  # pkg']
-        """
-        line_parts = []
-        for line in fp:
-            line = line.rstrip()
-            if line.endswith('\\'):
-                line_parts.append(line[:-1].rstrip())
-            else:
-                line_parts.append(line)
-                yield ' '.join(line_parts)
-                line_parts[:] = []
-        if line_parts:
-            # Impossible:
-            raise RuntimeError("Compiled file ends with backslash \\")
-
-    def parse_sections(self, lines):
-        r"""Combine lines with following comments into sections.
-
-        >>> env = Environment('')
-        >>> list(env.parse_sections([
-        ...     'pkg', 'pkg  # comment', 'pkg', '# comment', '# one more',
-        ...     'foo', '  # via', '', '  # pkg',
-        ... ]))
-        ['pkg', 'pkg  # comment', 'pkg\n# comment\n# one more', 'foo\n  # via', '\n  # pkg']
-        """
-        section = []
-        for line in lines:
-            if self.RE_COMMENT.match(line):
-                section.append(line)
-            else:
-                if section:
-                    yield '\n'.join(section)
-                section = [line]
-        if section:
-            yield '\n'.join(section)
+        r"""Read lines from fp concatenating on backslash (\\)"""
+        return concatenated(fp)
+
+    @staticmethod
+    def parse_sections(lines):
+        """Combine lines with following comments into sections."""
+        return parse_sections(lines)
 
     def fix_pin(self, section):
         """
@@ -215,21 +410,11 @@ class Environment(object):
         return section.rstrip()
 
     def add_references(self, other_in_paths):
-        """Add references to other_in_paths in outfile"""
-        if not other_in_paths:
-            # Skip on empty list
-            return
-        with open(self.outfile, 'rt', encoding="utf-8") as fp:
-            header, body = self.split_header(fp)
-        with open(self.outfile, 'wt', encoding="utf-8") as fp:
-            fp.writelines(header)
-            fp.writelines(
-                '-r {0}\n'.format(
-                    FEATURES.compose_output_file_path(other_in_path)
-                )
-                for other_in_path in sorted(other_in_paths)
-            )
-            fp.writelines(body)
+        """Add references to other_in_paths in lockfile"""
+        self.lockfile.references = [
+            FEATURES.compose_output_file_path(other_in_path)
+            for other_in_path in sorted(other_in_paths)
+        ]
 
     @staticmethod
     def split_header(fp):
@@ -237,37 +422,13 @@ class Environment(object):
         Read file pointer and return pair of lines lists:
         first - header, second - the rest.
         """
-        body_start, header_ended = 0, False
-        lines = []
-        for line in fp:
-            if line.startswith('#') and not header_ended:
-                # Header text
-                body_start += 1
-            else:
-                header_ended = True
-            lines.append(line)
-        return lines[:body_start], lines[body_start:]
+        return split_header(fp)
 
     def replace_header(self, header_text):
         """Replace pip-compile header with custom text"""
-        with open(self.outfile, 'rt', encoding="utf-8") as fp:
-            _, body = self.split_header(fp)
-        with open(self.outfile, 'wt', encoding="utf-8") as fp:
-            fp.write(header_text)
-            fp.writelines(body)
-
-    def _read_infile(self):
-        with open(self.infile, "rt", encoding="utf-8") as fp:
-            return fp.read()
-
-    def _restore_in_file(self, content):
-        with open(self.infile, "wt", encoding="utf-8") as fp:
-            return fp.write(content)
-
-    def _inject_sink(self):
-        rel_sink_out_path = os.path.normpath(os.path.relpath(
-            FEATURES.sink_out_path(),
-            os.path.dirname(self.infile),
-        ))
-        with open(self.infile, "at", encoding="utf-8") as fp:
-            return fp.write("\n\n-c {}\n".format(rel_sink_out_path))
+        self.lockfile.header = header_text
+
+    def save(self):
+        """Atomically write lockfile to outfile and record it in the run journal."""
+        self.lockfile.write(self.outfile)
+        FEATURES.resume.record(self.in_path, self.inputs_digest)
@@ -42,7 +42,7 @@ environments that are referencing or referenced by selected environments.
 """  # noqa: E501
 import os
 
-from pipcompilemulti.utils import reference_cluster
+from pipcompilemulti.graph import EnvGraph
 from .base import BaseFeature, ClickOption
 
 
@@ -74,24 +74,24 @@ class AddHashes(BaseFeature):
         names_or_paths = self.value or []
         in_paths = set()
         for name_or_path in names_or_paths:
-            in_path = self._controller.compose_input_file_path(name_or_path)
-            if os.path.exists(in_path):
-                in_paths.add(in_path)
-            else:
-                in_paths.add(name_or_path)
+            existing = [
+                in_path
+                for in_path in self._controller.compose_input_file_paths(name_or_path)
+                if os.path.exists(in_path)
+            ]
+            in_paths.update(existing or [name_or_path])
         return in_paths
 
     def on_discover(self, env_confs):
         """Save environment names that need hashing."""
+        graph = EnvGraph.of(env_confs)
         self._hashed_by_reference = set()
         for in_path in self.enabled_in_paths:
-            self._hashed_by_reference.update(
-                reference_cluster(env_confs, in_path)
-            )
+            self._hashed_by_reference.update(graph.cluster(in_path))
 
     def _needs_hashes(self, in_path):
         assert self._hashed_by_reference is not None
-        return in_path in self._hashed_by_reference
+        return os.path.normpath(in_path) in self._hashed_by_reference
 
     def pin_options(self, in_path):
         """Return --generate-hashes if env requires it."""
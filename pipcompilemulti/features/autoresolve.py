@@ -29,6 +29,9 @@ pip-compile-multi generates conflict-free set of versions.
 
 After that, this compiled file is passed as a constraint for compiling
 all requirements files.
+It's passed with resolver's ``--constraint`` option, so input files are never modified,
+and environments can be compiled in parallel (see ``--jobs``).
+This requires pip-tools 7.2 or newer.
 
 As the last step, the *sink* file is compiled again preserving reference files
 and skipping duplicate packages.
@@ -39,7 +42,9 @@ and skipping duplicate packages.
     that references (directly or indirectly) all other files.
 """
 
-from pipcompilemulti.utils import recursive_refs
+import os
+
+from pipcompilemulti.graph import EnvGraph
 from .base import BaseFeature, ClickOption
 
 
@@ -55,20 +60,49 @@ class Autoresolve(BaseFeature):
     )
 
     def __init__(self):
-        self._sink_path = None
+        self._sinks = {}
 
     @property
     def enabled(self):
         """Whether feature was explicitly disabled or not."""
         return self.value
 
-    def on_discover(self, env_confs):
-        """Save set of all (recursive) included environments."""
-        self._sink_path = self._find_sink(env_confs)
+    def on_discover(self, env_confs, scopes=None):
+        """Find sink of each scope of environments.
+
+        Environments are a single scope by default.
+        Environment that belongs to several scopes uses sink of the first one.
 
-    def sink_path(self):
-        """Return sink path if it's enabled. Otherwise None"""
-        return self._sink_path if self.enabled else None
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[Autoresolve.OPTION_NAME] = True
+        >>> feature = Autoresolve()
+        >>> feature.on_discover([], [
+        ...     [{'in_path': 'a/base', 'refs': set()}, {'in_path': 'a/all', 'refs': {'base'}}],
+        ...     [{'in_path': 'b/base', 'refs': set()}],
+        ... ])
+        >>> feature.sink_path('a/base'), feature.sink_path('b/base')
+        ('a/all', 'b/base')
+        >>> del OPTIONS[Autoresolve.OPTION_NAME]
+        """
+        self._sinks = {}
+        for scope in [env_confs] if scopes is None else scopes:
+            sink = self._find_sink(scope)
+            if sink is None:
+                continue
+            for env in scope:
+                self._sinks.setdefault(os.path.normpath(env['in_path']), sink)
+
+    def sink_path(self, in_path):
+        """Return sink path for in_path if it's enabled. Otherwise None"""
+        if not self.enabled:
+            return None
+        return self._sinks.get(os.path.normpath(in_path))
+
+    def sink_paths(self):
+        """Return all sink paths if it's enabled."""
+        if not self.enabled:
+            return []
+        return sorted(set(self._sinks.values()))
 
     @staticmethod
     def _find_sink(envs):
@@ -98,9 +132,4 @@ class Autoresolve(BaseFeature):
         ... ])
         'all'
         """
-        all_envs = {env['in_path'] for env in envs}
-        for env in envs:
-            included_envs = set(recursive_refs(envs, env['in_path'])) | {env['in_path']}
-            if all_envs == included_envs:
-                return env['in_path']
-        return None
+        return EnvGraph.of(envs).sink()
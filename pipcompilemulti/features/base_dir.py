@@ -14,40 +14,88 @@ In configuration file, use ``directory`` option. For example, to use project roo
 
     [requirements]
     directory = .
+
+Several directories can be locked in one run, e.g. in a monorepo where each service
+has its own ``requirements`` directory.
+Pass the option several times, or pass a glob pattern matching the directories::
+
+    pip-compile-multi -d services/api/requirements -d services/worker/requirements
+    pip-compile-multi -d 'services/*/requirements'
+
+In configuration file, separate directories with commas::
+
+    [requirements]
+    directory = services/*/requirements, tools/requirements
+
+Environments of all directories are compiled in one schedule,
+so with ``--jobs`` they are compiled in parallel,
+and with ``--in-process`` they share resolver caches.
+Each directory keeps its own sink file (see ``--autoresolve``),
+and packages are deduplicated only along references,
+so directories that don't reference each other don't affect each other.
 """
 
+import glob
 import os
 
 from .base import BaseFeature, ClickOption
 
 
 class BaseDir(BaseFeature):
-    """Override input file extension."""
+    """Override requirements directory."""
 
     OPTION_NAME = 'directory'
     CLICK_OPTION = ClickOption(
         long_option='--directory',
         short_option='-d',
-        default="requirements",
+        default=("requirements",),
         is_flag=False,
-        help_text='Directory path with requirements files.',
+        multiple=True,
+        help_text='Directory path with requirements files. '
+                  'Can be a glob pattern and can be passed several times.',
     )
 
     @property
     def path(self):
-        """Get the base directory path.
+        """Get the first base directory path.
 
         >>> BaseDir().path == 'requirements'
         True
         """
-        return self.value
+        return self.roots()[0]
+
+    def roots(self):
+        """Return list of base directories with glob patterns expanded.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[BaseDir.OPTION_NAME] = ['nest*', 'requirements', 'nested']
+        >>> BaseDir().roots()
+        ['nested', 'requirements']
+        >>> OPTIONS[BaseDir.OPTION_NAME] = '.'
+        >>> BaseDir().roots()
+        ['.']
+        >>> del OPTIONS[BaseDir.OPTION_NAME]
+        """
+        values = [self.value] if isinstance(self.value, str) else self.value
+        roots = []
+        for value in values:
+            if glob.has_magic(value):
+                matched = sorted(path for path in glob.glob(value) if os.path.isdir(path))
+            else:
+                matched = [value]
+            roots.extend(path for path in matched if path not in roots)
+        return roots or list(values)
 
     def file_path(self, file_name):
-        """Compose file path for a given file name.
+        """Compose file path for a given file name in the first base directory.
 
         >>> import os.path
         >>> expected = os.path.join('requirements', 'base.txt')
         >>> expected == BaseDir().file_path('base.txt')
         True
         """
-        return os.path.join(self.value, file_name)
+        return os.path.join(self.path, file_name)
+
+    def file_paths(self, file_name):
+        """Compose file path for a given file name in each base directory."""
+        return [os.path.join(root, file_name) for root in self.roots()]
@@ -0,0 +1,80 @@
+"""
+Compile only changed files
+==========================
+
+Usually only a few input files change between runs.
+To recompile only environments whose input files changed since the last run,
+and environments referencing them, use:
+
+.. code-block:: text
+
+    --changed     Compile only environments with changed input files
+                  and environments referencing them.
+
+Input file is considered changed, if its hash doesn't match ``# SHA1:`` comment
+of the output file (the same check as ``verify`` command does),
+or if the output file doesn't exist.
+Other environments are not recompiled, but their packages are still
+read from the existing output files to skip duplicates.
+
+When using ``requirements`` command, pass the flag to ``lock``::
+
+    requirements lock --changed
+
+or use ``changed`` option in configuration file::
+
+    [requirements]
+    changed = True
+"""
+
+import os
+
+from pipcompilemulti.digest import input_hash_comments, parse_hash_comment
+from pipcompilemulti.graph import EnvGraph
+from .base import BaseFeature, ClickOption
+
+
+class ChangedOnly(BaseFeature):
+    """Limit compilation to changed environments and their dependents."""
+
+    OPTION_NAME = 'changed'
+    CLICK_OPTION = ClickOption(
+        long_option='--changed',
+        is_flag=True,
+        default=False,
+        help_text='Compile only environments with changed input files '
+                  'and environments referencing them.',
+    )
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._dirty = None
+
+    @property
+    def enabled(self):
+        """Whether feature is enabled."""
+        return bool(self.value)
+
+    def on_discover(self, env_confs):
+        """Find changed environments and propagate changes to dependents."""
+        if not self.enabled:
+            self._dirty = None
+            return
+        graph = EnvGraph.of(env_confs)
+        self._dirty = set()
+        for env in graph:
+            if self._is_changed(env['in_path']):
+                self._dirty.add(env['in_path'])
+                self._dirty.update(graph.descendants(env['in_path']))
+
+    def affected(self, in_path):
+        """Whether environment needs compilation."""
+        if self._dirty is None:
+            return True
+        return in_path in self._dirty
+
+    def _is_changed(self, in_path):
+        out_path = self._controller.compose_output_file_path(in_path)
+        if not os.path.exists(out_path):
+            return True
+        return parse_hash_comment(out_path) not in input_hash_comments(in_path)
@@ -1,14 +1,18 @@
 """Aggregate all features in a single controller."""
 
 import os
+import glob
 from functools import wraps
 
+from pipcompilemulti.graph import EnvGraph
+
 from .add_hashes import AddHashes
 from .annotate_index import AnnotateIndex
 from .autoresolve import Autoresolve
 from .backtracking import Backtracking
 from .base_dir import BaseDir
 from .build_isolation import BuildIsolation
+from .changed import ChangedOnly
 from .compatible import Compatible
 from .emit_find_links import EmitFindLinks
 from .emit_trusted_host import EmitTrustedHost
@@ -16,10 +20,21 @@ from .extra_index_url import ExtraIndexUrl
 from .file_extensions import InputExtension, OutputExtension
 from .forbid_post import ForbidPost
 from .header import CustomHeader
+from .in_process import InProcess
+from .jobs import AdaptiveJobs, Jobs
 from .limit_in_paths import LimitInPaths
 from .live_output import LiveOutput
+from .lock_cache import LockCache
+from .log_dir import LogDir
+from .preflight import Preflight
+from .resolve_once import ResolveOnce
+from .resolver_stats import ResolverStats
+from .resume import Resume
+from .retries import ResolveTimeout, Retries
+from .seed_constraints import SeedConstraints
 from .skip_constraint_comments import SkipConstraintComments
 from .strip_extras import StripExtras
+from .trace import Trace
 from .unsafe import AllowUnsafe
 from .upgrade import UpgradeAll, UpgradeSelected
 from .use_cache import UseCache
@@ -31,6 +46,7 @@ class FeaturesController:
     # pylint: disable=too-many-instance-attributes
 
     def __init__(self):
+        self.adaptive_jobs = AdaptiveJobs()
         self.add_hashes = AddHashes(self)
         self.allow_unsafe = AllowUnsafe()
         self.annotate_index = AnnotateIndex()
@@ -38,23 +54,37 @@ class FeaturesController:
         self.backtracking = Backtracking()
         self.base_dir = BaseDir()
         self.build_isolation = BuildIsolation()
+        self.changed = ChangedOnly(self)
         self.compatible = Compatible()
         self.emit_find_links = EmitFindLinks()
         self.emit_trusted_host = EmitTrustedHost()
         self.extra_index_url = ExtraIndexUrl()
         self.forbid_post = ForbidPost()
         self.header = CustomHeader()
+        self.in_process = InProcess()
         self.input_extension = InputExtension()
+        self.jobs = Jobs()
         self.limit_in_paths = LimitInPaths()
         self.live_output = LiveOutput()
+        self.lock_cache = LockCache(self)
+        self.log_dir = LogDir()
         self.output_extension = OutputExtension()
+        self.preflight = Preflight(self)
+        self.resolve_once = ResolveOnce(self)
+        self.resolve_timeout = ResolveTimeout()
+        self.resolver_stats = ResolverStats(self)
+        self.resume = Resume(self)
+        self.retries = Retries()
+        self.seed_constraints = SeedConstraints()
         self.skip_constraint_comments = SkipConstraintComments()
         self.strip_extras = StripExtras()
+        self.trace = Trace()
         self.upgrade_all = UpgradeAll(self)
         self.upgrade_selected = UpgradeSelected(self)
         self.use_cache = UseCache()
         self.use_uv = UseUV()
         self._features = [
+            self.adaptive_jobs,
             self.add_hashes,
             self.allow_unsafe,
             self.annotate_index,
@@ -62,18 +92,31 @@ class FeaturesController:
             self.backtracking,
             self.base_dir,
             self.build_isolation,
+            self.changed,
             self.compatible,
             self.emit_find_links,
             self.emit_trusted_host,
             self.extra_index_url,
             self.forbid_post,
             self.header,
+            self.in_process,
             self.input_extension,
+            self.jobs,
             self.limit_in_paths,
             self.live_output,
+            self.lock_cache,
+            self.log_dir,
             self.output_extension,
+            self.preflight,
+            self.resolve_once,
+            self.resolve_timeout,
+            self.resolver_stats,
+            self.resume,
+            self.retries,
+            self.seed_constraints,
             self.skip_constraint_comments,
             self.strip_extras,
+            self.trace,
             self.upgrade_all,
             self.upgrade_selected,
             self.use_cache,
@@ -114,6 +157,10 @@ class FeaturesController:
             '--verbose',
         ]
 
+    def resolve_in_process(self):
+        """Whether to run pip-tools resolver in the current process."""
+        return self.in_process.enabled and not self.use_uv.value
+
     def pin_options(self, in_path):
         """Return list of options to pin command."""
         options = []
@@ -138,6 +185,12 @@ class FeaturesController:
             self.input_extension.compose_input_file_name(basename)
         )
 
+    def compose_input_file_paths(self, basename):
+        """Return input file paths by environment name in each requirements directory."""
+        return self.base_dir.file_paths(
+            self.input_extension.compose_input_file_name(basename)
+        )
+
     def compose_output_file_path(self, in_path):
         """Return output file path by environment name."""
         return self.output_extension.compose_output_file_path(in_path)
@@ -150,6 +203,14 @@ class FeaturesController:
             return self.forbid_post.drop_post(version)
         return version
 
+    def post_process_options(self, in_path):
+        """Return options that change resolver output for passed environment name."""
+        return {
+            'compatible': sorted(self.compatible.patterns),
+            'forbid_post': self.forbid_post.post_forbidden(in_path),
+            'skip_constraints': bool(self.skip_constraint_comments.enabled),
+        }
+
     def constraint(self, package_name):
         """Return ``~=`` if package_name matches patterns, ``==`` otherwise."""
         return self.compatible.constraint(package_name)
@@ -159,20 +220,53 @@ class FeaturesController:
 
         Returns a new possibly shorter env list.
         """
+        with self.trace.span('FEATURES.on_discover'):
+            return self._on_discover(env_confs)
+
+    def _on_discover(self, env_confs):
         self.upgrade_selected.reset()
-        self.limit_in_paths.on_discover(env_confs)
-        limited_env_confs = [env for env in env_confs if self.included(env['in_path'])]
+        self.resolve_once.reset()
+        graph = EnvGraph.of(env_confs)
+        self.limit_in_paths.on_discover(graph)
+        limited_env_confs = graph
+        if not all(self.included(env['in_path']) for env in graph):
+            limited_env_confs = EnvGraph(
+                env for env in graph if self.included(env['in_path'])
+            )
         self.add_hashes.on_discover(limited_env_confs)
-        self.autoresolve.on_discover(limited_env_confs)
+        self.autoresolve.on_discover(limited_env_confs, self._scopes(limited_env_confs))
+        self.changed.on_discover(limited_env_confs)
         return limited_env_confs
 
+    def _scopes(self, graph):
+        """Split environments by requirements directory.
+
+        Scope of directory has its environments and all environments they reference.
+        """
+        patterns = self.compose_input_file_paths('*')
+        if len(patterns) == 1:
+            return [graph]
+        graph = EnvGraph.of(graph)
+        known = {os.path.normpath(env['in_path']) for env in graph}
+        scopes = []
+        for pattern in patterns:
+            members = set()
+            for path in map(os.path.normpath, glob.glob(pattern)):
+                if path in known:
+                    members.add(path)
+                    members.update(graph.ancestors(path))
+            scopes.append([env for env in graph if os.path.normpath(env['in_path']) in members])
+        return scopes
+
     def affected(self, in_path):
         """Whether environment is affected by upgrade command."""
+        if not self.changed.affected(in_path):
+            return False
         if self.upgrade_all.enabled:
             return True
         if self.upgrade_selected.affected(in_path):
             return True
-        return in_path == self.autoresolve.sink_path()
+        return in_path == self.autoresolve.sink_path(in_path)
 
     def included(self, in_path):
         """Whether in_path is included directly or by reference."""
@@ -182,13 +276,13 @@ class FeaturesController:
         """Text to put in the beginning of each generated file."""
         return self.header.text
 
-    def sink_in_path(self):
-        """Return input sink path if it's enabled. Otherwise None"""
-        return self.autoresolve.sink_path()
+    def sink_in_paths(self):
+        """Return input sink paths of all requirements directories if it's enabled."""
+        return self.autoresolve.sink_paths()
 
-    def sink_out_path(self):
-        """Return sink output path if it's enabled and exists. Otherwise None"""
-        infile = self.autoresolve.sink_path()
+    def sink_out_path(self, in_path):
+        """Return output path of in_path's sink if it's enabled and exists. Otherwise None"""
+        infile = self.autoresolve.sink_path(in_path)
         if not infile:
             return None
         outfile = self.compose_output_file_path(infile)
@@ -0,0 +1,47 @@
+"""
+In-process resolver
+===================
+
+By default ``pip-compile-multi`` starts a new Python interpreter running ``pip-compile``
+for each environment.
+Each run pays for interpreter startup, importing pip and pip-tools,
+and for fetching index pages and package metadata again.
+Option ``--in-process`` runs pip-tools resolver inside ``pip-compile-multi`` process
+sharing package repository between all environments.
+
+.. code-block:: text
+
+  --in-process / --no-in-process  Run pip-tools resolver in the same process
+                                  (default false)
+
+In configuration file, use ``in_process`` option::
+
+    [requirements]
+    in_process = True
+
+Generated files are the same as with a separate process.
+Repository is not shared for environments with pip options
+(like ``--index-url`` or ``--find-links``) in requirements files,
+because pip applies them to the repository.
+In-process resolutions run one at a time even with ``--jobs``.
+The option has no effect when ``--uv`` is enabled.
+"""
+
+from .base import BaseFeature, ClickOption
+
+
+class InProcess(BaseFeature):
+    """Run pip-tools resolver in the current interpreter."""
+
+    OPTION_NAME = 'in_process'
+    CLICK_OPTION = ClickOption(
+        long_option='--in-process/--no-in-process',
+        is_flag=True,
+        default=False,
+        help_text='Run pip-tools resolver in the same process (default false).',
+    )
+
+    @property
+    def enabled(self):
+        """Whether feature is enabled."""
+        return bool(self.value)
@@ -0,0 +1,111 @@
+"""
+Parallel compilation
+====================
+
+By default ``pip-compile-multi`` compiles environments one by one.
+Environments that don't reference each other can be compiled concurrently:
+
+.. code-block:: text
+
+    -j, --jobs INTEGER     Number of environments to compile in parallel
+                           (default 1)
+
+In configuration file, use ``jobs`` option::
+
+    [requirements]
+    jobs = 4
+
+An environment is scheduled only after all environments it references are locked,
+so generated files are the same as with sequential compilation.
+If compilation of any environment fails, no new environments are scheduled,
+resolvers that are still running are stopped,
+and the error is raised as soon as they exit.
+Resolvers running with ``--in-process`` are not stopped and finish normally.
+
+Each resolver can take a lot of memory, and too many jobs can exhaust it.
+To start new resolvers only while there is enough free memory, pass:
+
+.. code-block:: text
+
+    --adaptive-jobs / --no-adaptive-jobs
+                           Start parallel resolvers only while available
+                           memory fits one more (default false).
+
+In configuration file, use ``adaptive_jobs`` option::
+
+    [requirements]
+    jobs = 8
+    adaptive_jobs = True
+
+``--jobs`` stays the upper bound.
+Available memory is read from ``/proc/meminfo`` and memory taken by resolvers
+from ``/proc/<pid>/status``.
+New resolver is expected to take as much as the biggest resolver seen so far (1 GiB at first),
+running resolvers are expected to grow up to that size,
+and 512 MiB are left for the rest of the system.
+One resolver always runs, even when memory is short.
+Where ``/proc`` is not available, e.g. on macOS and Windows, the number of jobs is not limited.
+
+.. note::
+
+    When combined with ``--live``, output of concurrent ``pip-compile`` runs
+    is interleaved.
+"""
+
+from pipcompilemulti.memory import MemoryLimiter
+from .base import BaseFeature, ClickOption
+
+
+class Jobs(BaseFeature):
+    """Number of environments compiled in parallel."""
+
+    OPTION_NAME = 'jobs'
+    CLICK_OPTION = ClickOption(
+        long_option='--jobs',
+        short_option='-j',
+        default=1,
+        help_text='Number of environments to compile in parallel (default 1).',
+    )
+
+    @property
+    def workers(self):
+        """Maximum number of concurrent compilations.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[Jobs.OPTION_NAME] = '4'
+        >>> Jobs().workers
+        4
+        >>> OPTIONS[Jobs.OPTION_NAME] = 0
+        >>> Jobs().workers
+        1
+        >>> del OPTIONS[Jobs.OPTION_NAME]
+        """
+        return max(1, int(self.value or 1))
+
+
+class AdaptiveJobs(BaseFeature):
+    """Limit parallel resolvers by available memory."""
+
+    OPTION_NAME = 'adaptive_jobs'
+    CLICK_OPTION = ClickOption(
+        long_option='--adaptive-jobs/--no-adaptive-jobs',
+        is_flag=True,
+        default=False,
+        help_text='Start parallel resolvers only while available memory fits one more '
+                  '(default false).',
+    )
+
+    def limiter(self, pids):
+        """Return MemoryLimiter for resolvers with process IDs returned by pids,
+        or None if disabled.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[AdaptiveJobs.OPTION_NAME] = True
+        >>> AdaptiveJobs().limiter(list) is not None
+        True
+        >>> del OPTIONS[AdaptiveJobs.OPTION_NAME]
+        >>> AdaptiveJobs().limiter(list)
+        """
+        if not self.value:
+            return None
+        return MemoryLimiter(pids)
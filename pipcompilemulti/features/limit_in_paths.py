@@ -30,7 +30,7 @@ For example::
     include_in_paths = requirements/deps36.in
 """
 
-from pipcompilemulti.utils import recursive_refs
+from pipcompilemulti.graph import EnvGraph
 from .base import BaseFeature, ClickOption
 
 
@@ -74,12 +74,13 @@ class LimitInPaths(BaseFeature):
         """Save set of all (recursive) included environments."""
         if not self.direct_envs:
             # No limit means all envs included:
-            self._all_envs = [env['in_path'] for env in env_confs]
+            self._all_envs = {env['in_path'] for env in env_confs}
             return
+        graph = EnvGraph.of(env_confs)
         transitive_refs = {
             ref
             for in_path in self.direct_envs
-            for ref in recursive_refs(env_confs, in_path)
+            for ref in graph.ancestors(in_path)
         }
         self._all_envs = self.direct_envs | transitive_refs
 
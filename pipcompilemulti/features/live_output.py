@@ -15,8 +15,6 @@ In configuration file, use ``live`` option::
     [requirements]
     live = True
 """
-import subprocess
-
 from .base import BaseFeature, ClickOption
 
 
@@ -35,6 +33,7 @@ class LiveOutput(BaseFeature):
         """Values for stdout and stderr arguments to subprocess.Popen."""
         if self.value:
             return {}
+        import subprocess  # pylint: disable=import-outside-toplevel
         return {
             'stdout': subprocess.PIPE,
             'stderr': subprocess.PIPE,
@@ -0,0 +1,224 @@
+"""
+Lock Cache
+==========
+
+When nothing changed since the last run, locking produces the same files again.
+``pip-compile-multi`` remembers post-processed output of each environment in a local cache
+and restores it instead of running the resolver when all inputs are the same:
+
+* Contents of the input file and all files it references or constrains.
+* Contents of locked files of referenced environments.
+* Pinned versions in the existing output file.
+* Resolver options, resolver name and version, Python version and platform.
+* Post-processing options: ``--compatible`` patterns, ``--forbid-post`` for the environment
+  and ``--skip-constraints``.
+
+The cache is used only when upgrades are disabled, i.e. for ``requirements lock``
+and ``pip-compile-multi --no-upgrade``.
+Environments with editable or local path requirements are never cached,
+because their dependencies can change without changes in requirements files.
+
+.. code-block:: text
+
+    --lock-cache / --no-lock-cache  Reuse locked files for unchanged inputs
+                                    (default true)
+
+In configuration file, use ``lock_cache`` option::
+
+    [requirements]
+    lock_cache = False
+
+Cache is stored in ``$XDG_CACHE_HOME/pip-compile-multi/locks``
+(``~/.cache/pip-compile-multi/locks`` by default).
+Least recently used entries are evicted when the cache grows above 64 MiB.
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import tempfile
+
+from pipcompilemulti.digest import generate_robust_hash_comment
+from pipcompilemulti.utils import user_cache_dir
+from .base import BaseFeature, ClickOption
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+class LockCache(BaseFeature):
+    """Restore locked files for unchanged inputs without running resolver."""
+
+    OPTION_NAME = 'lock_cache'
+    CLICK_OPTION = ClickOption(
+        long_option='--lock-cache/--no-lock-cache',
+        is_flag=True,
+        default=True,
+        help_text='Reuse locked files for unchanged inputs (default true).',
+    )
+    MAX_SIZE = 64 * 1024 * 1024
+    _LOCAL_PREFIXES = ('-e', '--editable', '.', '/', 'file:')
+
+    def __init__(self, controller):
+        self._controller = controller
+
+    @property
+    def enabled(self):
+        """Whether cache can be used.
+
+        Upgrade results depend on the state of package index,
+        not only on the input files.
+        """
+        return bool(
+            self.value
+            and not self._controller.upgrade_all.enabled
+            and not self._controller.upgrade_selected.active
+        )
+
+    @property
+    def directory(self):
+        """Directory with cache entries."""
+        return user_cache_dir('locks')
+
+    def key(self, input_paths, reference_paths, pin_command, pins, post_process):
+        """Compose cache key for environment.
+
+        Args:
+            input_paths: input file with all files it references or constrains.
+            reference_paths: locked files the environment depends on.
+            pin_command: resolver command with all options.
+            pins: digest of the existing output file (see ``pins_digest``).
+            post_process: options applied to resolver output
+                (see ``FeatureController.post_process_options``).
+
+        Return None if environment can't be cached.
+        """
+        if not self.enabled:
+            return None
+        if any(self._has_local_requirements(path) for path in input_paths):
+            return None
+        return self.digest(input_paths, reference_paths, pin_command, pins, post_process)
+
+    def digest(self, input_paths, reference_paths, pin_command, pins, post_process):
+        """Return digest of environment inputs, taking the same arguments as ``key``.
+
+        Unlike ``key``, digest is computed even if cache is disabled.
+        """
+        parts = {
+            'inputs': [
+                (path, generate_robust_hash_comment(path))
+                for path in input_paths
+            ],
+            'references': [
+                (path, self._file_digest(path))
+                for path in reference_paths
+            ],
+            'command': list(pin_command),
+            'backend': self._backend_identity(),
+            'python': [sys.version, sys.platform],
+            'pins': pins,
+            'post_process': post_process,
+        }
+        serialized = json.dumps(parts, sort_keys=True).encode('utf-8')
+        return hashlib.sha256(serialized).hexdigest()
+
+    def load(self, key):
+        """Return cached entry with ``content`` and ``packages`` or None."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rt', encoding='utf-8') as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        # Mark entry as recently used:
+        os.utime(path)
+        return entry
+
+    def save(self, keys, content, packages):
+        """Store post-processed lockfile content under all passed keys, ignoring failures."""
+        serialized = json.dumps({'content': content, 'packages': packages})
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            for key in keys:
+                with tempfile.NamedTemporaryFile(
+                        'wt', encoding='utf-8', dir=self.directory,
+                        suffix='.tmp', delete=False) as fp:
+                    fp.write(serialized)
+                os.replace(fp.name, self._entry_path(key))
+            self.evict()
+        except OSError as ex:
+            logger.warning("Can't save lock cache entry in %s: %s", self.directory, ex)
+
+    def evict(self):
+        """Remove least recently used entries above size limit."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.MAX_SIZE:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+
+    @staticmethod
+    def pins_digest(lines):
+        r"""Digest of requirement lines ignoring comments and references.
+
+        >>> LockCache.pins_digest(['# SHA1:123\n', '-r base.txt\n', 'six==1.0\n', '  # via x\n']) \
+        ...     == LockCache.pins_digest(['six==1.0'])
+        True
+        """
+        digest = hashlib.sha1()
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#') and not line.startswith('-r '):
+                digest.update(line.encode('utf-8') + b'\n')
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    @classmethod
+    def _has_local_requirements(cls, path):
+        with open(path, 'rt', encoding='utf-8') as fp:
+            return any(
+                line.strip().startswith(cls._LOCAL_PREFIXES) or '@ file:' in line
+                for line in fp
+            )
+
+    @staticmethod
+    def _file_digest(path):
+        try:
+            with open(path, 'rb') as fp:
+                return hashlib.sha1(fp.read()).hexdigest()
+        except OSError:
+            return None
+
+    def _backend_identity(self):
+        if self._controller.use_uv.value:
+            distributions = ['uv']
+        else:
+            distributions = ['pip-tools', 'pip']
+        return [
+            (name, _distribution_version(name))
+            for name in distributions
+        ]
+
+
+def _distribution_version(name):
+    # importlib.metadata is slow to import and only needed for locking.
+    # pylint: disable=import-outside-toplevel
+    from importlib import metadata
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return None
@@ -0,0 +1,61 @@
+"""
+Resolver logs
+=============
+
+By default ``pip-compile-multi`` keeps only the last lines of resolver output
+and prints them if the resolver fails.
+To keep complete output of every resolver run, pass a directory for log files:
+
+.. code-block:: text
+
+    --log-dir DIRECTORY  Write resolver output of each environment to a file
+                         in this directory.
+
+In configuration file, use ``log_dir`` option::
+
+    [requirements]
+    log_dir = logs
+
+Log file is named after environment input file,
+e.g. output for ``requirements/test.in`` is written to ``logs/requirements.test.log``.
+Each environment gets its own file, so output of parallel compilation
+(see ``--jobs``) is not interleaved.
+
+Output is not captured when ``--live`` is enabled, so no log files are written.
+
+When using ``requirements`` command, pass the option to ``lock`` or ``upgrade``::
+
+    requirements lock --log-dir logs
+"""
+
+import os
+
+from .base import BaseFeature, ClickOption
+
+
+class LogDir(BaseFeature):
+    """Directory for resolver output files."""
+
+    OPTION_NAME = 'log_dir'
+    CLICK_OPTION = ClickOption(
+        long_option='--log-dir',
+        help_text='Write resolver output of each environment '
+                  'to a file in this directory.',
+    )
+
+    def log_path(self, in_path):
+        """Return path of log file for in_path, or None if logs are disabled.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[LogDir.OPTION_NAME] = 'logs'
+        >>> LogDir().log_path('requirements/test.in').replace(os.sep, '/')
+        'logs/requirements.test.log'
+        >>> del OPTIONS[LogDir.OPTION_NAME]
+        >>> LogDir().log_path('requirements/test.in') is None
+        True
+        """
+        if not self.value:
+            return None
+        name = os.path.splitext(os.path.normpath(in_path))[0]
+        name = name.replace(os.sep, '.').replace('/', '.').lstrip('.')
+        return os.path.join(self.value, name + '.log')
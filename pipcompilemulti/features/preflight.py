@@ -0,0 +1,319 @@
+"""
+Preflight conflict check
+========================
+
+Conflicting requirements of environments that reference each other
+are usually found only after resolver runs, when packages of environments are merged.
+Before running any resolver, ``pip-compile-multi`` checks version specifiers
+of input files against each other and fails at once, listing all conflicts:
+
+.. code-block:: text
+
+    Requirements of six in requirements/test.in can't be satisfied together:
+    six<1.10 (requirements/base.in), six>=1.16 (requirements/test.in)
+
+For each environment, specifiers of its input file, constraint files it includes
+and all environments it references are combined by package name.
+
+When packages are not upgraded, resolver keeps versions locked in output files.
+Environment that requires a different version of a package locked in a referenced environment
+would fail to compile too:
+
+.. code-block:: text
+
+    six is locked to 1.15.0 in requirements/base.txt,
+    but requirements/test.in requires six>=1.16.
+    Upgrade it with --upgrade-package six
+
+Locked versions are not checked when all packages are upgraded,
+and when :ref:`autoresolve` is enabled, because then all environments are resolved together.
+
+Requirements with environment markers, URLs and arbitrary equality (``===``) are skipped,
+so that the check never fails on requirements that resolver can satisfy.
+
+.. code-block:: text
+
+    --preflight / --no-preflight  Check requirements of environments for
+                                  conflicts before running resolver.
+
+To disable the check, set it to ``False`` in a configuration file::
+
+    [requirements]
+    preflight = False
+"""
+
+import os
+import re
+import logging
+
+from pipcompilemulti.graph import EnvGraph
+from pipcompilemulti.lockfile import concatenated
+from pipcompilemulti.tokenizer import SectionTokenizer
+from pipcompilemulti.utils import fix_reference_path
+from .base import BaseFeature, ClickOption
+from .resolve_once import canonical_name
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+class Preflight(BaseFeature):
+    """Find conflicting requirements before running resolver."""
+
+    OPTION_NAME = 'preflight'
+    CLICK_OPTION = ClickOption(
+        long_option='--preflight/--no-preflight',
+        is_flag=True,
+        default=True,
+        help_text='Check requirements of environments for conflicts before running resolver.',
+    )
+    RE_CONSTRAINT = re.compile(r'^(?:-c|--constraint)\s*(?P<path>\S+)')
+    RE_COMMENT = re.compile(r'(^|\s+)#.*$')
+
+    def __init__(self, controller):
+        self._controller = controller
+
+    @property
+    def enabled(self):
+        """Whether feature is enabled."""
+        return bool(self.value)
+
+    def check(self, env_confs):
+        """Log all conflicts and raise RuntimeError if there are any."""
+        if not self.enabled:
+            return
+        errors = self.conflicts(env_confs)
+        for error in errors:
+            logger.error("%s", error)
+        if errors:
+            raise RuntimeError(
+                "Found {0} conflicting requirements, see errors above".format(len(errors))
+            )
+
+    def conflicts(self, env_confs):
+        """Return list of messages describing conflicting requirements."""
+        graph = EnvGraph.of(env_confs)
+        requirements = _Requirements(self.RE_CONSTRAINT, self.RE_COMMENT)
+        errors = []
+        unsatisfiable = {}
+        check_locked = not (
+            self._controller.upgrade_all.enabled or self._controller.autoresolve.enabled
+        )
+        for conf in graph:
+            in_path = os.path.normpath(conf['in_path'])
+            ancestors = sorted(graph.ancestors(in_path))
+            for name, specs in requirements.combined([in_path] + ancestors).items():
+                if _satisfiable(spec for _, spec in specs):
+                    continue
+                unsatisfiable.setdefault(in_path, set()).add(name)
+                if any(name in unsatisfiable.get(ancestor, ()) for ancestor in ancestors):
+                    continue
+                errors.append(
+                    "Requirements of {0} in {1} can't be satisfied together: {2}".format(
+                        name, in_path, ', '.join(
+                            '{0}{1} ({2})'.format(name, spec, path) for path, spec in specs
+                        ),
+                    )
+                )
+            if check_locked:
+                errors.extend(self._locked_conflicts(graph, in_path, requirements))
+        return _unique(errors)
+
+    def _locked_conflicts(self, graph, in_path, requirements):
+        """Yield messages for versions locked in references of in_path, that it excludes."""
+        ancestors = sorted(graph.ancestors(in_path))
+        combined = requirements.combined([in_path] + ancestors)
+        upgraded = self._upgraded_names()
+        for ancestor in ancestors:
+            out_path = self._controller.compose_output_file_path(ancestor)
+            pins = requirements.pins(out_path)
+            if not pins:
+                continue
+            keeps = requirements.combined([ancestor] + sorted(graph.ancestors(ancestor)))
+            yield from _excluded_pins(combined, out_path, pins, keeps, upgraded)
+
+    def _upgraded_names(self):
+        return {
+            canonical_name(name)
+            for name in self._controller.upgrade_selected.package_names
+        }
+
+
+def _excluded_pins(combined, out_path, pins, keeps, upgraded):
+    """Yield messages for pins of out_path, that combined specifiers exclude.
+
+    Pins that out_path's own specifiers (keeps) don't allow would be changed anyway,
+    and upgraded packages are resolved again, so both are skipped.
+    """
+    for name, specs in combined.items():
+        version = pins.get(name)
+        if version is None or name in upgraded:
+            continue
+        if not all(spec.contains(version, prereleases=True) for _, spec in keeps.get(name, ())):
+            continue
+        for path, spec in specs:
+            if not spec.contains(version, prereleases=True):
+                yield (
+                    "{0} is locked to {1} in {2}, but {3} requires {0}{4}. "
+                    "Upgrade it with --upgrade-package {0}".format(
+                        name, version, out_path, path, spec,
+                    )
+                )
+
+
+class _Requirements(object):
+    """Version specifiers of input files and pinned versions of output files.
+
+    Files are read once.
+    """
+
+    def __init__(self, re_constraint, re_comment):
+        self._re_constraint = re_constraint
+        self._re_comment = re_comment
+        self._specs = {}
+        self._pins = {}
+
+    def combined(self, in_paths):
+        """Return mapping from package name to list of source path and specifier pairs."""
+        result = {}
+        for in_path in in_paths:
+            for name, path, spec in self.specs(in_path):
+                specs = result.setdefault(name, [])
+                # Constraint file can be included by several environments:
+                if (path, spec) not in specs:
+                    specs.append((path, spec))
+        return result
+
+    def specs(self, in_path):
+        """Return list of package name, source path and specifier of in_path.
+
+        Constraint files included by in_path are read too.
+        """
+        if in_path not in self._specs:
+            self._specs[in_path] = []
+            to_visit, seen = [in_path], set()
+            while to_visit:
+                path = to_visit.pop()
+                if path in seen or not os.path.isfile(path):
+                    continue
+                seen.add(path)
+                with open(path, encoding='utf-8') as fp:
+                    for line in concatenated(fp):
+                        line = self._re_comment.sub('', line).strip()
+                        matched = self._re_constraint.match(line)
+                        if matched:
+                            to_visit.append(fix_reference_path(path, matched.group('path')))
+                        elif line and not line.startswith('-'):
+                            self._specs[in_path].extend(_parse_requirement(line, path))
+        return self._specs[in_path]
+
+    def pins(self, out_path):
+        """Return mapping from package name to version pinned in out_path."""
+        if out_path not in self._pins:
+            self._pins[out_path] = {}
+            try:
+                with open(out_path, encoding='utf-8') as fp:
+                    lines = list(concatenated(fp))
+            except OSError:
+                lines = []
+            for line in lines:
+                tokens = SectionTokenizer(line).tokenize()
+                if tokens and tokens.kind == SectionTokenizer.PINNED and _valid(tokens.version):
+                    self._pins[out_path][canonical_name(tokens.package)] = tokens.version
+        return self._pins[out_path]
+
+
+def _parse_requirement(line, path):
+    """Return list with package name, path and specifier set of requirement line.
+
+    Lines that can't be checked are skipped.
+
+    >>> _parse_requirement('Six[extra]>=1.0,<2', 'base.in')
+    [('six', 'base.in', <SpecifierSet('<2,>=1.0')>)]
+    >>> _parse_requirement('six<2 ; python_version < "3"', 'base.in')
+    []
+    >>> _parse_requirement('./local/path', 'base.in')
+    []
+    """
+    # pylint: disable=import-outside-toplevel
+    from packaging.requirements import InvalidRequirement, Requirement
+    try:
+        requirement = Requirement(line)
+    except InvalidRequirement:
+        return []
+    if requirement.marker or requirement.url or not requirement.specifier:
+        return []
+    return [(canonical_name(requirement.name), path, requirement.specifier)]
+
+
+def _satisfiable(specifier_sets):
+    """Whether some version matches all specifier sets.
+
+    Versions around each version mentioned in specifiers are tried,
+    which is enough for intervals that specifiers define.
+
+    >>> from packaging.specifiers import SpecifierSet
+    >>> _satisfiable([SpecifierSet('>=1.0'), SpecifierSet('<2,!=1.5')])
+    True
+    >>> _satisfiable([SpecifierSet('>1.0'), SpecifierSet('<1.0.1')])
+    True
+    >>> _satisfiable([SpecifierSet('==1.*'), SpecifierSet('<1.0')])
+    False
+    >>> _satisfiable([SpecifierSet('==1.0'), SpecifierSet('==2.0')])
+    False
+    """
+    # pylint: disable=import-outside-toplevel
+    from packaging.specifiers import SpecifierSet
+    from packaging.version import InvalidVersion, Version
+    combined = SpecifierSet()
+    for specifier_set in specifier_sets:
+        combined &= specifier_set
+    candidates = set()
+    for specifier in combined:
+        if specifier.operator == '===':
+            return True
+        try:
+            version = Version(specifier.version.replace('.*', ''))
+        except InvalidVersion:
+            return True
+        candidates.update(_neighbours(version))
+    return not candidates or any(
+        combined.contains(candidate, prereleases=True) for candidate in candidates
+    )
+
+
+def _neighbours(version):
+    """Return version and final releases right above and below it.
+
+    >>> from packaging.version import Version
+    >>> [str(neighbour) for neighbour in _neighbours(Version('2.0rc1'))]
+    ['2.0rc1', '2.0.0.0.1', '1.999999']
+    """
+    # pylint: disable=import-outside-toplevel
+    from packaging.version import Version
+    epoch = '{0}!'.format(version.epoch) if version.epoch else ''
+    release = list(version.release)
+    above = release + [0] * (4 - len(release)) + [1]
+    result = [version, Version(epoch + '.'.join(map(str, above)))]
+    nonzero = [index for index, part in enumerate(release) if part]
+    if nonzero:
+        last = nonzero[-1]
+        below = release[:last] + [release[last] - 1, 999999]
+        result.append(Version(epoch + '.'.join(map(str, below))))
+    return result
+
+
+def _valid(version):
+    """Whether version is a valid PEP 440 version."""
+    # pylint: disable=import-outside-toplevel
+    from packaging.version import InvalidVersion, Version
+    try:
+        Version(version)
+    except InvalidVersion:
+        return False
+    return True
+
+
+def _unique(items):
+    """Return list of items without repetitions, keeping order."""
+    return list(dict.fromkeys(items))
@@ -0,0 +1,245 @@
+"""
+Resolve once
+============
+
+With :ref:`autoresolve`, every environment is resolved with the sink output as a constraint,
+after the sink itself is resolved. That's two resolver runs more than there are environments.
+
+This option resolves only the sink and derives lockfiles of all environments from it:
+
+.. code-block:: text
+
+    --resolve-once / --no-resolve-once
+                                  Resolve only sink environment and derive
+                                  other environments from its output.
+
+In configuration file, use ``resolve_once`` option::
+
+    [requirements]
+    autoresolve = True
+    resolve_once = True
+
+Dependency graph of the sink is reconstructed from ``# via`` comments
+of its resolver output, before ``--compatible`` and ``--forbid-post`` are applied.
+Environment gets packages that its input file and files it references require directly,
+and all their dependencies.
+Then packages of referenced environments are removed as usual.
+Entries of ``# via`` comments that point to other environments' packages and files are dropped.
+
+Package versions are the same as with plain ``--autoresolve``,
+because there every environment is constrained by the sink anyway.
+Option lines and comments, that are not part of package entries, are copied from the sink.
+Every other entry, including editable and local requirements, gets into the environment
+only if its ``# via`` comment leads to the environment's input files.
+The option has no effect if there's no sink, e.g. when ``--autoresolve`` is disabled.
+"""
+
+import os
+import re
+import logging
+
+from pipcompilemulti.lockfile import LockFile
+from pipcompilemulti.tokenizer import SectionTokenizer
+from .base import BaseFeature, ClickOption
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+class ResolveOnce(BaseFeature):
+    """Derive lockfiles of environments from sink resolver output."""
+
+    OPTION_NAME = 'resolve_once'
+    CLICK_OPTION = ClickOption(
+        long_option='--resolve-once/--no-resolve-once',
+        is_flag=True,
+        default=False,
+        help_text='Resolve only sink environment and derive other environments from its output.',
+    )
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._graphs = {}
+
+    @property
+    def enabled(self):
+        """Whether feature is enabled."""
+        return bool(self.value)
+
+    def reset(self):
+        """Forget sink outputs of the previous run."""
+        self._graphs = {}
+
+    def on_sink_locked(self, sink_in_path, lockfile):
+        """Save resolver output of sink environment.
+
+        Lockfile is expected to be the raw resolver output.
+        Lockfile restored from cache or from previous run is already fixed,
+        which works too, as long as fixed entries keep their ``# via`` comments.
+        """
+        if self.enabled:
+            self._graphs[os.path.normpath(sink_in_path)] = SinkGraph(lockfile)
+
+    def lockfile_for(self, in_path, ref_paths):
+        """Return lockfile of in_path derived from its sink or None.
+
+        Args:
+            in_path: input file of environment.
+            ref_paths: input files that in_path references recursively.
+        """
+        sink_path = self._controller.autoresolve.sink_path(in_path)
+        graph = sink_path and self._graphs.get(os.path.normpath(sink_path))
+        if not graph:
+            return None
+        logger.info("Deriving %s from resolved %s", in_path, sink_path)
+        return graph.slice([in_path] + list(ref_paths))
+
+
+class SinkGraph:  # pylint: disable=too-few-public-methods
+    r"""Dependency graph of lockfile reconstructed from ``# via`` comments.
+
+    >>> graph = SinkGraph(LockFile(sections=[
+    ...     '--index-url https://pypi.org/simple',
+    ...     'certifi==1\n    # via requests',
+    ...     'requests==2\n    # via\n    #   -r all.in\n    #   -r test.in',
+    ...     'six==1\n    # via -r base.in',
+    ... ]))
+    >>> print(graph.slice(['test.in', 'base.in']).serialize(), end='')
+    --index-url https://pypi.org/simple
+    certifi==1
+        # via requests
+    requests==2
+        # via -r test.in
+    six==1
+        # via -r base.in
+    >>> print(graph.slice(['base.in']).serialize(), end='')
+    --index-url https://pypi.org/simple
+    six==1
+        # via -r base.in
+    """
+
+    RE_VIA = re.compile(r'^(?P<indent>\s*)# via(?: (?P<items>.+))?$')
+    RE_VIA_ITEM = re.compile(r'^\s*#\s{2,}(?P<item>\S.*)$')
+    RE_SPECIFIER = re.compile(r'^(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*[~=<>!]=')
+    RE_EDITABLE = re.compile(r'^(?:-e|--editable)\s+(?:file:)?(?P<path>[^\s#;]+)')
+
+    def __init__(self, lockfile):
+        self.lockfile = lockfile
+        # Packages required directly by each input file:
+        self._by_source = {}
+        # Packages each package requires:
+        self._requires = {}
+        self._names = []
+        for section in lockfile.sections:
+            name = self._node_name(section)
+            self._names.append(name)
+            if name is None:
+                continue
+            for item in self._via_items(section):
+                if item.startswith('-r '):
+                    source = os.path.normpath(item[3:].strip())
+                    self._by_source.setdefault(source, set()).add(name)
+                elif not item.startswith('-'):
+                    self._requires.setdefault(canonical_name(item), set()).add(name)
+
+    def slice(self, in_paths):
+        """Return lockfile with packages required by in_paths and their dependencies."""
+        sources = {os.path.normpath(in_path) for in_path in in_paths}
+        closure = set()
+        to_visit = [
+            name
+            for source in sources
+            for name in self._by_source.get(source, ())
+        ]
+        while to_visit:
+            name = to_visit.pop()
+            if name not in closure:
+                closure.add(name)
+                to_visit.extend(self._requires.get(name, ()))
+        return LockFile(
+            header=self.lockfile.header,
+            sections=[
+                section if name is None else self._filter_via(section, sources, closure)
+                for section, name in zip(self.lockfile.sections, self._names)
+                if name is None or name in closure
+            ],
+        )
+
+    @classmethod
+    def _node_name(cls, section):
+        r"""Return canonical name of requirement in section, or None for option and comment lines.
+
+        >>> SinkGraph._node_name('Internal_Lib~=1.2\n    # via -r a.in')
+        'internal-lib'
+        >>> SinkGraph._node_name('-e ./libs/LocalPkg/\n    # via -r a.in')
+        'localpkg'
+        >>> SinkGraph._node_name('--index-url https://pypi.org/simple') is None
+        True
+        """
+        line = section.lstrip()
+        if not line or line.startswith('#') or (
+                line.startswith('--') and not line.startswith('--editable')):
+            return None
+        tokens = SectionTokenizer(section).tokenize()
+        if tokens is not None:
+            return canonical_name(tokens.package)
+        matched = cls.RE_SPECIFIER.match(line)
+        if matched:
+            return canonical_name(matched.group('name'))
+        matched = cls.RE_EDITABLE.match(line)
+        if matched:
+            # Dependencies of local project refer to it by its name,
+            # that is usually the name of its directory.
+            return canonical_name(os.path.basename(matched.group('path').rstrip('/')))
+        return line.split('\n', 1)[0].strip()
+
+    @classmethod
+    def _via_items(cls, section):
+        return cls._via_block(section.split('\n'))[2]
+
+    @classmethod
+    def _via_block(cls, lines):
+        """Return start and end line indices and items of via comment."""
+        for start, line in enumerate(lines):
+            matched = cls.RE_VIA.match(line)
+            if not matched or start == 0:
+                continue
+            if matched.group('items'):
+                return start, start + 1, [matched.group('items').strip()]
+            end, items = start + 1, []
+            while end < len(lines):
+                item = cls.RE_VIA_ITEM.match(lines[end])
+                if not item:
+                    break
+                items.append(item.group('item').strip())
+                end += 1
+            return start, end, items
+        return 0, 0, []
+
+    @classmethod
+    def _filter_via(cls, section, sources, closure):
+        """Drop via items that refer to files and packages outside of the slice."""
+        lines = section.split('\n')
+        start, end, items = cls._via_block(lines)
+        kept = [
+            item for item in items
+            if (os.path.normpath(item[3:].strip()) in sources if item.startswith('-r ')
+                else item.startswith('-') or canonical_name(item) in closure)
+        ]
+        if kept == items or not kept:
+            return section
+        indent = cls.RE_VIA.match(lines[start]).group('indent')
+        if len(kept) == 1:
+            via = [indent + '# via ' + kept[0]]
+        else:
+            via = [indent + '# via'] + [indent + '#   ' + item for item in kept]
+        return '\n'.join(lines[:start] + via + lines[end:])
+
+
+def canonical_name(name):
+    """Normalize package name as in PEP 503, dropping extras.
+
+    >>> canonical_name('Zope_Interface[docs]')
+    'zope-interface'
+    """
+    return re.sub(r'[-_.]+', '-', name.split('[', 1)[0]).lower().strip()
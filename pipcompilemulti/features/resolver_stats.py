@@ -0,0 +1,150 @@
+"""
+Resolver resource usage
+=======================
+
+After locking, ``pip-compile-multi`` logs a table with wall time,
+user and system CPU time and peak memory (resident set size)
+of the resolver run for each environment, sorted by wall time,
+with number of retries and timeouts (see ``--retries`` and ``--resolve-timeout``):
+
+.. code-block:: text
+
+    Resolver resource usage:
+    Environment                     Wall, s  User, s  System, s  Peak RSS, MiB Retries Timeouts
+    requirements/test.in              41.20    12.31       1.02          143.8       1        1
+    requirements/base.in              18.75     6.40       0.61          121.5       0        0
+    Total                             59.95    18.71       1.63          143.8       1        1
+
+Time of retried environments is summed over all runs.
+
+CPU time and memory are measured for resolver subprocesses,
+and not available with ``--in-process`` resolver or on Windows.
+The table helps to find environments that dominate lock time and memory,
+and to pick ``--jobs``: CPU time well below wall time means that resolver waits for network,
+and peak memory multiplied by number of jobs should fit in available memory.
+
+To save the same data in JSON format, use:
+
+.. code-block:: text
+
+    --stats-json FILE  Write resource usage of resolver runs to this JSON file.
+
+In configuration file, use ``stats_json`` option::
+
+    [requirements]
+    stats_json = resolver-stats.json
+"""
+
+import json
+import logging
+import threading
+
+from .base import BaseFeature, ClickOption
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+class ResolverStats(BaseFeature):
+    """Collect resource usage of resolver runs."""
+
+    OPTION_NAME = 'stats_json'
+    CLICK_OPTION = ClickOption(
+        long_option='--stats-json',
+        help_text='Write resource usage of resolver runs to this JSON file.',
+    )
+    ROW = '{0:<30} {1:>8} {2:>8} {3:>10} {4:>14} {5:>7} {6:>8}'
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._records = []
+        self._reported = 0
+        self._lock = threading.Lock()
+
+    def record(self, in_path, usage, retries=0, timeouts=0):
+        """Save resource usage of resolver runs for in_path with number of retries and timeouts."""
+        if usage is None:
+            return
+        with self._lock:
+            self._records.append({
+                'env': in_path,
+                'section': self._controller.trace.section,
+                'wall': usage.wall,
+                'user': usage.user,
+                'system': usage.system,
+                'max_rss': usage.max_rss,
+                'retries': retries,
+                'timeouts': timeouts,
+            })
+
+    def report(self):
+        """Log records added since the previous report and write all of them to JSON file."""
+        with self._lock:
+            records = self._records[self._reported:]
+            self._reported = len(self._records)
+        if records:
+            logger.info("Resolver resource usage:")
+            for line in self.summary(records):
+                logger.info("%s", line)
+        if self.value:
+            with open(self.value, 'wt', encoding='utf-8') as fp:
+                json.dump({'resolver_runs': self.records()}, fp, indent=2)
+
+    def records(self):
+        """Return all saved records."""
+        with self._lock:
+            return list(self._records)
+
+    @classmethod
+    def summary(cls, records):
+        """Return lines of table with records sorted by wall time and totals.
+
+        >>> from pipcompilemulti.resolver import ResourceUsage
+        >>> from pipcompilemulti.features import FEATURES
+        >>> stats = ResolverStats(FEATURES)
+        >>> stats.record('base.in', ResourceUsage(2.5, 1.5, 0.25, 100 * 2 ** 20))
+        >>> stats.record('test.in', ResourceUsage(4.0, None, None, None), retries=1, timeouts=1)
+        >>> for line in stats.summary(stats.records()):
+        ...     print(line)
+        Environment                     Wall, s  User, s  System, s  Peak RSS, MiB Retries Timeouts
+        test.in                            4.00        -          -              -       1        1
+        base.in                            2.50     1.50       0.25          100.0       0        0
+        Total                              6.50     1.50       0.25          100.0       1        1
+        """
+        lines = [cls.ROW.format(
+            'Environment', 'Wall, s', 'User, s', 'System, s', 'Peak RSS, MiB',
+            'Retries', 'Timeouts',
+        )]
+        for record in sorted(records, key=lambda record: -record['wall']):
+            lines.append(cls._row(record['env'], record))
+        lines.append(cls._row('Total', {
+            'wall': sum(record['wall'] for record in records),
+            'user': cls._total(records, 'user', sum),
+            'system': cls._total(records, 'system', sum),
+            'max_rss': cls._total(records, 'max_rss', max),
+            'retries': sum(record['retries'] for record in records),
+            'timeouts': sum(record['timeouts'] for record in records),
+        }))
+        return lines
+
+    @classmethod
+    def _row(cls, name, record):
+        max_rss = record['max_rss']
+        return cls.ROW.format(
+            name,
+            cls._seconds(record['wall']),
+            cls._seconds(record['user']),
+            cls._seconds(record['system']),
+            '-' if max_rss is None else '{0:.1f}'.format(max_rss / 2 ** 20),
+            record['retries'],
+            record['timeouts'],
+        )
+
+    @staticmethod
+    def _seconds(value):
+        return '-' if value is None else '{0:.2f}'.format(value)
+
+    @staticmethod
+    def _total(records, key, aggregate):
+        values = [record[key] for record in records if record[key] is not None]
+        return aggregate(values) if values else None
@@ -0,0 +1,159 @@
+"""
+Resume interrupted run
+======================
+
+When one environment fails to compile, e.g. because of a network error,
+the whole run stops, and the next run starts again from the first environment.
+With ``--resume`` ``pip-compile-multi`` keeps a journal of environments it completed,
+and the next run with ``--resume`` skips them:
+
+.. code-block:: text
+
+    --resume    Skip environments completed by the previous interrupted run.
+
+In configuration file, use ``resume`` option::
+
+    [requirements]
+    resume = True
+
+Journal entry has digest of environment inputs (the same as lock cache uses)
+taken after its output file was written.
+Environment is skipped only when the digest still matches,
+i.e. its input files, locked files of referenced environments, resolver options
+and its own output file are the same.
+Skipped environments are read from their output files,
+so packages of referenced environments are still removed from the rest.
+
+Journal is removed after the run succeeds.
+Runs without ``--resume`` neither read nor write it,
+so the flag must be passed to the interrupted run too,
+e.g. by setting it in configuration file of a CI job that is retried.
+Journal is stored in ``$XDG_CACHE_HOME/pip-compile-multi/journals``
+(``~/.cache/pip-compile-multi/journals`` by default).
+When it can't be written, the run goes on without it.
+
+When using ``requirements`` command, pass the flag to ``lock`` or ``upgrade``::
+
+    requirements lock --resume
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+from pipcompilemulti.utils import user_cache_dir
+from .base import BaseFeature, ClickOption
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+class Resume(BaseFeature):
+    """Journal of completed environments to resume interrupted run."""
+
+    OPTION_NAME = 'resume'
+    CLICK_OPTION = ClickOption(
+        long_option='--resume',
+        is_flag=True,
+        default=False,
+        help_text='Skip environments completed by the previous interrupted run.',
+    )
+
+    def __init__(self, controller):
+        self._controller = controller
+        self._path = None
+        self._completed = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Whether completed environments are skipped."""
+        return bool(self.value)
+
+    @property
+    def path(self):
+        """Path of the journal for current requirements directories."""
+        roots = sorted(os.path.abspath(root) for root in self._controller.base_dir.roots())
+        name = hashlib.sha1(json.dumps(roots).encode('utf-8')).hexdigest()
+        return user_cache_dir('journals', name + '.jsonl')
+
+    def start(self):
+        """Load journal of the previous run and keep appending to it, if resuming."""
+        if not self.enabled:
+            with self._lock:
+                self._path, self._completed = None, {}
+            return
+        path = self.path
+        completed = self._load(path)
+        if completed:
+            logger.info("Resuming run with %d completed environments", len(completed))
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wt', encoding='utf-8') as fp:
+                fp.writelines(
+                    json.dumps({'env': env, 'digest': digest}) + '\n'
+                    for env, digest in completed.items()
+                )
+        except OSError as ex:
+            logger.warning("Can't write journal %s: %s", path, ex)
+            path = None
+        with self._lock:
+            self._path = path
+            self._completed = completed
+
+    def finish(self):
+        """Remove journal after successful run."""
+        with self._lock:
+            path, self._path, self._completed = self._path, None, {}
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def completed(self, in_path, digest):
+        """Whether in_path was completed by the previous run with the same inputs.
+
+        Digest is a function returning digest of current environment inputs,
+        only called when resuming.
+        """
+        with self._lock:
+            recorded = self._completed.get(os.path.abspath(in_path))
+        return recorded is not None and recorded == digest()
+
+    def record(self, in_path, digest):
+        """Append entry for completed in_path to the journal.
+
+        Digest is a function, only called while journal is kept.
+        """
+        if self._path is None:
+            return
+        line = json.dumps({'env': os.path.abspath(in_path), 'digest': digest()}) + '\n'
+        with self._lock:
+            if self._path is None:
+                return
+            try:
+                with open(self._path, 'at', encoding='utf-8') as fp:
+                    fp.write(line)
+            except OSError as ex:
+                logger.warning("Can't write journal %s: %s", self._path, ex)
+                self._path = None
+
+    @staticmethod
+    def _load(path):
+        """Return mapping from environment path to the last recorded digest."""
+        completed = {}
+        try:
+            with open(path, 'rt', encoding='utf-8') as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Run was killed in the middle of writing entry.
+                        continue
+                    completed[entry['env']] = entry['digest']
+        except OSError:
+            pass
+        return completed
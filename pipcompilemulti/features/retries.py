@@ -0,0 +1,131 @@
+"""
+Resolver timeout and retries
+============================
+
+Resolver downloads package index pages and metadata,
+and a stalled connection to the index can keep it waiting forever.
+To stop resolver that runs for too long, pass timeout in seconds:
+
+.. code-block:: text
+
+    --resolve-timeout SECONDS  Stop resolver of environment that runs longer
+                               than this number of seconds.
+
+Network errors make resolver fail even when requirements are fine.
+To run resolver again after such failures, pass the number of retries:
+
+.. code-block:: text
+
+    --retries INTEGER  Retry resolver after network errors and timeouts
+                       this many times (default 0).
+
+In configuration file, use ``resolve_timeout`` and ``retries`` options::
+
+    [requirements]
+    resolve_timeout = 600
+    retries = 2
+
+Only transient failures are retried, i.e. timeouts and runs
+with network or HTTP errors in the output, like connection errors,
+read timeouts and 5xx responses from the index.
+Failures to resolve requirements, like conflicting dependencies, fail at once.
+Before each retry ``pip-compile-multi`` waits for 2, 4, 8 and so on seconds, up to a minute.
+
+Number of retries and timeouts of each environment is reported in resolver resource usage table.
+With ``--log-dir``, output of every attempt is kept in the log file of the environment.
+Timeout doesn't apply to ``--in-process`` resolver.
+"""
+
+import re
+
+from .base import BaseFeature, ClickOption
+
+
+class ResolveTimeout(BaseFeature):
+    """Maximum duration of a single resolver run."""
+
+    OPTION_NAME = 'resolve_timeout'
+    CLICK_OPTION = ClickOption(
+        long_option='--resolve-timeout',
+        help_text='Stop resolver of environment that runs longer than this number of seconds.',
+    )
+
+    @property
+    def seconds(self):
+        """Timeout in seconds or None if resolver can run forever.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[ResolveTimeout.OPTION_NAME] = '90'
+        >>> ResolveTimeout().seconds
+        90.0
+        >>> del OPTIONS[ResolveTimeout.OPTION_NAME]
+        >>> ResolveTimeout().seconds is None
+        True
+        """
+        if not self.value:
+            return None
+        return float(self.value)
+
+
+class Retries(BaseFeature):
+    """Retry policy for transient resolver failures."""
+
+    OPTION_NAME = 'retries'
+    CLICK_OPTION = ClickOption(
+        long_option='--retries',
+        help_text='Retry resolver after network errors and timeouts this many times (default 0).',
+    )
+    FIRST_DELAY = 2
+    MAX_DELAY = 60
+    RE_TRANSIENT = re.compile(
+        r'ConnectionError|Connection (?:aborted|refused|reset)|RemoteDisconnected'
+        r'|NewConnectionError|ConnectTimeoutError|ReadTimeoutError|Read timed out'
+        r'|Max retries exceeded|IncompleteRead|ProtocolError|ChunkedEncodingError'
+        r'|Temporary failure in name resolution|Name or service not known'
+        r'|HTTP error 5\d\d|\b5\d\d (?:Server Error|Service Unavailable|Bad Gateway)'
+        r'|429 Too Many Requests|error sending request|operation timed out',
+        re.IGNORECASE,
+    )
+    RE_DETERMINISTIC = re.compile(
+        r'ResolutionImpossible|conflicting dependencies|Cannot install|No solution found',
+    )
+
+    @property
+    def count(self):
+        """Maximum number of retries."""
+        return max(0, int(self.value or 0))
+
+    def delay(self, attempt, result):
+        """Return seconds to wait before retrying failed run, or None to give up.
+
+        Args:
+            attempt: number of runs made so far, starting with 1.
+            result: ResolverResult of the last run.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> from pipcompilemulti.resolver import ResolverResult
+        >>> OPTIONS[Retries.OPTION_NAME] = '2'
+        >>> failure = ResolverResult(1, None, b'ReadTimeoutError: Read timed out.')
+        >>> [Retries().delay(attempt, failure) for attempt in [1, 2, 3]]
+        [2, 4, None]
+        >>> Retries().delay(1, ResolverResult(1, None, b'ResolutionImpossible'))
+        >>> del OPTIONS[Retries.OPTION_NAME]
+        >>> Retries().delay(1, failure)
+        """
+        if result.returncode == 0 or attempt > self.count:
+            return None
+        if not (result.timed_out or self.is_transient(result.stdout, result.stderr)):
+            return None
+        return min(self.MAX_DELAY, self.FIRST_DELAY * 2 ** (attempt - 1))
+
+    @classmethod
+    def is_transient(cls, *outputs):
+        """Whether resolver output has network errors and no resolution errors.
+
+        >>> Retries.is_transient(b'Max retries exceeded with url: /simple/six/', None)
+        True
+        >>> Retries.is_transient(b'ConnectionError', b'ResolutionImpossible')
+        False
+        """
+        text = '\n'.join(output.decode('utf-8', 'replace') for output in outputs if output)
+        return bool(cls.RE_TRANSIENT.search(text)) and not cls.RE_DETERMINISTIC.search(text)
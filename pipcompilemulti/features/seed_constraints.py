@@ -0,0 +1,81 @@
+"""
+Seed constraints
+================
+
+Environment that references other environments, e.g. ``test.in`` with ``-r base.in``,
+is resolved together with all packages of referenced environments.
+Those packages are dropped from its output file afterwards,
+because they are already pinned in ``base.txt``.
+
+Environments are compiled in topological order of references,
+so referenced environments are always locked first.
+Their pinned versions are passed to the resolver as a constraints file,
+so that it doesn't search for versions of packages that are already decided,
+and only explores packages new to the environment.
+It makes resolution of long reference chains cheaper.
+
+Output files stay the same: packages of referenced environments were required
+to have the same versions anyway, otherwise compilation failed with a conflict.
+Packages installed from URLs and VCS are not constrained.
+
+When :ref:`autoresolve` is enabled, all environments are already constrained by the sink output,
+and no extra constraints file is passed.
+
+.. code-block:: text
+
+    --seed-constraints / --no-seed-constraints
+                                  Constrain resolver with versions locked in
+                                  referenced environments.
+
+To disable the feature, set it to ``False`` in a configuration file::
+
+    [requirements]
+    seed_constraints = False
+"""
+
+from .base import BaseFeature, ClickOption
+from .resolve_once import canonical_name
+
+
+class SeedConstraints(BaseFeature):
+    """Constrain resolver with versions of referenced environments."""
+
+    OPTION_NAME = 'seed_constraints'
+    CLICK_OPTION = ClickOption(
+        long_option='--seed-constraints/--no-seed-constraints',
+        is_flag=True,
+        default=True,
+        help_text='Constrain resolver with versions locked in referenced environments.',
+    )
+
+    @property
+    def enabled(self):
+        """Whether feature is enabled."""
+        return bool(self.value)
+
+    def constraint_lines(self, packages):
+        """Return sorted constraint lines for mapping from package name to version.
+
+        Packages without version, like ones installed from URLs, are skipped.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[SeedConstraints.OPTION_NAME] = True
+        >>> SeedConstraints().constraint_lines({
+        ...     'six': '1.16.0', 'Zope.Interface[docs]': '5.0', 'pkg': '', 'lib': None,
+        ... })
+        ['six==1.16.0', 'zope-interface==5.0']
+        >>> OPTIONS[SeedConstraints.OPTION_NAME] = False
+        >>> SeedConstraints().constraint_lines({'six': '1.16.0'})
+        []
+        >>> del OPTIONS[SeedConstraints.OPTION_NAME]
+        """
+        if not self.enabled:
+            return []
+        pins = {}
+        for name, version in packages.items():
+            if version:
+                pins.setdefault(canonical_name(name), version)
+        return sorted(
+            '{0}=={1}'.format(name, version)
+            for name, version in pins.items()
+        )
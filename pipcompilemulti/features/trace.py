@@ -0,0 +1,120 @@
+"""
+Trace
+=====
+
+Record how long each step of the run took and write it in Chrome trace event format,
+that can be opened in `Perfetto <https://ui.perfetto.dev>`_ or ``chrome://tracing``.
+
+.. code-block:: text
+
+    --trace FILE  Write Chrome trace event JSON of the run to FILE.
+
+In configuration file, use ``trace`` option::
+
+    [requirements]
+    trace = trace.json
+
+Trace has spans for environment discovery, features configuration,
+and for each environment: resolver run, lockfile post-processing,
+header and references replacement and writing of the output file.
+Spans are tagged with environment input file and configuration section,
+and placed on the timeline of the thread that ran them,
+so that parallel compilation (see ``--jobs``) is visible.
+When configuration file has several sections, all of them go to the same trace.
+
+When using ``requirements`` command, pass the option to ``lock`` or ``upgrade``::
+
+    requirements lock --trace trace.json
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+from .base import BaseFeature, ClickOption
+
+
+class Trace(BaseFeature):
+    """Collect trace events and write them to a file."""
+
+    OPTION_NAME = 'trace'
+    CLICK_OPTION = ClickOption(
+        long_option='--trace',
+        help_text='Write Chrome trace event JSON of the run to this file.',
+    )
+
+    def __init__(self):
+        self.section = None
+        self._events = []
+        self._threads = set()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        """Whether trace is recorded."""
+        return bool(self.value)
+
+    @contextlib.contextmanager
+    def span(self, name, **args):
+        """Record duration of the block as complete event with given arguments.
+
+        >>> from pipcompilemulti.options import OPTIONS
+        >>> OPTIONS[Trace.OPTION_NAME] = 'trace.json'
+        >>> trace = Trace()
+        >>> with trace.span('fix_lockfile', env='base.in'):
+        ...     pass
+        >>> event = trace.events()[-1]
+        >>> event['name'], event['ph'], event['args']
+        ('fix_lockfile', 'X', {'env': 'base.in'})
+        >>> del OPTIONS[Trace.OPTION_NAME]
+        """
+        if not self.enabled:
+            yield
+            return
+        if self.section is not None:
+            args['section'] = self.section
+        started = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            finished = time.perf_counter_ns()
+            self._add_event({
+                'name': name,
+                'cat': 'pip-compile-multi',
+                'ph': 'X',
+                'ts': started / 1000,
+                'dur': (finished - started) / 1000,
+                'args': args,
+            })
+
+    def events(self):
+        """Return recorded events."""
+        with self._lock:
+            return list(self._events)
+
+    def save(self):
+        """Write all recorded events to the trace file."""
+        if not self.enabled:
+            return
+        with open(self.value, 'wt', encoding='utf-8') as fp:
+            json.dump({
+                'traceEvents': self.events(),
+                'displayTimeUnit': 'ms',
+            }, fp)
+
+    def _add_event(self, event):
+        thread = threading.current_thread()
+        event.update(pid=os.getpid(), tid=thread.ident)
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads.add(thread.ident)
+                self._events.append({
+                    'name': 'thread_name',
+                    'ph': 'M',
+                    'pid': event['pid'],
+                    'tid': thread.ident,
+                    'args': {'name': thread.name},
+                })
+            self._events.append(event)
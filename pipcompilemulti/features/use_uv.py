@@ -26,12 +26,7 @@ To use UV:
 - Pass ``--uv`` flag to ``pip-compile-multi``
   or add ``uv = True`` when using ``requirements`` command.
 """
-try:
-    import uv  #
-    del uv
-    UV_AVAILABLE = True
-except ImportError:
-    UV_AVAILABLE = False
+import importlib.util
 
 from .base import BaseFeature, ClickOption
 
@@ -54,5 +49,5 @@ class UseUV(BaseFeature):
 
     @staticmethod
     def is_available():
-        """Check if uv package is available"""
-        return UV_AVAILABLE
+        """Check if uv package is available without importing it."""
+        return importlib.util.find_spec('uv') is not None
@@ -0,0 +1,154 @@
+"""Reference graph of discovered environments."""
+
+import os
+
+from .utils import DisjointSet, fix_reference_path
+
+
+class EnvGraph(object):
+    """Environments and references between them with precomputed closures.
+
+    Iterating the graph yields environment configurations
+    in the order they were passed,
+    so it can be used everywhere a list of configurations is expected.
+
+    Each environment gets a bit index,
+    and transitive closures are stored as integer bit sets,
+    computed once with a single depth-first traversal.
+    Connected components are found once with union-find.
+    Queries return memoized frozensets of normalized in_paths.
+
+    >>> graph = EnvGraph([
+    ...     {'in_path': 'base', 'refs': set()},
+    ...     {'in_path': 'test', 'refs': {'base'}},
+    ...     {'in_path': 'docs', 'refs': set()},
+    ...     {'in_path': 'local', 'refs': {'test', 'docs'}},
+    ... ])
+    >>> sorted(graph.ancestors('local'))
+    ['base', 'docs', 'test']
+    >>> sorted(graph.descendants('base'))
+    ['local', 'test']
+    >>> graph.sink()
+    'local'
+    """
+
+    def __init__(self, env_confs):
+        self._confs = list(env_confs)
+        self._index = {}
+        self._paths = []
+        self._refs = []
+        for conf in self._confs:
+            self._add_node(os.path.normpath(conf['in_path']))
+        for conf in self._confs:
+            node = self._index[os.path.normpath(conf['in_path'])]
+            for ref in conf['refs']:
+                self._refs[node] |= 1 << self._add_node(
+                    fix_reference_path(conf['in_path'], ref)
+                )
+        referenced_by = [0] * len(self._paths)
+        for node, refs in enumerate(self._refs):
+            for ref in self._iter_bits(refs):
+                referenced_by[ref] |= 1 << node
+        self._ancestors = self._closure(self._refs)
+        self._descendants = self._closure(referenced_by)
+        self._cache = {}
+        clusters = DisjointSet(self._paths)
+        for node, refs in enumerate(self._refs):
+            for ref in self._iter_bits(refs):
+                clusters.union(self._paths[node], self._paths[ref])
+        for members in clusters.groups().values():
+            for path in members:
+                self._cache[('cluster', path)] = members
+
+    @classmethod
+    def of(cls, env_confs):
+        """Return env_confs if it's already a graph, otherwise build one."""
+        if isinstance(env_confs, cls):
+            return env_confs
+        return cls(env_confs)
+
+    def __iter__(self):
+        return iter(self._confs)
+
+    def __len__(self):
+        return len(self._confs)
+
+    def references(self, in_path):
+        """Return set of environments directly referenced by in_path."""
+        return self._query('references', in_path, self._refs)
+
+    def ancestors(self, in_path):
+        """Return set of environments referenced by in_path directly or indirectly."""
+        return self._query('ancestors', in_path, self._ancestors)
+
+    def descendants(self, in_path):
+        """Return set of environments referencing in_path directly or indirectly."""
+        return self._query('descendants', in_path, self._descendants)
+
+    def cluster(self, in_path):
+        """Return set of environments connected to in_path by references in any direction.
+
+        The set includes in_path itself.
+        """
+        path = os.path.normpath(in_path)
+        return self._cache.get(('cluster', path)) or frozenset([path])
+
+    def sink(self):
+        """Return environment that references all other environments or None."""
+        everything = 0
+        for conf in self._confs:
+            everything |= 1 << self._index[os.path.normpath(conf['in_path'])]
+        for conf in self._confs:
+            node = self._index[os.path.normpath(conf['in_path'])]
+            if self._ancestors[node] | 1 << node == everything:
+                return conf['in_path']
+        return None
+
+    def _add_node(self, path):
+        if path not in self._index:
+            self._index[path] = len(self._paths)
+            self._paths.append(path)
+            self._refs.append(0)
+        return self._index[path]
+
+    def _query(self, kind, in_path, bit_sets):
+        key = (kind, os.path.normpath(in_path))
+        if key not in self._cache:
+            node = self._index.get(key[1])
+            bits = 0 if node is None else bit_sets[node]
+            self._cache[key] = self._paths_of(bits)
+        return self._cache[key]
+
+    def _paths_of(self, bits):
+        return frozenset(self._paths[node] for node in self._iter_bits(bits))
+
+    def _closure(self, edges):
+        """Return transitive closure of edges, given as a bit set per node."""
+        closure = [None] * len(edges)
+        for root in range(len(edges)):
+            if closure[root] is not None:
+                continue
+            stack = [root]
+            while stack:
+                node = stack[-1]
+                if closure[node] is None:
+                    # Mark as visited, so that cycles don't loop forever.
+                    closure[node] = 0
+                    stack.extend(
+                        child for child in self._iter_bits(edges[node])
+                        if closure[child] is None
+                    )
+                    continue
+                stack.pop()
+                bits = edges[node]
+                for child in self._iter_bits(edges[node]):
+                    bits |= closure[child]
+                closure[node] = bits
+        return closure
+
+    @staticmethod
+    def _iter_bits(bits):
+        while bits:
+            lowest = bits & -bits
+            yield lowest.bit_length() - 1
+            bits ^= lowest
@@ -0,0 +1,146 @@
+"""In-memory model of generated requirements file."""
+
+import os
+import re
+import shutil
+import tempfile
+
+
+RE_COMMENT = re.compile(r'^\s*#.*$')
+
+# Read process umask once, while there's only one thread:
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+class LockFile:
+    """Generated requirements file: header, references and dependency sections.
+
+    >>> lockfile = LockFile.parse([
+    ...     '# header\\n', 'six==1.0\\n', '    # via\\n', '    #   pkg\\n', 'click==7\\n',
+    ... ])
+    >>> lockfile.header
+    '# header\\n'
+    >>> lockfile.sections
+    ['six==1.0\\n    # via\\n    #   pkg', 'click==7']
+    >>> lockfile.references = ['base.txt']
+    >>> print(lockfile.serialize(), end='')
+    # header
+    -r base.txt
+    six==1.0
+        # via
+        #   pkg
+    click==7
+    """
+
+    def __init__(self, header='', references=None, sections=None):
+        self.header = header
+        self.references = list(references or [])
+        self.sections = list(sections or [])
+
+    @classmethod
+    def parse(cls, lines):
+        """Build lockfile from lines of text."""
+        header, body = split_header(lines)
+        return cls(
+            header=''.join(line.rstrip() + '\n' for line in header),
+            sections=parse_sections(concatenated(body)),
+        )
+
+    @classmethod
+    def read(cls, path):
+        """Build lockfile from file contents."""
+        with open(path, 'rt', encoding="utf-8") as fp:
+            return cls.parse(fp)
+
+    def fix_sections(self, fix):
+        """Replace each section with the result of fix, dropping Nones."""
+        fixed = (fix(section) for section in self.sections)
+        self.sections = [section for section in fixed if section is not None]
+
+    def serialize(self):
+        """Render lockfile to text."""
+        parts = [self.header]
+        parts.extend('-r {0}\n'.format(reference) for reference in self.references)
+        parts.extend(section + '\n' for section in self.sections)
+        return ''.join(parts)
+
+    def write(self, path):
+        """Atomically replace file at path with serialized lockfile."""
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(path) or '.',
+            prefix='.{0}.'.format(os.path.basename(path)),
+            suffix='.tmp',
+        )
+        try:
+            with open(fd, 'wt', encoding="utf-8") as fp:
+                fp.write(self.serialize())
+            if os.path.exists(path):
+                shutil.copymode(path, tmp_path)
+            else:
+                os.chmod(tmp_path, 0o666 & ~_UMASK)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def concatenated(fp):
+    r"""Read lines from fp concatenating on backslash (\\)
+
+    >>> list(concatenated([
+    ...     'pkg', 'pkg  # comment', 'pkg', '# comment', '# one more',
+    ...     'foo', '  # via', '', '  # pkg',
+    ... ]))
+    ['pkg', 'pkg  # comment', 'pkg', '# comment', '# one more', 'foo', '  # via', '', '  # pkg']
+    """
+    line_parts = []
+    for line in fp:
+        line = line.rstrip()
+        if line.endswith('\\'):
+            line_parts.append(line[:-1].rstrip())
+        else:
+            line_parts.append(line)
+            yield ' '.join(line_parts)
+            line_parts[:] = []
+    if line_parts:
+        # Impossible:
+        raise RuntimeError("Compiled file ends with backslash \\")
+
+
+def parse_sections(lines):
+    r"""Combine lines with following comments into sections.
+
+    >>> list(parse_sections([
+    ...     'pkg', 'pkg  # comment', 'pkg', '# comment', '# one more',
+    ...     'foo', '  # via', '', '  # pkg',
+    ... ]))
+    ['pkg', 'pkg  # comment', 'pkg\n# comment\n# one more', 'foo\n  # via', '\n  # pkg']
+    """
+    section = []
+    for line in lines:
+        if RE_COMMENT.match(line):
+            section.append(line)
+        else:
+            if section:
+                yield '\n'.join(section)
+            section = [line]
+    if section:
+        yield '\n'.join(section)
+
+
+def split_header(fp):
+    """
+    Read file pointer and return pair of lines lists:
+    first - header, second - the rest.
+    """
+    body_start, header_ended = 0, False
+    lines = []
+    for line in fp:
+        if line.startswith('#') and not header_ended:
+            # Header text
+            body_start += 1
+        else:
+            header_ended = True
+        lines.append(line)
+    return lines[:body_start], lines[body_start:]
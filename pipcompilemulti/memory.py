@@ -0,0 +1,112 @@
+"""Limit number of parallel resolvers by available memory."""
+
+import sys
+import logging
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+MIB = 2 ** 20
+
+
+class ProcMemory:
+    """Available memory and resident set size of processes read from ``/proc``.
+
+    Readings are None where ``/proc`` is not available, e.g. on macOS and Windows.
+    """
+
+    def __init__(self, root='/proc'):
+        self._root = root
+
+    def available(self):
+        """Return bytes of memory available for new processes or None."""
+        return self._read_kilobytes('meminfo', 'MemAvailable:')
+
+    def rss(self, pid):
+        """Return resident set size of process in bytes or None."""
+        return self._read_kilobytes('{0}/status'.format(pid), 'VmRSS:')
+
+    def _read_kilobytes(self, name, prefix):
+        try:
+            with open('{0}/{1}'.format(self._root, name), 'rt', encoding='utf-8') as fp:
+                for line in fp:
+                    if line.startswith(prefix):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            return None
+        return None
+
+
+class MemoryLimiter:
+    """Number of new resolvers that fit in available memory.
+
+    Every resolver is expected to take as much memory as the biggest one seen so far,
+    or ``INITIAL_ESTIMATE`` until the first one finishes.
+    Running resolvers can still grow up to that estimate,
+    so the memory they may take is subtracted from available memory
+    before new resolvers are admitted.
+    ``RESERVE`` is left for the rest of the system.
+    When nothing runs, one resolver is always admitted, so that locking makes progress.
+    """
+
+    RESERVE = 512 * MIB
+    INITIAL_ESTIMATE = 1024 * MIB
+    POLL_INTERVAL = 1.0
+
+    def __init__(self, pids, source=None, reserve=RESERVE, initial_estimate=INITIAL_ESTIMATE):
+        """
+        Args:
+            pids: function returning process IDs of running resolvers.
+            source: memory readings, ``ProcMemory`` by default.
+            reserve: bytes of available memory to leave unused.
+            initial_estimate: bytes expected to be taken by a resolver
+                before any resolver finished.
+        """
+        self._pids = pids
+        self._source = source or ProcMemory()
+        self._reserve = reserve
+        self._initial_estimate = initial_estimate
+        self._peaks = {}
+        self._finished_peak = None
+
+    def slots(self, running):
+        """Return number of resolvers that can be started while running tasks are running.
+
+        Tasks that haven't started resolver process yet are expected to take the estimate.
+        """
+        pids = set(self._pids())
+        self._update_peaks(pids)
+        available = self._source.available()
+        if available is None:
+            # Unknown, e.g. not on Linux.
+            return sys.maxsize
+        estimate = self.estimate()
+        growth = sum(max(0, estimate - self._peaks.get(pid, 0)) for pid in pids)
+        growth += estimate * max(0, running - len(pids))
+        slots = max(0, int((available - self._reserve - growth) // estimate))
+        if not running:
+            slots = max(1, slots)
+        if not slots:
+            logger.debug(
+                "Waiting for memory: %d MiB available, resolver needs %d MiB",
+                available // MIB, estimate // MIB,
+            )
+        return slots
+
+    def estimate(self):
+        """Return bytes of memory a resolver is expected to take."""
+        peaks = list(self._peaks.values())
+        if self._finished_peak is None:
+            return max([self._initial_estimate] + peaks)
+        return max([self._finished_peak] + peaks)
+
+    def _update_peaks(self, pids):
+        """Remember the highest RSS of each running resolver and of finished ones."""
+        for pid in pids:
+            rss = self._source.rss(pid)
+            if rss is not None:
+                self._peaks[pid] = max(rss, self._peaks.get(pid, 0))
+        for pid in list(self._peaks):
+            if pid not in pids:
+                peak = self._peaks.pop(pid)
+                self._finished_peak = max(peak, self._finished_peak or 0)
@@ -0,0 +1,399 @@
+"""Run dependency resolution command and collect its output."""
+
+import os
+import sys
+import time
+import logging
+import threading
+import contextlib
+import subprocess
+from collections import deque, namedtuple
+
+from .features import FEATURES
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+ResolverResult = namedtuple(
+    'ResolverResult', ['returncode', 'stdout', 'stderr', 'usage', 'timed_out'],
+    defaults=[None, False],
+)
+# Seconds of wall, user and system time and peak resident set size in bytes.
+# CPU time and memory are None when they can't be measured.
+ResourceUsage = namedtuple('ResourceUsage', ['wall', 'user', 'system', 'max_rss'])
+
+
+def run_subprocess(command, log_path=None, timeout=None, attempt=1):
+    """Run resolver in a subprocess and wait for it to finish.
+
+    Output is read as it is produced.
+    Only the last lines of each stream are kept in memory,
+    and all lines are copied to log_path if it is passed.
+    Output of retries (attempt above 1) is appended to the log.
+    Process is killed if it runs longer than timeout seconds.
+    """
+    started = time.perf_counter()
+    with open_log(log_path, attempt) as log, \
+            subprocess.Popen(command, **FEATURES.pipe_arguments()) as process:
+        with RUNNING.track(process), _deadline(process, timeout) as expired:
+            tails = _read_streams([process.stdout, process.stderr], log)
+            rusage = _reap(process)
+    if process.returncode != 0 and RUNNING.cancelled:
+        raise ResolverCancelled("Stopped {0}".format(' '.join(command)))
+    wall = time.perf_counter() - started
+    if rusage is None:
+        usage = ResourceUsage(wall, None, None, None)
+    else:
+        usage = ResourceUsage(wall, rusage.ru_utime, rusage.ru_stime, _max_rss_bytes(rusage))
+    stdout, stderr = [tail and tail.getvalue() for tail in tails]
+    return ResolverResult(process.returncode, stdout, stderr, usage, expired.is_set())
+
+
+@contextlib.contextmanager
+def _deadline(process, timeout):
+    """Kill process if the block runs longer than timeout seconds.
+
+    Yield event that is set if process was killed.
+    """
+    expired = threading.Event()
+    if timeout is None:
+        yield expired
+        return
+
+    def kill():
+        expired.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    try:
+        yield expired
+    finally:
+        timer.cancel()
+
+
+def total_usage(usages):
+    """Sum time of several runs and take the highest peak memory.
+
+    >>> total_usage([ResourceUsage(1.0, 0.5, None, 10), ResourceUsage(2.0, 0.25, None, 20)])
+    ResourceUsage(wall=3.0, user=0.75, system=None, max_rss=20)
+    """
+    def total(values, aggregate):
+        values = [value for value in values if value is not None]
+        return aggregate(values) if values else None
+    return ResourceUsage(
+        wall=sum(usage.wall for usage in usages),
+        user=total([usage.user for usage in usages], sum),
+        system=total([usage.system for usage in usages], sum),
+        max_rss=total([usage.max_rss for usage in usages], max),
+    )
+
+
+def _read_streams(streams, log):
+    """Read each stream line by line on its own thread until it's closed.
+
+    Return OutputTail for each stream, or None for streams that are None.
+    """
+    tails = [stream and OutputTail(log) for stream in streams]
+
+    def read(stream, tail):
+        with stream:
+            for line in stream:
+                tail.write(line)
+
+    readers = [
+        threading.Thread(target=read, args=(stream, tail), daemon=True)
+        for stream, tail in zip(streams, tails)
+        if stream is not None
+    ]
+    for reader in readers:
+        reader.start()
+    for reader in readers:
+        reader.join()
+    return tails
+
+
+def _reap(process):
+    """Wait for process to exit and return its resource usage if available.
+
+    ``Popen.wait`` loses resource usage, so use ``os.wait4`` where it exists.
+    """
+    if not hasattr(os, 'wait4'):
+        process.wait()
+        return None
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    except ChildProcessError:
+        # Already reaped by Popen.terminate racing with exit:
+        process.wait()
+        return None
+    # Popen.wait doesn't call waitpid once return code is known:
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return rusage
+
+
+class ResolverCancelled(RuntimeError):
+    """Resolver was stopped because locking of another environment failed."""
+
+
+class RunningProcesses:
+    """Resolver subprocesses that are running now, so that they can be stopped.
+
+    >>> running = RunningProcesses()
+    >>> running.cancel()
+    >>> running.cancelled
+    True
+    >>> running.reset()
+    >>> running.cancelled
+    False
+    """
+
+    def __init__(self):
+        self._processes = set()
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        """Whether processes were stopped since the last reset."""
+        return self._cancelled.is_set()
+
+    def pids(self):
+        """Return process IDs of running processes."""
+        with self._lock:
+            return [process.pid for process in self._processes]
+
+    def sleep(self, seconds):
+        """Wait for seconds, or less if cancel is called meanwhile."""
+        self._cancelled.wait(seconds)
+
+    @contextlib.contextmanager
+    def track(self, process):
+        """Stop process if cancel is called while in the block."""
+        with self._lock:
+            if self._cancelled.is_set():
+                process.terminate()
+            self._processes.add(process)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._processes.discard(process)
+
+    def cancel(self):
+        """Terminate running processes and any process started until reset."""
+        with self._lock:
+            self._cancelled.set()
+            processes = list(self._processes)
+        if processes:
+            logger.info("Stopping %d running resolver(s)", len(processes))
+        for process in processes:
+            process.terminate()
+
+    def reset(self):
+        """Allow processes to run again."""
+        with self._lock:
+            self._cancelled.clear()
+
+
+@contextlib.contextmanager
+def open_log(log_path, attempt=1):
+    """Open log_path for writing from multiple threads, or yield None if it's None.
+
+    Log is truncated on the first attempt, and later attempts are appended
+    after a separator line, so that output of failed runs is kept.
+    """
+    if log_path is None:
+        yield None
+        return
+    os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+    with open(log_path, 'wb' if attempt <= 1 else 'ab') as fp:
+        if attempt > 1:
+            fp.write('\n===== Attempt {0} =====\n'.format(attempt).encode('utf-8'))
+        yield _LockedWriter(fp)
+
+
+class _LockedWriter:  # pylint: disable=too-few-public-methods
+    """Binary file that is written by whole chunks from several threads."""
+
+    def __init__(self, fp):
+        self._fp = fp
+        self._lock = threading.Lock()
+
+    def write(self, data):
+        """Write bytes to file."""
+        with self._lock:
+            self._fp.write(data)
+
+
+class OutputTail:
+    """Last lines of output stream, optionally copied to a log as they come.
+
+    Accepts both text and bytes, so it can replace ``sys.stdout``.
+
+    >>> tail = OutputTail(max_lines=2)
+    >>> tail.write(b'one\\ntwo\\nthr')
+    >>> tail.write('ee\\n')
+    >>> tail.getvalue()
+    b'[1 earlier lines omitted]\\ntwo\\nthree\\n'
+    """
+
+    MAX_LINES = 1000
+
+    def __init__(self, log=None, max_lines=MAX_LINES):
+        self._lines = deque(maxlen=max_lines)
+        self._partial = b''
+        self._log = log
+        self._omitted = 0
+
+    def write(self, data):
+        """Add data to the stream."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if self._log is not None:
+            self._log.write(data)
+        lines = (self._partial + data).split(b'\n')
+        self._partial = lines.pop()
+        for line in lines:
+            if len(self._lines) == self._lines.maxlen:
+                self._omitted += 1
+            self._lines.append(line + b'\n')
+
+    def flush(self):
+        """Nothing is buffered outside of the tail."""
+
+    def getvalue(self):
+        """Return kept lines as bytes, or None if nothing was written."""
+        lines = list(self._lines)
+        if self._partial:
+            lines.append(self._partial)
+        if not lines:
+            return None
+        if self._omitted:
+            lines.insert(0, '[{0} earlier lines omitted]\n'.format(self._omitted).encode('utf-8'))
+        return b''.join(lines)
+
+
+def _max_rss_bytes(rusage):
+    """ru_maxrss is in kilobytes on Linux and in bytes on macOS."""
+    if sys.platform == 'darwin':
+        return rusage.ru_maxrss
+    return rusage.ru_maxrss * 1024
+
+
+class InProcessPipTools:
+    """Run pip-tools compile in the current interpreter.
+
+    One repository per set of pip arguments is shared between runs,
+    so that index pages and package metadata are fetched only once.
+    Runs are serialized, because pip is not thread-safe.
+    """
+
+    COMMAND_PREFIX = ['piptools', 'compile']
+    # Requirements file options that don't change pip configuration:
+    SAFE_OPTIONS = ('-r', '--requirement', '-c', '--constraint', '-e', '--editable', '--hash')
+
+    def __init__(self):
+        self._repositories = {}
+        self._lock = threading.Lock()
+
+    def run(self, command, file_paths, log_path=None, attempt=1):
+        """Run pip-tools compile command, e.g. ``['piptools', 'compile', ...]``.
+
+        Args:
+            command: pip-tools command with arguments.
+            file_paths: paths of all requirements files read by pip-tools.
+            log_path: file to copy output to.
+            attempt: number of the run, output of retries is appended to the log.
+        """
+        # pylint: disable=import-outside-toplevel
+        from piptools.scripts import compile as compile_script
+        if command[:2] != self.COMMAND_PREFIX:
+            raise ValueError("Not a pip-tools compile command: {0!r}".format(command))
+        # Option lines in requirements files alter pip configuration of the repository.
+        shared = not self.uses_pip_options(file_paths)
+        with open_log(log_path, attempt) as log:
+            capture = OutputTail(log)
+            with self._lock, self._preserve_logging(), self._redirect_output(capture):
+                started = time.perf_counter()
+                with self._patch_repository(compile_script, shared):
+                    returncode = self._main(compile_script.cli, command[2:])
+                # CPU time and memory of other threads can't be told apart:
+                usage = ResourceUsage(time.perf_counter() - started, None, None, None)
+        return ResolverResult(returncode, None, capture.getvalue(), usage)
+
+    @classmethod
+    def uses_pip_options(cls, file_paths):
+        """Whether any of requirements files has pip option lines."""
+        for path in file_paths:
+            try:
+                with open(path, 'rt', encoding='utf-8') as fp:
+                    for line in fp:
+                        line = line.strip()
+                        if line.startswith('-') and not line.startswith(cls.SAFE_OPTIONS):
+                            return True
+            except OSError:
+                continue
+        return False
+
+    @staticmethod
+    def _main(cli, args):
+        """Run click command returning exit code instead of exiting."""
+        # pylint: disable=import-outside-toplevel
+        import click
+        try:
+            cli.main(args=args, prog_name='pip-compile', standalone_mode=False)
+        except SystemExit as exc:
+            return exc.code if isinstance(exc.code, int) else 1
+        except click.ClickException as exc:
+            exc.show()
+            return exc.exit_code
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("pip-compile failed")
+            return 1
+        return 0
+
+    @contextlib.contextmanager
+    def _patch_repository(self, compile_script, shared):
+        original = compile_script.PyPIRepository
+        if shared:
+            compile_script.PyPIRepository = self._shared_repository_factory(original)
+        try:
+            yield
+        finally:
+            compile_script.PyPIRepository = original
+
+    def _shared_repository_factory(self, repository_class):
+        """Return repository factory reusing instances with the same arguments."""
+        def get_repository(pip_args, cache_dir):
+            key = (tuple(pip_args), cache_dir)
+            if key not in self._repositories:
+                self._repositories[key] = repository_class(pip_args, cache_dir=cache_dir)
+            return self._repositories[key]
+        return get_repository
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _preserve_logging():
+        """pip reconfigures root logger on repository creation."""
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        try:
+            yield
+        finally:
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def _redirect_output(capture):
+        if FEATURES.live_output.value:
+            yield
+            return
+        with contextlib.redirect_stdout(capture), contextlib.redirect_stderr(capture):
+            yield
+
+
+IN_PROCESS = InProcessPipTools()
+RUNNING = RunningProcesses()
@@ -0,0 +1,110 @@
+"""Run environment tasks in parallel respecting references."""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .utils import fix_reference_path
+
+
+logger = logging.getLogger("pip-compile-multi")
+
+
+def run_topologically(env_confs, callback, jobs=1, on_failure=None, limiter=None):
+    """Call callback for each environment after all its references are done.
+
+    Args:
+        env_confs: environments in topological order (see ``discover``).
+        callback: function accepting environment conf.
+        jobs: maximum number of concurrent callbacks.
+        on_failure: function called once after the first failure
+            to make running callbacks finish early.
+        limiter: optional object with ``slots(running)`` method returning
+            how many more callbacks can be started now (see ``memory.MemoryLimiter``),
+            and ``POLL_INTERVAL`` in seconds to ask it again while callbacks run.
+
+    Environment is scheduled as soon as all environments it references
+    are done, in the order of env_confs.
+    After the first failure no new environments are scheduled,
+    on_failure is called, and the exception is re-raised
+    when running callbacks finish.
+    With limiter, at most jobs callbacks run at once,
+    and fewer if limiter doesn't admit more.
+
+    >>> calls = []
+    >>> run_topologically([
+    ...     {'in_path': 'base', 'refs': set()},
+    ...     {'in_path': 'test', 'refs': {'base'}},
+    ...     {'in_path': 'docs', 'refs': set()},
+    ... ], lambda conf: calls.append(conf['in_path']), jobs=2)
+    >>> sorted(calls)
+    ['base', 'docs', 'test']
+    """
+    if jobs <= 1:
+        for conf in env_confs:
+            callback(conf)
+        return
+    pending = list(env_confs)
+    dependencies = _direct_dependencies(env_confs)
+    done, running, failures = set(), {}, []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        while pending or running:
+            if not failures:
+                for conf in _pop_ready(
+                        pending, dependencies, done,
+                        _admitted(jobs, len(running), pending, limiter)):
+                    running[executor.submit(callback, conf)] = conf['in_path']
+            if not running:
+                break
+            finished, _ = wait(
+                running,
+                timeout=limiter.POLL_INTERVAL if limiter is not None and pending else None,
+                return_when=FIRST_COMPLETED,
+            )
+            for future in finished:
+                in_path = running.pop(future)
+                if future.exception() is None:
+                    done.add(in_path)
+                else:
+                    failures.append(future.exception())
+                    if len(failures) == 1 and on_failure is not None:
+                        on_failure()
+            if failures and pending:
+                logger.info("Cancelling %d pending environment(s)", len(pending))
+                pending = []
+    if failures:
+        raise failures[0]
+
+
+def _direct_dependencies(env_confs):
+    """Map in_path to set of in_paths that must be done before it.
+
+    References outside of env_confs are considered done.
+    """
+    known = {conf['in_path'] for conf in env_confs}
+    return {
+        conf['in_path']: {
+            fix_reference_path(conf['in_path'], ref)
+            for ref in conf['refs']
+        } & known
+        for conf in env_confs
+    }
+
+
+def _admitted(jobs, running, pending, limiter):
+    """Return number of callbacks that can be started now."""
+    limit = jobs - running
+    if limiter is not None and limit > 0 and pending:
+        limit = min(limit, limiter.slots(running))
+    return limit
+
+
+def _pop_ready(pending, dependencies, done, limit):
+    """Remove up to limit environments with satisfied dependencies from pending."""
+    ready = []
+    for conf in list(pending):
+        if len(ready) >= limit:
+            break
+        if dependencies[conf['in_path']] <= done:
+            ready.append(conf)
+            pending.remove(conf)
+    return ready
@@ -0,0 +1,316 @@
+"""Single pass tokenizer of lockfile sections.
+
+Section is a requirement line followed by comment lines, e.g.::
+
+    six==1.0 ; python_version >= "3" \\
+        --hash=sha256:abc
+        # via pkg
+
+Tokenizer classifies section as pinned (``pkg==1.0``),
+VCS (``git+https://...#egg=pkg``) or URL (``pkg @ https://...``) requirement
+and splits it into package, version, markers, hashes and comment.
+Each character is looked at a constant number of times,
+unlike nested regular expressions that backtrack on long hash and comment lists.
+"""
+
+import re
+from collections import namedtuple
+
+
+DependencyTokens = namedtuple(
+    'DependencyTokens',
+    ['kind', 'package', 'version', 'markers', 'hashes', 'comment_span'],
+)
+
+
+class SectionTokenizer(object):  # pylint: disable=too-few-public-methods
+    """Split requirement section into tokens.
+
+    >>> SectionTokenizer('six==1.0 ; python_version >= "3"  # via pkg').tokenize()
+    DependencyTokens(kind='pinned', package='six', version='1.0', \
+markers=' ; python_version >= "3"', hashes='', comment_span=(32, 43))
+    >>> SectionTokenizer('-e git+https://site/pkg.git#egg=pkg').tokenize().package
+    'pkg'
+    >>> SectionTokenizer('pkg @ https://site/pkg.zip').tokenize().kind
+    'at'
+    >>> SectionTokenizer('--index-url https://site').tokenize() is None
+    True
+    """
+
+    PINNED = 'pinned'
+    VCS = 'vcs'
+    AT = 'at'
+
+    # Atoms matched at a given position.
+    # Nothing follows the repetitions, so none of them backtracks.
+    RE_SPACE = re.compile(r'\s*')
+    RE_TOKEN = re.compile(r'\S*')
+    RE_NAME = re.compile(r'(?iu)[a-z0-9-_.]*')
+    RE_HASHES = re.compile(r'(?iu)(?:\s*--hash=\S+)*')
+    RE_COMMENTS = re.compile(r'(?:\s*#.*)*')
+
+    def __init__(self, line):
+        self.line = line
+        # Regular expression "$" matches before trailing newline:
+        self.end = len(line) - 1 if line.endswith('\n') else len(line)
+
+    def tokenize(self):
+        """Return DependencyTokens or None if section is not a requirement."""
+        line = self.line
+        if '#egg=' in line.lower():
+            vcs = self._vcs()
+            if vcs:
+                return vcs
+        if ' @ ' in line:
+            at_url = self._at()
+            if at_url:
+                return at_url
+        return self._pinned()
+
+    def _pinned(self):
+        """pkg==version [markers] [hashes] [comment]"""
+        line = self.line
+        token_end = self._skip_token(0)
+        # Version is whatever follows the last "==" in the first token.
+        separator = self._rfind('==', 1, token_end - 1)
+        if separator < 0:
+            return None
+        result = self._finish(
+            self.PINNED,
+            package=line[:separator],
+            version=line[separator + 2:token_end],
+            position=token_end,
+            hashes=True,
+        )
+        if result:
+            return result
+        # Version can end right before "#" starting a comment:
+        sign = self._rfind('#', 0, token_end)
+        separator = self._rfind('==', 1, sign - 1)
+        if sign < 0 or separator < 0:
+            return None
+        return self._comment_from(
+            sign, self.PINNED, line[:separator], line[separator + 2:sign],
+        )
+
+    def _vcs(self):
+        """[-e] prefix#egg=pkg[postfix] [markers] [comment]"""
+        for offset in self._editable_offsets():
+            start = self._skip_space(offset)
+            token_end = self._skip_token(start)
+            egg = self._rfind_egg(start, token_end)
+            if egg < 0:
+                continue
+            result = self._finish(
+                self.VCS,
+                package=self._egg_name(egg),
+                version='',
+                position=token_end,
+            )
+            if result:
+                return result
+            # Postfix can end right before "#" starting a comment:
+            sign = self._rfind('#', start, token_end)
+            egg = self._rfind_egg(start, sign)
+            if egg >= 0:
+                result = self._comment_from(sign, self.VCS, self._egg_name(egg))
+                if result:
+                    return result
+        return None
+
+    def _at(self):
+        """[-e] pkg @ url [markers] [comment]"""
+        line = self.line
+        for offset in self._editable_offsets():
+            start = self._skip_space(offset)
+            name_end = self._skip_name(start)
+            url_start = name_end + len(' @ ')
+            url_end = self._skip_token(url_start)
+            if name_end == start or not line.startswith(' @ ', name_end) or url_end == url_start:
+                continue
+            package = line[start:name_end]
+            result = self._finish(self.AT, package=package, version='', position=url_end)
+            if result:
+                return result
+            # URL can end right before "#" starting a comment:
+            sign = self._rfind('#', url_start + 1, url_end)
+            if sign >= 0:
+                result = self._comment_from(sign, self.AT, package)
+                if result:
+                    return result
+        return None
+
+    def _comment_from(self, sign, kind, package, version=''):
+        """Return tokens for requirement followed by comment at sign."""
+        if not self._comment_ok(self._line_end(sign)):
+            return None
+        return DependencyTokens(
+            kind=kind,
+            package=package,
+            version=version,
+            markers='',
+            hashes='',
+            comment_span=(sign, self.end),
+        )
+
+    def _finish(self, kind, package, version, position, hashes=False):
+        """Tokenize the rest of section after requirement itself."""
+        markers = self._markers(position, hashes)
+        if markers:
+            markers_end, hashes_end = markers
+        else:
+            markers_end, hashes_end = position, self._tail(position, hashes)
+        if hashes_end is None:
+            return None
+        return DependencyTokens(
+            kind=kind,
+            package=package,
+            version=version,
+            markers=self.line[position:markers_end],
+            hashes=self.line[markers_end:hashes_end].strip(),
+            comment_span=(hashes_end, self.end),
+        )
+
+    def _markers(self, position, hashes):
+        """Match `` ; marker`` and return its end with hashes end or None.
+
+        Marker ends as early as possible,
+        i.e. right before the first hash or comment that completes the section.
+        """
+        line = self.line
+        semicolon = self._skip_space(position)
+        if semicolon == position or not line.startswith(';', semicolon):
+            return None
+        start = self._skip_space(semicolon + 1)
+        if start == semicolon + 1:
+            return None
+        if start < len(line):
+            result = self._marker_end(start, hashes)
+            if result:
+                return result
+        return self._whitespace_marker_end(semicolon, start, hashes)
+
+    def _whitespace_marker_end(self, semicolon, start, hashes):
+        """Whitespace after ";" can give its last character to marker text."""
+        line = self.line
+        marker = start - 1
+        while marker > semicolon + 1 and line[marker] == '\n':
+            marker -= 1
+        if marker == semicolon + 1:
+            return None
+        hashes_end = self._tail(marker + 1, hashes)
+        if hashes_end is not None:
+            return marker + 1, hashes_end
+        if marker + 1 < self.end <= min(start, self._line_end(marker)):
+            return self.end, self.end
+        return None
+
+    def _marker_end(self, start, hashes):
+        """Return marker end and hashes end for marker text starting at start."""
+        line = self.line
+        line_end = self._line_end(start)
+        # Marker text is at least one character long.
+        candidates = [line_end, self._space_start(line_end, start + 1)]
+        sign = line.find('#', start + 1, line_end)
+        if sign >= 0 and self._comment_ok(line_end):
+            candidates.append(self._space_start(sign, start + 1))
+        if hashes:
+            occurrence = self._find_hash(start + 1, line_end)
+            while occurrence >= 0:
+                candidate = self._space_start(occurrence, start + 1)
+                if self._tail(candidate, hashes) is not None:
+                    candidates.append(candidate)
+                    break
+                occurrence = self._find_hash(
+                    max(self._hashes_end(candidate), occurrence + 1), line_end,
+                )
+        for candidate in sorted(candidates):
+            hashes_end = self._tail(candidate, hashes)
+            if hashes_end is not None:
+                return candidate, hashes_end
+        return None
+
+    def _tail(self, position, hashes):
+        """Return end of hashes if the rest is hashes followed by comments."""
+        if not hashes:
+            return position if self._comment_ok(position) else None
+        hashes_end = self._hashes_end(position)
+        if self._comment_ok(hashes_end):
+            return hashes_end
+        # Hash value can end right before "#" starting a comment:
+        sign = self._rfind('#', position, hashes_end)
+        while 0 <= sign <= self._token_start(sign, position) + len('--hash='):
+            sign = self._rfind('#', position, sign)
+        if sign >= 0 and self._comment_ok(self._line_end(sign)):
+            return sign
+        return None
+
+    def _hashes_end(self, position):
+        """Return end of ``--hash=...`` tokens starting at position."""
+        return self.RE_HASHES.match(self.line, position).end()
+
+    def _comment_ok(self, position):
+        """Whether the rest of section consists of comments and whitespace."""
+        return self.RE_COMMENTS.match(self.line, position).end() >= self.end
+
+    def _editable_offsets(self):
+        if self.line[:2].casefold() == '-e':
+            return (2, 0)
+        return (0,)
+
+    def _rfind_egg(self, start, end):
+        """Find last ``#egg=`` in line[start:end] followed by package name."""
+        line = self.line
+        sign = self._rfind('#', start + 1, end - len('#egg='))
+        while sign >= 0:
+            name_start = sign + len('#egg=')
+            if line[sign + 1:name_start].casefold() == 'egg=' and (
+                    self._skip_name(name_start) > name_start):
+                return sign
+            sign = self._rfind('#', start + 1, sign)
+        return -1
+
+    def _egg_name(self, egg):
+        name_start = egg + len('#egg=')
+        return self.line[name_start:self._skip_name(name_start)]
+
+    def _rfind(self, sub, start, end):
+        """Like str.rfind, but negative end means empty range."""
+        if end <= start:
+            return -1
+        return self.line.rfind(sub, start, end)
+
+    def _find_hash(self, start, end):
+        """Find first ``--hash=`` in line[start:end], ignoring case."""
+        line = self.line
+        dashes = line.find('--', start, end)
+        while dashes >= 0:
+            if line[dashes:dashes + len('--hash=')].casefold() == '--hash=':
+                return dashes
+            dashes = line.find('--', dashes + 1, end)
+        return -1
+
+    def _space_start(self, position, lowest):
+        """Return start of whitespace run ending at position."""
+        while position > lowest and self.line[position - 1].isspace():
+            position -= 1
+        return position
+
+    def _token_start(self, position, lowest):
+        """Return start of non-whitespace run ending at position."""
+        while position > lowest and not self.line[position - 1].isspace():
+            position -= 1
+        return position
+
+    def _line_end(self, position):
+        end = self.line.find('\n', position)
+        return len(self.line) if end < 0 else end
+
+    def _skip_space(self, position):
+        return self.RE_SPACE.match(self.line, position).end()
+
+    def _skip_token(self, position):
+        return self.RE_TOKEN.match(self.line, position).end()
+
+    def _skip_name(self, position):
+        return self.RE_NAME.match(self.line, position).end()
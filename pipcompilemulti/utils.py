@@ -19,6 +19,15 @@ def extract_env_name(file_path):
     return os.path.splitext(os.path.basename(file_path))[0]
 
 
+def user_cache_dir(*parts):
+    """Return path inside pip-compile-multi cache directory.
+
+    Honors ``XDG_CACHE_HOME`` environment variable.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'pip-compile-multi', *parts)
+
+
 def fix_reference_path(orig_path, ref_path):
     """Find actual path to reference using relative path to original file.
 
@@ -29,7 +38,10 @@ def fix_reference_path(orig_path, ref_path):
 
 
 def recursive_refs(envs, in_path):
-    """Return set of recursive refs for given env name."""
+    """Return set of recursive refs for given env name.
+
+    For repeated queries use :class:`pipcompilemulti.graph.EnvGraph`.
+    """
     refs_by_in_path = {
         os.path.normpath(env['in_path']): {
             fix_reference_path(env['in_path'], ref)
@@ -37,16 +49,13 @@ def recursive_refs(envs, in_path):
         }
         for env in envs
     }
-    refs = refs_by_in_path[os.path.normpath(in_path)]
-    if refs:
-        indirect_refs = set(
-            subref
-            for ref in refs
-            for subref in recursive_refs(envs, ref)
-        )
-    else:
-        indirect_refs = set()
-    return set.union(refs, indirect_refs)
+    refs, to_visit = set(), [os.path.normpath(in_path)]
+    while to_visit:
+        for ref in refs_by_in_path[to_visit.pop()]:
+            if ref not in refs:
+                refs.add(ref)
+                to_visit.append(ref)
+    return refs
 
 
 def merged_packages(env_packages, names):
@@ -74,6 +83,15 @@ def merged_packages(env_packages, names):
                 errors.add((name, version, result[name]))
         else:
             result[name] = version
+    raise_for_conflicts(errors)
+    return result
+
+
+def raise_for_conflicts(errors):
+    """Log version conflicts and raise RuntimeError if there are any.
+
+    Each error is a tuple of package name and two versions.
+    """
     if errors:
         for error in sorted(errors):
             logger.error(
@@ -84,7 +102,6 @@ def merged_packages(env_packages, names):
         raise RuntimeError(
             "Please add constraints for the package version listed above"
         )
-    return result
 
 
 def reference_cluster(envs, in_path):
@@ -100,23 +117,67 @@ def reference_cluster(envs, in_path):
     >>> cluster == ['base', 'local', 'test']
     True
     """
-    edges = [
-        set([env['in_path'], fix_reference_path(env['in_path'], ref)])
-        for env in envs
-        for ref in env['refs']
-    ]
-    prev, cluster = set(), set([in_path])
-    while prev != cluster:
-        # While cluster grows
-        prev = set(cluster)
-        to_visit = []
-        for edge in edges:
-            if cluster & edge:
-                # Add adjacent nodes:
-                cluster |= edge
-            else:
-                # Leave only edges that are out
-                # of cluster for the next round:
-                to_visit.append(edge)
-        edges = to_visit
-    return cluster
+    clusters = DisjointSet([os.path.normpath(in_path)])
+    for env in envs:
+        for ref in env['refs']:
+            clusters.union(
+                os.path.normpath(env['in_path']),
+                fix_reference_path(env['in_path'], ref),
+            )
+    return set(clusters.members(os.path.normpath(in_path)))
+
+
+class DisjointSet(object):
+    """Union-find over hashable items with path halving and union by size.
+
+    >>> clusters = DisjointSet(['a', 'b', 'c', 'd'])
+    >>> clusters.union('a', 'b')
+    >>> clusters.union('c', 'b')
+    >>> sorted(clusters.members('a'))
+    ['a', 'b', 'c']
+    >>> clusters.find('d') == clusters.find('a')
+    False
+    """
+
+    def __init__(self, items=()):
+        self._parent = {}
+        self._size = {}
+        for item in items:
+            self.add(item)
+
+    def add(self, item):
+        """Add item as a singleton set unless it's already known."""
+        if item not in self._parent:
+            self._parent[item] = item
+            self._size[item] = 1
+
+    def find(self, item):
+        """Return representative item of the set containing item."""
+        self.add(item)
+        parent = self._parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, first, second):
+        """Merge sets containing first and second."""
+        first, second = self.find(first), self.find(second)
+        if first == second:
+            return
+        if self._size[first] < self._size[second]:
+            first, second = second, first
+        self._parent[second] = first
+        self._size[first] += self._size[second]
+
+    def groups(self):
+        """Return dict of representative item to frozenset of set members."""
+        members = {}
+        for item in self._parent:
+            members.setdefault(self.find(item), []).append(item)
+        return {root: frozenset(items) for root, items in members.items()}
+
+    def members(self, item):
+        """Return frozenset of items in the same set as item."""
+        root = self.find(item)
+        return frozenset(other for other in self._parent if self.find(other) == root)
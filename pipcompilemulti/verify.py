@@ -45,6 +45,14 @@ If verification fails, an error message is logged and exit code 1 is returned:
     OK - requirements/testwin.txt was generated from requirements/testwin.in.
 
 
+Files are hashed in parallel.
+Hashes and references between input files are remembered
+in ``$XDG_CACHE_HOME/pip-compile-multi/digests.json``
+(``~/.cache/pip-compile-multi/digests.json`` by default)
+together with file size, modification time and inode,
+so repeated verification only reads files that changed since the previous run.
+Locking reuses cached references too.
+
 In big teams it might be a good idea to have this check in ``tox.ini``:
 
 .. code-block:: ini
@@ -57,9 +65,15 @@ In big teams it might be a good idea to have this check in ``tox.ini``:
     whitelist_externals = pip-compile-multi
 """
 
-import hashlib
 import logging
-
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .digest import (
+    DigestCache,
+    generate_hash_comment,
+    generate_robust_hash_comment,
+    parse_hash_comment,
+)
 from .discover import discover
 from .environment import Environment
 from .features import FEATURES
@@ -67,71 +81,56 @@ from .features import FEATURES
 
 logger = logging.getLogger("pip-compile-multi")
 
+__all__ = (
+    'verify_environments',
+    'generate_hash_comment',
+    'generate_robust_hash_comment',
+    'parse_hash_comment',
+)
+
 
 def verify_environments():
     """
     For each environment verify hash comments and report failures.
     If any failure occured, exit with code 1.
+
+    Files are hashed in parallel, and hashes and references of files
+    that didn't change since the previous run are taken from ``DigestCache``.
     """
-    env_confs = discover(FEATURES.compose_input_file_path('*'))
+    cache = DigestCache()
+    env_confs = discover(FEATURES.compose_input_file_paths('*'), cache)
+    envs = [Environment(in_path=conf['in_path']) for conf in env_confs]
+
+    def comments(env):
+        return (
+            cache.input_hash_comments(env.infile),
+            cache.parse_hash_comment(env.outfile),
+        )
+
+    def cached(env):
+        input_comments = cache.lookup(DigestCache.INPUTS, env.infile)
+        existing_comment = cache.lookup(DigestCache.COMMENT, env.outfile)
+        if input_comments is None or existing_comment is None:
+            return None
+        return input_comments, existing_comment
+
+    with ThreadPoolExecutor() as executor:
+        # Only files that changed since the previous run are worth a thread:
+        results = [cached(env) or executor.submit(comments, env) for env in envs]
+        results = [
+            result.result() if isinstance(result, Future) else result
+            for result in results
+        ]
+    cache.save()
     success = True
-    for conf in env_confs:
-        env = Environment(in_path=conf['in_path'])
-        current_comment = generate_hash_comment(env.infile)
-        robust_comment = generate_robust_hash_comment(env.infile)
-        existing_comment = parse_hash_comment(env.outfile)
-        if existing_comment in (robust_comment, current_comment):
+    for env, (input_comments, existing_comment) in zip(envs, results):
+        if existing_comment in input_comments:
             logger.info("OK - %s was generated from %s.",
                         env.outfile, env.infile)
         else:
             logger.error("ERROR! %s was not regenerated after changes in %s.",
                          env.outfile, env.infile)
-            logger.error("Expecting: %s", robust_comment.strip())
+            logger.error("Expecting: %s", input_comments[0].strip())
             logger.error("Found:     %s", existing_comment.strip())
             success = False
     return success
-
-
-def generate_hash_comment(file_path):
-    """
-    Read file with given file_path and return string of format
-
-        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
-
-    which is hex representation of SHA1 file content hash
-    """
-    with open(file_path, 'rb') as fp:
-        hexdigest = hashlib.sha1(fp.read().strip()).hexdigest()
-    return f"# SHA1:{hexdigest}\n"
-
-
-def generate_robust_hash_comment(file_path):
-    """
-    Read file with given file_path and return string of format
-
-        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
-
-    which is hex representation of SHA1 file content hash.
-    File content is pre-processed by stripping comments, whitespace and newlines.
-    """
-    with open(file_path, 'rt', encoding="utf-8") as fp:
-        essense = ''.join(sorted(
-            line.split('#')[0].strip()
-            for line in fp
-        ))
-    hexdigest = hashlib.sha1(essense.encode("utf-8")).hexdigest()
-    return f"# SHA1:{hexdigest}\n"
-
-
-def parse_hash_comment(file_path):
-    """
-    Read file with given file_path line by line,
-    return the first line that starts with "# SHA1:", like this:
-
-        # SHA1:da39a3ee5e6b4b0d3255bfef95601890afd80709
-    """
-    with open(file_path, encoding="utf-8") as fp:
-        for line in fp:
-            if line.startswith("# SHA1:"):
-                return line
-    return ''
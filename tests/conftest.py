@@ -26,6 +26,18 @@ def wipe_options():
     OPTIONS.clear()
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep digest cache, lock cache and journals out of user's cache directory.
+
+    HTTP cache of pip is still shared, so that resolvers don't download everything again.
+    """
+    user_cache = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    pip_cache = os.environ.get('PIP_CACHE_DIR') or os.path.join(user_cache, 'pip')
+    monkeypatch.setenv('PIP_CACHE_DIR', pip_cache)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+
+
 @pytest.fixture()
 def test_data_tmpdir():
     """Copy the requested test data to a temporary directory."""
@@ -24,3 +24,6 @@ class AddHashesTestCase(unittest.TestCase):
 class FakeController():
     def compose_input_file_path(self, name):
         return name
+
+    def compose_input_file_paths(self, name):
+        return [self.compose_input_file_path(name)]
@@ -0,0 +1,50 @@
+"""Autoresolve tests."""
+
+import pytest
+
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+from pipcompilemulti.resolver import ResolverResult
+
+
+@pytest.fixture(autouse=True)
+def sink_tree(tmp_path, monkeypatch):
+    """Base environment referenced by compiled sink."""
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.', 'autoresolve': True, 'lock_cache': False})
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    (tmp_path / 'local.in').write_text('-r base.in\nclick\n', encoding='utf-8')
+    (tmp_path / 'local.txt').write_text('click==8.0\nsix==1.0\n', encoding='utf-8')
+    FEATURES.on_discover([
+        {'in_path': 'base.in', 'refs': set()},
+        {'in_path': 'local.in', 'refs': {'base.in'}},
+    ])
+    yield
+    OPTIONS.pop('autoresolve')
+    OPTIONS.pop('lock_cache')
+
+
+def test_sink_is_passed_as_constraint_option(monkeypatch):
+    """Input file is left intact and sink output is passed to resolver."""
+    commands = []
+
+    def resolve(command, log_path=None, timeout=None, attempt=1):
+        del log_path, timeout, attempt
+        commands.append(command)
+        with open('base.in', encoding='utf-8') as fp:
+            assert fp.read() == 'six\n'
+        return ResolverResult(1, None, b'failed', None)
+
+    monkeypatch.setattr('pipcompilemulti.environment.run_subprocess', resolve)
+    with pytest.raises(RuntimeError):
+        Environment('base.in').create_lockfile()
+    command = commands[0]
+    assert command[command.index('--constraint') + 1] == 'local.txt'
+    with open('base.in', encoding='utf-8') as fp:
+        assert fp.read() == 'six\n'
+
+
+def test_sink_is_not_constrained_by_itself():
+    """Sink is compiled without constraint."""
+    assert '--constraint' not in Environment('local.in').pin_arguments
@@ -0,0 +1,44 @@
+"""Several requirements directories tests."""
+
+import os
+
+import pytest
+
+from pipcompilemulti.discover import discover
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+@pytest.fixture(name='roots')
+def roots_fixture(tmp_path, monkeypatch):
+    """Two services with base, test and sink environments each."""
+    monkeypatch.chdir(tmp_path)
+    for service in ['api', 'worker']:
+        directory = tmp_path / service / 'requirements'
+        directory.mkdir(parents=True)
+        (directory / 'base.in').write_text('six\n', encoding='utf-8')
+        (directory / 'test.in').write_text('-r base.in\npytest\n', encoding='utf-8')
+        (directory / 'all.in').write_text('-r test.in\n', encoding='utf-8')
+    OPTIONS.update({'directory': ['*/requirements'], 'autoresolve': True})
+    yield
+    OPTIONS.pop('directory')
+    OPTIONS.pop('autoresolve')
+
+
+@pytest.mark.usefixtures('roots')
+def test_each_directory_has_own_sink():
+    """Environments of all directories are discovered together."""
+    assert FEATURES.base_dir.roots() == [
+        os.path.join('api', 'requirements'),
+        os.path.join('worker', 'requirements'),
+    ]
+    envs = FEATURES.on_discover(discover(FEATURES.compose_input_file_paths('*')))
+    assert len(envs) == 6
+    sinks = FEATURES.sink_in_paths()
+    assert sinks == [
+        os.path.join('api', 'requirements', 'all.in'),
+        os.path.join('worker', 'requirements', 'all.in'),
+    ]
+    for env in envs:
+        expected = os.path.join(os.path.dirname(env['in_path']), 'all.in')
+        assert FEATURES.autoresolve.sink_path(env['in_path']) == expected
@@ -0,0 +1,52 @@
+"""Tests for compiling only changed environments."""
+
+import pytest
+
+from pipcompilemulti.digest import generate_robust_hash_comment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+ENVS = [
+    {'in_path': 'base.in', 'refs': set()},
+    {'in_path': 'docs.in', 'refs': set()},
+    {'in_path': 'test.in', 'refs': {'base.in'}},
+    {'in_path': 'local.in', 'refs': {'test.in'}},
+]
+
+
+@pytest.fixture(autouse=True)
+def locked_tree(tmp_path, monkeypatch):
+    """Write input files and up-to-date output files."""
+    monkeypatch.chdir(tmp_path)
+    for env in ENVS:
+        name = env['in_path'][:-3]
+        with open(env['in_path'], 'wt', encoding='utf-8') as fp:
+            fp.write(''.join('-r %s\n' % ref for ref in env['refs']) + name + '\n')
+        with open(name + '.txt', 'wt', encoding='utf-8') as fp:
+            fp.write(generate_robust_hash_comment(env['in_path']) + name + '==1\n')
+
+
+def test_changes_propagate_to_dependents():
+    """Changed file and files referencing it are affected."""
+    OPTIONS['changed'] = True
+    with open('base.in', 'at', encoding='utf-8') as fp:
+        fp.write('six\n')
+    FEATURES.on_discover(ENVS)
+    assert [env['in_path'] for env in ENVS if FEATURES.affected(env['in_path'])] == [
+        'base.in', 'test.in', 'local.in',
+    ]
+
+
+def test_missing_output_is_changed():
+    """Environment without output file is affected."""
+    OPTIONS['changed'] = True
+    FEATURES.on_discover(ENVS + [{'in_path': 'new.in', 'refs': set()}])
+    assert not FEATURES.affected('base.in')
+    assert FEATURES.affected('new.in')
+
+
+def test_all_affected_by_default():
+    """Without the flag, all environments are compiled."""
+    FEATURES.on_discover(ENVS)
+    assert all(FEATURES.affected(env['in_path']) for env in ENVS)
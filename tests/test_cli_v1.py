@@ -62,7 +62,7 @@ def test_v1_command_exits_with_zero(command, monkeypatch):
 def test_v1_verify_exits_with_zero(monkeypatch):
     """Run pip-compile-multi on self"""
     # Mock discover to return empty list
-    monkeypatch.setattr(verify, 'discover', lambda _: [])
+    monkeypatch.setattr(verify, 'discover', lambda _, cache=None: [])
     runner = CliRunner()
     result = runner.invoke(cli, ['verify'])
     assert result.exit_code == 0
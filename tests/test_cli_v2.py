@@ -21,3 +21,18 @@ def test_command_exits_with_zero(command):
     runner = CliRunner()
     result = runner.invoke(cli, [command])
     assert result.exit_code == 0
+
+
+@pytest.mark.parametrize('args, changed', [
+    (['lock', '--changed'], True),
+    (['lock'], None),
+])
+def test_lock_passes_changed_flag(args, changed, monkeypatch):
+    """Flag is applied without configuration file, and doesn't override configuration."""
+    options = {}
+    monkeypatch.setattr('pipcompilemulti.cli_v2.read_config', lambda: None)
+    monkeypatch.setattr('pipcompilemulti.actions.recompile', lambda: None)
+    monkeypatch.setattr('pipcompilemulti.cli_v2.OPTIONS', options)
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0
+    assert options.get('changed') == changed
@@ -1,4 +1,6 @@
 """Package name deduplication tests"""
+import pytest
+
 from pipcompilemulti.deduplicate import PackageDeduplicator
 
 
@@ -15,3 +17,62 @@ def test_package_deduplicator_handles_delimiters_normalization():
     assert 'pkg.name' in ignored_packages
     assert 'pkgname' not in ignored_packages
     assert ignored_packages['Pkg_Name'] == '1.0'
+
+
+def test_ignored_packages_include_indirect_references():
+    """Packages of diamond-shaped references are merged."""
+    package_deduplicator = PackageDeduplicator()
+    package_deduplicator.on_discover([
+        {'in_path': 'base', 'refs': []},
+        {'in_path': 'test', 'refs': ['base']},
+        {'in_path': 'docs', 'refs': ['base']},
+        {'in_path': 'local', 'refs': ['test', 'docs']},
+    ])
+    package_deduplicator.register_packages_for_env('base', {'six': '1'})
+    package_deduplicator.register_packages_for_env('test', {'six': '1', 'pytest': '2'})
+    package_deduplicator.register_packages_for_env('docs', {'sphinx': '3'})
+    ignored_packages = package_deduplicator.ignored_packages('local')
+    assert len(ignored_packages) == 3
+    assert ignored_packages['Sphinx'] == '3'
+
+
+def test_ignored_packages_detect_conflicts():
+    """Referenced environments can't pin different versions of the same package."""
+    package_deduplicator = PackageDeduplicator()
+    package_deduplicator.on_discover([
+        {'in_path': 'test', 'refs': []},
+        {'in_path': 'docs', 'refs': []},
+        {'in_path': 'local', 'refs': ['test', 'docs']},
+    ])
+    package_deduplicator.register_packages_for_env('test', {'six': '1'})
+    package_deduplicator.register_packages_for_env('docs', {'six': '2'})
+    with pytest.raises(RuntimeError):
+        package_deduplicator.ignored_packages('local')
+
+
+def test_ignored_packages_follow_registration():
+    """Merged packages are rebuilt when referenced environment is recompiled."""
+    package_deduplicator = PackageDeduplicator()
+    package_deduplicator.on_discover([
+        {'in_path': 'base', 'refs': []},
+        {'in_path': 'test', 'refs': ['base']},
+        {'in_path': 'local', 'refs': ['test']},
+    ])
+    package_deduplicator.register_packages_for_env('base', {'six': '1'})
+    package_deduplicator.register_packages_for_env('test', {})
+    assert package_deduplicator.ignored_packages('local')['six'] == '1'
+    package_deduplicator.register_packages_for_env('base', {'six': '2'})
+    assert package_deduplicator.ignored_packages('local')['six'] == '2'
+
+
+def test_ignored_packages_of_long_chain():
+    """Reference chains longer than recursion limit are supported."""
+    size = 3000
+    package_deduplicator = PackageDeduplicator()
+    package_deduplicator.on_discover([
+        {'in_path': 'env%d' % index, 'refs': ['env%d' % (index - 1)] if index else []}
+        for index in range(size)
+    ])
+    for index in range(size - 1):
+        package_deduplicator.register_packages_for_env('env%d' % index, {'pkg%d' % index: '1'})
+    assert len(package_deduplicator.ignored_packages('env%d' % (size - 1))) == size - 1
@@ -0,0 +1,83 @@
+"""Hash comment and digest cache tests."""
+
+import os
+
+import pytest
+
+from pipcompilemulti.digest import (
+    DigestCache,
+    generate_hash_comment,
+    generate_robust_hash_comment,
+    input_hash_comments,
+)
+from pipcompilemulti.verify import verify_environments
+from pipcompilemulti.options import OPTIONS
+
+
+OLD = 1000000000
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Isolate cache directory and work in temporary directory."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.chdir(tmp_path)
+
+
+@pytest.mark.parametrize('content', [
+    b'six\n',
+    b'six\r\nflask  # web\r\n\r\n',
+    b'-r base.in\rsix\n# comment\n   \n',
+    b'',
+])
+def test_single_read_matches_separate_digests(tmp_path, content):
+    """Both comments are the same as computed by separate functions."""
+    path = tmp_path / 'base.in'
+    path.write_bytes(content)
+    assert input_hash_comments(str(path)) == (
+        generate_robust_hash_comment(str(path)),
+        generate_hash_comment(str(path)),
+    )
+
+
+def test_unchanged_file_is_not_read_again(tmp_path):
+    """Cached digest is returned while file size and modification time are the same."""
+    path = tmp_path / 'base.in'
+    path.write_text('six\n', encoding='utf-8')
+    os.utime(path, (OLD, OLD))
+    expected = input_hash_comments(str(path))
+    cache = DigestCache()
+    assert cache.input_hash_comments(str(path)) == expected
+    cache.save()
+    # Same size and modification time, different content:
+    path.write_text('abc\n', encoding='utf-8')
+    os.utime(path, (OLD, OLD))
+    assert DigestCache().lookup(DigestCache.INPUTS, str(path)) == expected
+    os.utime(path, (OLD + 1, OLD + 1))
+    assert DigestCache().lookup(DigestCache.INPUTS, str(path)) is None
+
+
+def test_recently_modified_file_is_not_cached(tmp_path):
+    """File modified within timestamp granularity can change unnoticed."""
+    path = tmp_path / 'base.in'
+    path.write_text('six\n', encoding='utf-8')
+    cache = DigestCache()
+    cache.input_hash_comments(str(path))
+    cache.save()
+    assert DigestCache().lookup(DigestCache.INPUTS, str(path)) is None
+
+
+def test_verify_reports_changed_input(tmp_path):
+    """Verification with warm cache notices changed input files."""
+    OPTIONS['directory'] = '.'
+    for name in ['base', 'test']:
+        (tmp_path / (name + '.in')).write_text(name + '\n', encoding='utf-8')
+        (tmp_path / (name + '.txt')).write_text(
+            generate_robust_hash_comment(name + '.in') + name + '==1\n', encoding='utf-8',
+        )
+        os.utime(tmp_path / (name + '.in'), (OLD, OLD))
+        os.utime(tmp_path / (name + '.txt'), (OLD, OLD))
+    assert verify_environments()
+    assert verify_environments()
+    (tmp_path / 'test.in').write_text('pytest\n', encoding='utf-8')
+    assert not verify_environments()
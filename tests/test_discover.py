@@ -5,7 +5,9 @@ import sys
 
 import pytest
 
+from pipcompilemulti.digest import DigestCache
 from pipcompilemulti.discover import discover
+from pipcompilemulti.environment import Environment
 
 
 @pytest.mark.skipif(sys.platform == "win32", reason="Path normalization is wonky under Windows")
@@ -39,3 +41,33 @@ def test_discover_nested():
             "refs": {"base.in", os.path.join("subproject", "base.in")},
         },
     ]
+
+
+def test_cached_discovery_parses_only_changed_files(tmp_path, monkeypatch):
+    """References of unchanged files are taken from digest cache."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    (tmp_path / 'test.in').write_text('-r base.in\npytest\n', encoding='utf-8')
+    for path in tmp_path.glob('*.in'):
+        os.utime(path, (1000000000, 1000000000))
+    parsed = []
+    original = Environment.parse_references
+
+    def parse_references(filename, *patterns):
+        parsed.append(os.path.basename(filename))
+        return original(filename, *patterns)
+
+    monkeypatch.setattr(Environment, 'parse_references', parse_references)
+    pattern = str(tmp_path / '*.in')
+    cache = DigestCache()
+    expected = discover(pattern, cache)
+    cache.save()
+    assert sorted(parsed) == ['base.in', 'test.in']
+    parsed.clear()
+    assert discover(pattern, DigestCache()) == expected
+    assert not parsed
+    (tmp_path / 'base.in').write_text('-r extra.in\n', encoding='utf-8')
+    (tmp_path / 'extra.in').write_text('', encoding='utf-8')
+    envs = discover(pattern, DigestCache())
+    assert sorted(parsed) == ['base.in', 'extra.in']
+    assert [env['name'] for env in envs] == ['extra', 'base', 'test']
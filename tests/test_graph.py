@@ -0,0 +1,100 @@
+"""Environment graph tests."""
+
+import random
+import sys
+
+import pytest
+
+from pipcompilemulti.graph import EnvGraph
+from pipcompilemulti.utils import recursive_refs, reference_cluster
+
+
+def _random_dag(size, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            'in_path': 'env%d.in' % index,
+            'refs': {'env%d.in' % ref for ref in rng.sample(range(index), min(index, 3))},
+        }
+        for index in range(size)
+    ]
+
+
+def _diamond_ladder(levels):
+    """Each level has two environments referencing both of the previous level."""
+    envs = [{'in_path': 'a0.in', 'refs': set()}, {'in_path': 'b0.in', 'refs': set()}]
+    for level in range(1, levels):
+        refs = {'a%d.in' % (level - 1), 'b%d.in' % (level - 1)}
+        envs.append({'in_path': 'a%d.in' % level, 'refs': refs})
+        envs.append({'in_path': 'b%d.in' % level, 'refs': set(refs)})
+    return envs
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_closures_match_recursive_refs(seed):
+    """Ancestors and descendants agree with recursive traversal."""
+    envs = _random_dag(40, seed)
+    graph = EnvGraph(envs)
+    for env in envs:
+        ancestors = recursive_refs(envs, env['in_path'])
+        assert graph.ancestors(env['in_path']) == ancestors
+        for ref in ancestors:
+            assert env['in_path'] in graph.descendants(ref)
+
+
+def test_diamond_ladder():
+    """Deep diamond-shaped graph doesn't blow up."""
+    envs = _diamond_ladder(500)
+    graph = EnvGraph(envs)
+    assert len(graph.ancestors('a499.in')) == 998
+    assert len(graph.descendants('b0.in')) == 998
+    assert graph.sink() is None
+    assert len(graph.cluster('a0.in')) == 1000
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Path separators differ under Windows")
+def test_relative_references():
+    """References are resolved relative to referencing file."""
+    graph = EnvGraph([
+        {'in_path': 'base.in', 'refs': set()},
+        {'in_path': 'sub/test.in', 'refs': {'../base.in'}},
+        {'in_path': 'local.in', 'refs': {'sub/test.in'}},
+    ])
+    assert graph.ancestors('local.in') == {'base.in', 'sub/test.in'}
+    assert graph.references('local.in') == {'sub/test.in'}
+    assert graph.sink() == 'local.in'
+
+
+def test_cluster():
+    """Cluster includes environments sharing references."""
+    graph = EnvGraph([
+        {'in_path': 'base', 'refs': set()},
+        {'in_path': 'test', 'refs': {'base'}},
+        {'in_path': 'docs', 'refs': {'base'}},
+        {'in_path': 'other', 'refs': set()},
+    ])
+    assert graph.cluster('test') == {'base', 'test', 'docs'}
+    assert graph.cluster('other') == {'other'}
+    assert graph.cluster('missing') == {'missing'}
+
+
+def test_iterates_configurations():
+    """Graph can be used in place of configuration list."""
+    envs = _random_dag(5, 0)
+    graph = EnvGraph(envs)
+    assert list(graph) == envs
+    assert len(graph) == 5
+    assert EnvGraph.of(graph) is graph
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_clusters_match_reference_cluster(seed):
+    """Union-find clusters agree with edge scanning."""
+    # Drop some references to split graph into several clusters:
+    envs = [
+        {'in_path': env['in_path'], 'refs': {ref for ref in env['refs'] if ref < 'env2'}}
+        for env in _random_dag(30, seed)
+    ]
+    graph = EnvGraph(envs)
+    for env in envs:
+        assert graph.cluster(env['in_path']) == reference_cluster(envs, env['in_path'])
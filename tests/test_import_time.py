@@ -0,0 +1,53 @@
+"""Command line startup import tests."""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules that are only needed for locking:
+LOCKING_MODULES = {
+    'importlib.metadata',
+    'pipcompilemulti.actions',
+    'pipcompilemulti.scheduler',
+    'piptools',
+    'uv',
+}
+
+
+def _imported_modules(args, cwd):
+    """Return names of modules imported by ``requirements`` command with args."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'pipcompilemulti.cli_v2'] + args,
+        cwd=cwd, env=env, capture_output=True, text=True, check=False,
+    )
+    return [
+        line.rsplit('|', 1)[1].strip()
+        for line in result.stderr.splitlines()
+        if line.startswith('import time:') and not line.endswith('| package')
+    ]
+
+
+@pytest.mark.parametrize('args, expected, budget', [
+    (['verify', '--help'], 'pipcompilemulti.config', 200),
+    (['verify'], 'pipcompilemulti.verify', 230),
+])
+def test_verify_imports_are_bounded(tmp_path, args, expected, budget):
+    """Verification doesn't import locking machinery."""
+    (tmp_path / 'requirements').mkdir()
+    (tmp_path / 'requirements.ini').write_text('[requirements]\n')
+    modules = _imported_modules(args, str(tmp_path))
+    assert expected in modules
+    assert not LOCKING_MODULES & set(modules)
+    assert len(modules) <= budget
+
+
+def test_help_does_not_import_environment(tmp_path):
+    """Help is printed without importing environment handling."""
+    modules = _imported_modules(['verify', '--help'], str(tmp_path))
+    assert 'pipcompilemulti.environment' not in modules
+    assert 'toposort' not in modules
@@ -0,0 +1,53 @@
+"""In-process resolver tests."""
+
+import os
+import shutil
+
+import pytest
+from click.testing import CliRunner
+
+from pipcompilemulti.cli_v1 import cli
+from pipcompilemulti.resolver import InProcessPipTools
+
+
+@pytest.mark.parametrize('line, expected', [
+    ('six==1.0', False),
+    ('-r base.in', False),
+    ('    --hash=sha256:abc', False),
+    ('--find-links ./wheels', True),
+    ('-i https://mirror/simple', True),
+])
+def test_uses_pip_options(tmp_path, line, expected):
+    """Only lines changing pip configuration prevent repository sharing."""
+    path = tmp_path / 'base.in'
+    path.write_text('# comment\n' + line + '\n', encoding='utf-8')
+    assert InProcessPipTools.uses_pip_options([str(path)]) is expected
+
+
+def _read_tree(root):
+    return {
+        os.path.relpath(os.path.join(dirpath, name), root): open(
+            os.path.join(dirpath, name), encoding='utf-8').read()
+        for dirpath, _, names in os.walk(root)
+        for name in names
+        if name.endswith('.txt')
+    }
+
+
+def test_same_output_as_subprocess(tmp_path):
+    """In-process and subprocess resolvers generate identical files."""
+    trees = {}
+    for mode in ['--no-in-process', '--in-process']:
+        directory = tmp_path / mode
+        shutil.copytree('nested', directory)
+        result = CliRunner().invoke(
+            cli,
+            ['--directory', str(directory), '--no-upgrade', '--no-lock-cache', mode],
+            catch_exceptions=False,
+        )
+        assert result.exit_code == 0
+        trees[mode] = {
+            name: content.replace(str(directory), 'ROOT')
+            for name, content in _read_tree(directory).items()
+        }
+    assert trees['--in-process'] == trees['--no-in-process']
@@ -0,0 +1,104 @@
+"""Lock cache tests."""
+
+import os
+from unittest import mock
+
+import pytest
+
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+@pytest.fixture(autouse=True)
+def cache_home(tmp_path, monkeypatch):
+    """Isolate cache directory and work in temporary directory."""
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.'})
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    (tmp_path / 'base.txt').write_text('six==1.0\n', encoding='utf-8')
+    FEATURES.on_discover([{'in_path': 'base.in', 'refs': set()}])
+    return tmp_path / 'cache'
+
+
+def test_cache_hit_skips_resolver():
+    """Unchanged inputs restore saved content without running pip-compile."""
+    env = Environment('base.in')
+    key = env._lock_cache_key()  # pylint: disable=protected-access
+    assert key
+    FEATURES.lock_cache.save([key], 'six==1.0\n    # via -r base.in\n', {'six': '1.0'})
+    with mock.patch('subprocess.Popen', side_effect=AssertionError):
+        env.create_lockfile()
+    env.save()
+    with open('base.txt', encoding='utf-8') as fp:
+        assert fp.read() == 'six==1.0\n    # via -r base.in\n'
+    assert env.packages == {'six': '1.0'}
+
+
+def test_key_depends_on_input():
+    """Changing requirements invalidates the key."""
+    env = Environment('base.in')
+    key = env._lock_cache_key()  # pylint: disable=protected-access
+    with open('base.in', 'at', encoding='utf-8') as fp:
+        fp.write('click\n')
+    assert env._lock_cache_key() != key  # pylint: disable=protected-access
+
+
+def test_key_ignores_header_and_comments():
+    """Rewriting header of the output file keeps the key."""
+    env = Environment('base.in')
+    key = env._lock_cache_key()  # pylint: disable=protected-access
+    with open('base.txt', 'wt', encoding='utf-8') as fp:
+        fp.write('# SHA1:123\n#\nsix==1.0\n    # via -r base.in\n')
+    assert env._lock_cache_key() == key  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize('name, value', [
+    ('compatible_patterns', ['six']),
+    ('forbid_post', ['base.in']),
+    ('skip_constraints', False),
+])
+def test_key_depends_on_post_processing(name, value, monkeypatch):
+    """Options applied to resolver output invalidate the key."""
+    env = Environment('base.in')
+    key = env._lock_cache_key()  # pylint: disable=protected-access
+    monkeypatch.setitem(OPTIONS, name, value)
+    assert env._lock_cache_key() != key  # pylint: disable=protected-access
+
+
+@pytest.mark.parametrize('options', [
+    {'upgrade': True},
+    {'upgrade_packages': ['six']},
+    {'lock_cache': False},
+])
+def test_disabled(options):
+    """Cache is not used for upgrades or when explicitly disabled."""
+    OPTIONS.update(options)
+    assert Environment('base.in')._lock_cache_key() is None  # pylint: disable=protected-access
+
+
+def test_editable_requirements_are_not_cached():
+    """Local packages can change without changes in requirements files."""
+    with open('base.in', 'at', encoding='utf-8') as fp:
+        fp.write('-e .\n')
+    assert Environment('base.in')._lock_cache_key() is None  # pylint: disable=protected-access
+
+
+def test_evicts_least_recently_used():
+    """Oldest entries are removed when cache grows above the limit."""
+    directory = FEATURES.lock_cache.directory
+    for index in range(5):
+        FEATURES.lock_cache.save(['key%d' % index], 'x' * 30, {})
+        os.utime(os.path.join(directory, 'key%d.json' % index), ns=(index, index))
+    entry_size = os.path.getsize(os.path.join(directory, 'key0.json'))
+    with mock.patch.object(type(FEATURES.lock_cache), 'MAX_SIZE', 2 * entry_size):
+        FEATURES.lock_cache.evict()
+    assert sorted(os.listdir(directory)) == ['key3.json', 'key4.json']
+
+
+def test_unwritable_cache_is_skipped(monkeypatch):
+    """Locking goes on when cache directory can't be written."""
+    monkeypatch.setenv('XDG_CACHE_HOME', os.path.join('base.in', 'cache'))
+    FEATURES.lock_cache.save(['key'], 'six==1.0\n', {'six': '1.0'})
+    assert FEATURES.lock_cache.load('key') is None
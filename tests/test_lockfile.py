@@ -0,0 +1,32 @@
+"""Lockfile model tests."""
+
+import os
+
+from pipcompilemulti.lockfile import LockFile
+
+
+def test_parse_serialize_roundtrip():
+    """Unmodified lockfile is written back as it was read."""
+    text = (
+        '# SHA1:123\n'
+        '#\n'
+        '# This file is autogenerated by pip-compile-multi\n'
+        '#\n'
+        '-r base.txt\n'
+        'six==1.0\n'
+        '    # via -r test.in\n'
+    )
+    assert LockFile.parse(text.splitlines(True)).serialize() == text
+
+
+def test_write_replaces_file_keeping_mode(tmp_path):
+    """File is replaced in one step, without leftovers, with the same permissions."""
+    path = tmp_path / 'base.txt'
+    path.write_text('old\n', encoding='utf-8')
+    os.chmod(path, 0o640)
+    LockFile(header='# header\n', references=['other.txt'], sections=['six==1.0']).write(
+        str(path)
+    )
+    assert path.read_text(encoding='utf-8') == '# header\n-r other.txt\nsix==1.0\n'
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ['base.txt']
@@ -0,0 +1,105 @@
+"""Memory-aware limiter tests."""
+
+import threading
+
+from pipcompilemulti.memory import MIB, MemoryLimiter, ProcMemory
+from pipcompilemulti.scheduler import run_topologically
+
+
+class FakeMemory:
+    """Memory readings set by test."""
+
+    def __init__(self, available):
+        self.free = available
+        self.sizes = {}
+
+    def available(self):
+        """Return available memory."""
+        return self.free
+
+    def rss(self, pid):
+        """Return resident set size of process."""
+        return self.sizes.get(pid)
+
+    def pids(self):
+        """Return running processes."""
+        return list(self.sizes)
+
+
+def make_limiter(memory):
+    """Return limiter without reserve and with 1 GiB initial estimate."""
+    return MemoryLimiter(memory.pids, memory, reserve=0, initial_estimate=1024 * MIB)
+
+
+def test_new_resolvers_fit_in_headroom():
+    """Running resolvers are expected to grow up to estimate."""
+    memory = FakeMemory(available=3 * 1024 * MIB)
+    limiter = make_limiter(memory)
+    assert limiter.slots(running=0) == 3
+    memory.sizes = {1: 256 * MIB}
+    memory.free = 2 * 1024 * MIB
+    assert limiter.slots(running=1) == 1
+    assert limiter.slots(running=2) == 0
+
+
+def test_estimate_is_learned_from_finished_resolvers():
+    """Peak RSS of finished resolver replaces initial estimate."""
+    memory = FakeMemory(available=2 * 1024 * MIB)
+    limiter = make_limiter(memory)
+    memory.sizes = {1: 128 * MIB}
+    limiter.slots(running=1)
+    memory.sizes = {1: 512 * MIB}
+    limiter.slots(running=1)
+    memory.sizes = {}
+    assert limiter.estimate() == 1024 * MIB
+    assert limiter.slots(running=0) == 4
+    assert limiter.estimate() == 512 * MIB
+
+
+def test_one_resolver_always_runs():
+    """Locking makes progress even when memory is short."""
+    limiter = make_limiter(FakeMemory(available=100 * MIB))
+    assert limiter.slots(running=0) == 1
+    assert limiter.slots(running=1) == 0
+
+
+def test_unknown_memory_is_not_limited(tmp_path):
+    """Without /proc jobs are limited only by --jobs."""
+    memory = ProcMemory(str(tmp_path))
+    assert memory.available() is None
+    assert memory.rss(1) is None
+    assert MemoryLimiter(list, memory).slots(running=5) > 5
+
+
+def test_proc_memory_is_parsed(tmp_path):
+    """Readings are converted from kB to bytes."""
+    (tmp_path / 'meminfo').write_text(
+        'MemTotal:       16384000 kB\nMemAvailable:    2048000 kB\n',
+        encoding='utf-8',
+    )
+    (tmp_path / '42').mkdir()
+    (tmp_path / '42' / 'status').write_text('Name:\tpython\nVmRSS:\t  1000 kB\n', encoding='utf-8')
+    memory = ProcMemory(str(tmp_path))
+    assert memory.available() == 2048000 * 1024
+    assert memory.rss(42) == 1000 * 1024
+
+
+def test_scheduler_respects_limiter():
+    """No more callbacks run at once than limiter admits."""
+    lock = threading.Lock()
+    state = {'running': 0, 'peak': 0}
+
+    def callback(_):
+        with lock:
+            state['running'] += 1
+            state['peak'] = max(state['peak'], state['running'])
+        threading.Event().wait(0.05)
+        with lock:
+            state['running'] -= 1
+
+    envs = [{'in_path': name, 'refs': set()} for name in 'abcdef']
+    run_topologically(envs, callback, jobs=4, limiter=make_limiter(FakeMemory(2048 * MIB)))
+    assert state['peak'] == 2
+    state['peak'] = 0
+    run_topologically(envs, callback, jobs=4, limiter=make_limiter(FakeMemory(100 * MIB)))
+    assert state['peak'] == 1
@@ -0,0 +1,81 @@
+"""Preflight conflict check tests."""
+
+import pytest
+
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+ENV_CONFS = [
+    {'in_path': 'base.in', 'refs': set()},
+    {'in_path': 'test.in', 'refs': {'base.in'}},
+    {'in_path': 'local.in', 'refs': {'test.in'}},
+]
+
+
+@pytest.fixture(name='write')
+def write_fixture(tmp_path, monkeypatch):
+    """Return function writing files in temporary working directory."""
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.'})
+    (tmp_path / 'local.in').write_text('-r test.in\n', encoding='utf-8')
+
+    def write(name, content):
+        (tmp_path / name).write_text(content, encoding='utf-8')
+    return write
+
+
+def test_conflicting_specifiers_are_reported_once(write):
+    """Conflict is reported for the environment where it appears."""
+    write('base.in', 'six<1.10\nclick\n')
+    write('test.in', '-r base.in\nsix>=1.16  # comment\nclick>=7\n')
+    assert FEATURES.preflight.conflicts(ENV_CONFS) == [
+        "Requirements of six in test.in can't be satisfied together: "
+        "six>=1.16 (test.in), six<1.10 (base.in)",
+    ]
+
+
+def test_constraint_files_are_checked(write):
+    """Specifiers of included constraint files take part in the check."""
+    write('constraints.txt', 'six==1.0\n')
+    write('base.in', '-c constraints.txt\nsix\n')
+    write('test.in', '-r base.in\nsix>1.0\n')
+    errors = FEATURES.preflight.conflicts(ENV_CONFS)
+    assert len(errors) == 1
+    assert 'six==1.0 (constraints.txt)' in errors[0]
+
+
+def test_markers_are_skipped(write):
+    """Requirements with markers may never be installed together."""
+    write('base.in', 'six<1.10 ; python_version < "3"\n')
+    write('test.in', '-r base.in\nsix>=1.16\n')
+    assert not FEATURES.preflight.conflicts(ENV_CONFS)
+
+
+@pytest.mark.parametrize('options, expected', [
+    ({}, [
+        "six is locked to 1.15.0 in base.txt, but test.in requires six>=1.16. "
+        "Upgrade it with --upgrade-package six",
+    ]),
+    ({'upgrade_packages': ['six']}, []),
+    ({'upgrade': True}, []),
+])
+def test_locked_versions_of_references_are_checked(write, options, expected):
+    """Version locked in referenced environment must satisfy requirements."""
+    write('base.in', 'six\n')
+    write('base.txt', 'six==1.15.0\n    # via -r base.in\n')
+    write('test.in', '-r base.in\nsix>=1.16\n')
+    OPTIONS.update(options)
+    try:
+        assert FEATURES.preflight.conflicts(ENV_CONFS) == expected
+    finally:
+        OPTIONS.pop('upgrade_packages', None)
+
+
+def test_check_raises_with_all_conflicts(write, caplog):
+    """All conflicts are logged before failing."""
+    write('base.in', 'six<1.10\nclick<7\n')
+    write('test.in', '-r base.in\nsix>=1.16\nclick>=8\n')
+    with pytest.raises(RuntimeError, match='Found 2 conflicting requirements'):
+        FEATURES.preflight.check(ENV_CONFS)
+    assert sum('satisfied together' in message for message in caplog.messages) == 2
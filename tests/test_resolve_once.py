@@ -0,0 +1,112 @@
+"""Deriving lockfiles from sink output tests."""
+
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.features.resolve_once import SinkGraph
+from pipcompilemulti.lockfile import LockFile
+from pipcompilemulti.options import OPTIONS
+
+
+SINK = """\
+--extra-index-url https://example.com/simple
+
+certifi==2026.7.22
+    # via requests
+click==8.1.0
+    # via -r requirements/local.in
+idna==3.20
+    # via
+    #   -r requirements/test.in
+    #   requests
+pysocks==1.7.1
+    # via requests
+requests[socks]==2.34.2
+    # via
+    #   -r requirements/local.in
+    #   -r requirements/test.in
+six @ https://example.com/six-1.17.0-py3-none-any.whl
+    # via -r requirements/base.in
+zope-interface==6.0
+    # via -r requirements/../requirements/base.in
+
+# The following packages are considered to be unsafe in a requirements file:
+# setuptools
+"""
+
+
+def _slice(*in_paths):
+    graph = SinkGraph(LockFile.parse(SINK.splitlines(True)))
+    return graph.slice(in_paths).serialize()
+
+
+def test_environment_gets_closure_of_its_requirements():
+    """Dependencies are followed through extras, and other environments are left out."""
+    assert _slice('requirements/test.in', 'requirements/base.in') == """\
+--extra-index-url https://example.com/simple
+
+certifi==2026.7.22
+    # via requests
+idna==3.20
+    # via
+    #   -r requirements/test.in
+    #   requests
+pysocks==1.7.1
+    # via requests
+requests[socks]==2.34.2
+    # via -r requirements/test.in
+six @ https://example.com/six-1.17.0-py3-none-any.whl
+    # via -r requirements/base.in
+zope-interface==6.0
+    # via -r requirements/../requirements/base.in
+
+# The following packages are considered to be unsafe in a requirements file:
+# setuptools
+"""
+
+
+def test_sink_gets_everything():
+    """Sink slice is the same as sink output."""
+    assert _slice(
+        'requirements/local.in', 'requirements/test.in', 'requirements/base.in',
+    ) == SINK
+
+
+def test_no_sink_output_means_resolving():
+    """Environments are resolved normally until sink output is known."""
+    OPTIONS.update({'autoresolve': True, 'resolve_once': True})
+    try:
+        FEATURES.autoresolve.on_discover([
+            {'in_path': 'base.in', 'refs': set()},
+            {'in_path': 'local.in', 'refs': {'base.in'}},
+        ])
+        FEATURES.resolve_once.reset()
+        assert FEATURES.resolve_once.lockfile_for('base.in', []) is None
+        FEATURES.resolve_once.on_sink_locked('local.in', LockFile(sections=[
+            'six==1.0\n    # via -r base.in',
+        ]))
+        derived = FEATURES.resolve_once.lockfile_for('base.in', [])
+        assert derived.sections == ['six==1.0\n    # via -r base.in']
+    finally:
+        FEATURES.resolve_once.reset()
+        OPTIONS.pop('autoresolve')
+        OPTIONS.pop('resolve_once')
+
+
+def test_unpinned_entries_are_sliced_by_via():
+    """Compatible pins and editable requirements stay in their environments."""
+    graph = SinkGraph(LockFile(sections=[
+        '--index-url https://pypi.org/simple',
+        'internal~=1.2\n    # via -r a.in',
+        '-e ./localpkg\n    # via -r a.in',
+        'attrs==23.1\n    # via localpkg',
+        'six==1.0\n    # via -r b.in',
+    ]))
+    assert graph.slice(['b.in']).sections == [
+        '--index-url https://pypi.org/simple',
+        'six==1.0\n    # via -r b.in',
+    ]
+    assert graph.slice(['a.in']).sections == [
+        '--index-url https://pypi.org/simple',
+        'internal~=1.2\n    # via -r a.in',
+        '-e ./localpkg\n    # via -r a.in',
+        'attrs==23.1\n    # via localpkg',
+    ]
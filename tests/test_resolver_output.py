@@ -0,0 +1,46 @@
+"""Resolver output capture tests."""
+
+import sys
+
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+from pipcompilemulti.resolver import OutputTail, run_subprocess
+
+
+SCRIPT = (
+    "import sys\n"
+    "for i in range(5000):\n"
+    "    print('line', i)\n"
+    "sys.stderr.write('failed')\n"
+    "sys.exit(2)\n"
+)
+
+
+def test_output_is_bounded_and_logged(tmp_path):
+    """Only the tail of output is kept in memory, and all of it goes to log file."""
+    log_path = str(tmp_path / 'logs' / 'base.log')
+    result = run_subprocess([sys.executable, '-c', SCRIPT], log_path)
+    assert result.returncode == 2
+    lines = result.stdout.decode().splitlines()
+    assert len(lines) == OutputTail.MAX_LINES + 1
+    assert lines[0] == '[{0} earlier lines omitted]'.format(5000 - OutputTail.MAX_LINES)
+    assert lines[-1] == 'line 4999'
+    assert result.stderr == b'failed'
+    with open(log_path, 'rb') as fp:
+        log = fp.read()
+    assert log.count(b'\n') == 5000
+    assert log.endswith(b'failed')
+
+
+def test_log_path_of_environment(tmp_path):
+    """Each environment is logged to its own file."""
+    OPTIONS[FEATURES.log_dir.OPTION_NAME] = str(tmp_path)
+    try:
+        paths = {
+            FEATURES.log_dir.log_path(in_path)
+            for in_path in ['requirements/base.in', 'requirements/test.in', 'base.in']
+        }
+    finally:
+        del OPTIONS[FEATURES.log_dir.OPTION_NAME]
+    assert len(paths) == 3
+    assert all(path.startswith(str(tmp_path)) for path in paths)
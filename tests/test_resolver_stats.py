@@ -0,0 +1,53 @@
+"""Resolver resource usage tests."""
+
+import json
+import logging
+import sys
+
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+from pipcompilemulti.resolver import ResourceUsage, run_subprocess
+
+
+SCRIPT = (
+    "import sys; sys.stdout.write('out' * 100000); sys.stderr.write('err'); "
+    "sum(range(10 ** 6)); sys.exit(3)"
+)
+
+
+def test_subprocess_usage_is_measured():
+    """Exit code and output are kept, and resource usage is added."""
+    result = run_subprocess([sys.executable, '-c', SCRIPT])
+    assert result.returncode == 3
+    assert result.stdout == b'out' * 100000
+    assert result.stderr == b'err'
+    assert result.usage.wall > 0
+    if result.usage.user is not None:
+        assert result.usage.user + result.usage.system > 0
+        assert result.usage.max_rss > 2 ** 20
+
+
+def test_live_output_usage_is_measured():
+    """Process without pipes is measured too."""
+    OPTIONS['live'] = True
+    result = run_subprocess([sys.executable, '-c', 'pass'])
+    assert result.returncode == 0
+    assert result.stdout is None
+    assert result.usage.wall > 0
+
+
+def test_report_logs_table_and_writes_json(tmp_path, caplog):
+    """Summary is logged once per run and JSON has all runs."""
+    OPTIONS['stats_json'] = str(tmp_path / 'stats.json')
+    FEATURES.resolver_stats.record('base.in', ResourceUsage(2.0, 1.0, 0.5, 2 ** 20))
+    with caplog.at_level(logging.INFO, logger='pip-compile-multi'):
+        FEATURES.resolver_stats.report()
+        FEATURES.resolver_stats.report()
+    assert caplog.text.count('Resolver resource usage') == 1
+    with open(tmp_path / 'stats.json', encoding='utf-8') as fp:
+        runs = json.load(fp)['resolver_runs']
+    assert runs[-1] == {
+        'env': 'base.in', 'section': None,
+        'wall': 2.0, 'user': 1.0, 'system': 0.5, 'max_rss': 2 ** 20,
+        'retries': 0, 'timeouts': 0,
+    }
@@ -0,0 +1,81 @@
+"""Resume tests."""
+
+import os
+
+import pytest
+
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+
+
+@pytest.fixture(autouse=True)
+def locked_tree(tmp_path, monkeypatch):
+    """Locked base environment in temporary directory with isolated journal."""
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    (tmp_path / 'base.txt').write_text('six==1.0\n    # via -r base.in\n', encoding='utf-8')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.', 'lock_cache': False})
+    FEATURES.on_discover([{'in_path': 'base.in', 'refs': set()}])
+    yield
+    FEATURES.resume.finish()
+    OPTIONS.pop('resume', None)
+    OPTIONS.pop('lock_cache')
+
+
+def interrupted_run():
+    """Start journal and record base environment as completed."""
+    OPTIONS['resume'] = True
+    FEATURES.resume.start()
+    env = Environment('base.in')
+    env.fix_lockfile()
+    env.save()
+
+
+def test_completed_environment_is_kept():
+    """Environment completed by interrupted run is not locked again."""
+    interrupted_run()
+    OPTIONS['resume'] = True
+    FEATURES.resume.start()
+    env = Environment('base.in')
+    assert not env.maybe_create_lockfile()
+    assert env.packages == {'six': '1.0'}
+
+
+@pytest.mark.parametrize('resume, change', [
+    (False, None),
+    (True, 'base.in'),
+    (True, 'base.txt'),
+])
+def test_environment_is_locked_again(resume, change):
+    """Journal is not used without resume flag, or when inputs or output changed."""
+    interrupted_run()
+    if change:
+        with open(change, 'at', encoding='utf-8') as fp:
+            fp.write('click\n')
+    OPTIONS['resume'] = resume
+    FEATURES.resume.start()
+    assert not FEATURES.resume.completed('base.in', Environment('base.in').inputs_digest)
+
+
+def test_journal_is_removed_after_successful_run():
+    """Next run starts from scratch after success."""
+    interrupted_run()
+    assert os.path.exists(FEATURES.resume.path)
+    FEATURES.resume.finish()
+    assert not os.path.exists(FEATURES.resume.path)
+
+
+def test_journal_is_not_kept_without_resume():
+    """Runs without the flag don't write journal or compute digests."""
+    FEATURES.resume.start()
+    FEATURES.resume.record('base.in', lambda: pytest.fail('digest computed'))
+    assert not os.path.exists(FEATURES.resume.path)
+
+
+def test_unwritable_journal_is_skipped(monkeypatch):
+    """Run goes on without journal when cache directory can't be written."""
+    monkeypatch.setenv('XDG_CACHE_HOME', os.path.join('base.in', 'cache'))
+    interrupted_run()
+    assert not FEATURES.resume.completed('base.in', Environment('base.in').inputs_digest)
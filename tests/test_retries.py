@@ -0,0 +1,84 @@
+"""Resolver timeout and retries tests."""
+
+import os
+import sys
+import time
+
+import pytest
+
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+from pipcompilemulti.resolver import ResolverResult, ResourceUsage, run_subprocess
+
+
+@pytest.fixture(name='sleeps')
+def sleeps_fixture(tmp_path, monkeypatch):
+    """Environment in temporary directory with recorded backoff delays."""
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.', 'lock_cache': False, 'retries': '3'})
+    FEATURES.on_discover([{'in_path': 'base.in', 'refs': set()}])
+    sleeps = []
+    monkeypatch.setattr('pipcompilemulti.environment.RUNNING.sleep', sleeps.append)
+    yield sleeps
+    OPTIONS.pop('retries')
+    OPTIONS.pop('lock_cache')
+
+
+def fake_resolver(monkeypatch, results):
+    """Make resolver return results one by one."""
+    results = iter(results)
+
+    def resolve(command, log_path=None, timeout=None, attempt=1):
+        del command, log_path, timeout, attempt
+        return next(results)
+    monkeypatch.setattr('pipcompilemulti.environment.run_subprocess', resolve)
+
+
+def test_slow_resolver_is_killed():
+    """Process running longer than timeout is stopped."""
+    started = time.perf_counter()
+    result = run_subprocess([sys.executable, '-c', 'import time; time.sleep(30)'], timeout=0.2)
+    assert time.perf_counter() - started < 10
+    assert result.timed_out
+    assert result.returncode != 0
+
+
+def test_transient_failures_are_retried_with_backoff(sleeps, monkeypatch):
+    """Network errors and timeouts are retried until retries run out."""
+    usage = ResourceUsage(1.0, None, None, None)
+    fake_resolver(monkeypatch, [
+        ResolverResult(1, None, b'ReadTimeoutError', usage),
+        ResolverResult(-9, None, None, usage, True),
+        ResolverResult(1, None, b'HTTP error 503 while getting', usage),
+        ResolverResult(1, None, b'Connection reset by peer', usage),
+    ])
+    with pytest.raises(RuntimeError):
+        Environment('base.in').create_lockfile()
+    assert sleeps == [2, 4, 8]
+    record = FEATURES.resolver_stats.records()[-1]
+    assert (record['wall'], record['retries'], record['timeouts']) == (4.0, 3, 1)
+
+
+def test_resolution_errors_are_not_retried(sleeps, monkeypatch):
+    """Conflicts fail at once."""
+    fake_resolver(monkeypatch, [
+        ResolverResult(1, None, b'ConnectionError\nResolutionImpossible', None),
+    ])
+    with pytest.raises(RuntimeError):
+        Environment('base.in').create_lockfile()
+    assert not sleeps
+
+
+def test_log_keeps_output_of_every_attempt(tmp_path):
+    """Retry appends to the log written by the failed run."""
+    log_path = str(tmp_path / 'base.log')
+    for attempt, message in [(1, 'first'), (2, 'second')]:
+        run_subprocess([sys.executable, '-c', 'print({0!r})'.format(message)], log_path,
+                       attempt=attempt)
+    with open(log_path, 'rt', encoding='utf-8') as fp:
+        output = fp.read()
+    assert output.index('first') < output.index('Attempt 2') < output.index('second')
+    run_subprocess([sys.executable, '-c', 'pass'], log_path)
+    assert os.path.getsize(log_path) == 0
@@ -0,0 +1,85 @@
+"""Parallel scheduler tests."""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from pipcompilemulti.resolver import RUNNING, ResolverCancelled, run_subprocess
+from pipcompilemulti.scheduler import run_topologically
+
+
+ENVS = [
+    {'in_path': 'base.in', 'refs': set()},
+    {'in_path': 'docs.in', 'refs': set()},
+    {'in_path': 'test.in', 'refs': {'base.in'}},
+    {'in_path': 'local.in', 'refs': {'test.in', 'docs.in'}},
+]
+
+
+@pytest.mark.parametrize('jobs', [1, 2, 8])
+def test_references_are_done_before_environment(jobs):
+    """Environment starts only after all its references finished."""
+    finished, lock = [], threading.Lock()
+
+    def callback(conf):
+        with lock:
+            for ref in conf['refs']:
+                assert ref in finished
+            finished.append(conf['in_path'])
+
+    run_topologically(ENVS, callback, jobs=jobs)
+    assert sorted(finished) == ['base.in', 'docs.in', 'local.in', 'test.in']
+
+
+def test_independent_environments_run_concurrently():
+    """Two environments without references are compiled at the same time."""
+    barrier = threading.Barrier(2, timeout=5)
+    run_topologically(ENVS[:2], lambda conf: barrier.wait(), jobs=2)
+
+
+def test_failure_stops_scheduling():
+    """Dependents of failed environment are never started."""
+    started = []
+
+    def callback(conf):
+        started.append(conf['in_path'])
+        if conf['in_path'] == 'base.in':
+            raise RuntimeError("Failed to pip-compile base.in")
+
+    with pytest.raises(RuntimeError, match='base.in'):
+        run_topologically(ENVS, callback, jobs=2)
+    assert 'test.in' not in started
+    assert 'local.in' not in started
+
+
+def test_failure_stops_running_resolvers():
+    """Resolver of sibling environment is terminated when one environment fails."""
+    started = threading.Event()
+
+    def callback(conf):
+        if conf['in_path'] == 'base.in':
+            started.wait(5)
+            raise RuntimeError("Failed to pip-compile base.in")
+        started.set()
+        run_subprocess([sys.executable, '-c', 'import time; time.sleep(60)'])
+
+    begin = time.monotonic()
+    try:
+        with pytest.raises(RuntimeError, match='base.in'):
+            run_topologically(ENVS[:2], callback, jobs=2, on_failure=RUNNING.cancel)
+    finally:
+        RUNNING.reset()
+    assert time.monotonic() - begin < 30
+
+
+def test_cancelled_resolver_is_not_started():
+    """Resolver started after cancellation exits immediately."""
+    RUNNING.cancel()
+    try:
+        with pytest.raises(ResolverCancelled):
+            run_subprocess([sys.executable, '-c', 'import time; time.sleep(60)'])
+    finally:
+        RUNNING.reset()
+    assert run_subprocess([sys.executable, '-c', 'pass']).returncode == 0
@@ -0,0 +1,73 @@
+"""Seed constraints tests."""
+
+from unittest import mock
+
+import pytest
+
+from pipcompilemulti.deduplicate import PackageDeduplicator
+from pipcompilemulti.environment import Environment
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.options import OPTIONS
+from pipcompilemulti.resolver import ResolverResult
+
+
+def resolve_capturing(commands):
+    """Return resolver stub that saves command and constraint files contents."""
+    def resolve(command, log_path=None, timeout=None, attempt=1):
+        del log_path, timeout, attempt
+        constraints = []
+        for index, argument in enumerate(command):
+            if argument == '--constraint':
+                with open(command[index + 1], encoding='utf-8') as fp:
+                    constraints.append(fp.read())
+        commands.append((command, constraints))
+        return ResolverResult(1, None, b'failed', None)
+    return resolve
+
+
+@pytest.fixture(name='deduplicator')
+def deduplicator_fixture(tmp_path, monkeypatch):
+    """Deduplicator with locked base environment referenced by test environment."""
+    (tmp_path / 'base.in').write_text('six\n', encoding='utf-8')
+    (tmp_path / 'test.in').write_text('-r base.in\npytest\n', encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    OPTIONS.update({'upgrade': False, 'directory': '.', 'lock_cache': False})
+    env_confs = [
+        {'in_path': 'base.in', 'refs': set()},
+        {'in_path': 'test.in', 'refs': {'base.in'}},
+    ]
+    FEATURES.on_discover(env_confs)
+    dedup = PackageDeduplicator()
+    dedup.on_discover(env_confs)
+    dedup.register_packages_for_env('base.in', {'six': '1.16.0', 'pkg': ''})
+    yield dedup
+    OPTIONS.pop('lock_cache')
+
+
+@pytest.mark.parametrize('enabled, expected', [
+    (True, ['six==1.16.0\n']),
+    (False, []),
+])
+def test_referenced_versions_are_passed_as_constraints(deduplicator, tmp_path, enabled, expected):
+    """Resolver gets versions of referenced environments in temporary file."""
+    OPTIONS['seed_constraints'] = enabled
+    commands = []
+    with mock.patch('pipcompilemulti.environment.run_subprocess', resolve_capturing(commands)):
+        with pytest.raises(RuntimeError):
+            Environment('test.in', deduplicator).create_lockfile()
+    del OPTIONS['seed_constraints']
+    assert len(commands) == 1
+    _, constraints = commands[0]
+    assert constraints == expected
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['base.in', 'test.in']
+
+
+def test_environment_without_references_is_not_constrained(deduplicator):
+    """Nothing to seed for environments without references."""
+    commands = []
+    with mock.patch('pipcompilemulti.environment.run_subprocess', resolve_capturing(commands)):
+        with pytest.raises(RuntimeError):
+            Environment('base.in', deduplicator).create_lockfile()
+    assert len(commands) == 1
+    command, _ = commands[0]
+    assert '--constraint' not in command
@@ -0,0 +1,132 @@
+"""Parity of lockfile section tokenizer with regular expressions it replaced."""
+
+import glob
+import random
+import re
+
+import pytest
+
+from pipcompilemulti.dependency import Dependency
+from pipcompilemulti.lockfile import concatenated, parse_sections
+
+
+RE_DEPENDENCY = re.compile(
+    r'(?iu)(?P<package>\S+)'
+    r'=='
+    r'(?P<version>\S+)'
+    r'(?P<markers>\s+;\s+.+?)?'
+    r'(?P<hashes>(?:\s*--hash=\S+)+)?'
+    r'(?P<comment>(?:\s*#.*)+)?$'
+)
+RE_VCS_DEPENDENCY = re.compile(
+    r'(?iu)(?P<editable>-e)?'
+    r'\s*'
+    r'(?P<prefix>\S+#egg=)'
+    r'(?P<package>[a-z0-9-_.]+)'
+    r'(?P<postfix>\S*)'
+    r'(?P<markers>\s+;\s+.+?)?'
+    r'(?P<comment>(?:\s*#.*)+)?$'
+)
+RE_AT_DEPENDENCY = re.compile(
+    r'(?iu)(?P<editable>-e)?'
+    r'\s*'
+    r'(?P<package>[a-z0-9-_.]+)'
+    r' @ '
+    r'(?P<url>\S+)'
+    r'(?P<markers>\s+;\s+.+?)?'
+    r'(?P<comment>(?:\s*#.*)+)?$'
+)
+
+TRICKY = [
+    'six==1.0 ',
+    'six==1.0 \n',
+    'six==1.0\n    # via pkg\n\n',
+    'six==1.0\n   ',
+    'six==1.0 ;\n   ',
+    'pkg==1#x; x --HASH=a',
+    'pkg===1 ;  x --hash=sha256:abc --hash=sha256:def  ',
+    'a==b==c ; python_version >= "3" --hash=a#b junk',
+    '#==-e --hash=--hash=# @ --',
+    '-e pkg @ file:///a ; --HASH=a  ',
+    '-editable @ u ;  ',
+    '-e#egg=foo',
+    'x#egg=a#egg= --hash=sha256:abc\n    # via pkg\n',
+    '  ; sys_platform == "darwin" --hash=x#x',
+    'git+https://g/x.git#egg=Pkg_1.x&subdirectory=a ;\n   ',
+]
+
+
+def _regex_tokens(line):
+    """Fields of Dependency as the regular expressions used to parse them."""
+    fields = {'line': line, 'is_vcs': False, 'is_at': False, 'valid': True}
+    for kind, regex in [('is_vcs', RE_VCS_DEPENDENCY), ('is_at', RE_AT_DEPENDENCY)]:
+        matched = regex.match(line)
+        if matched:
+            fields.update(_fields(matched), **{kind: True, 'version': '', 'hashes': ''})
+            return fields
+    matched = RE_DEPENDENCY.match(line)
+    if matched:
+        fields.update(
+            _fields(matched),
+            version=Dependency.RE_IGNORED_ZEROS.sub('', matched.group('version').strip()),
+            hashes=(matched.group('hashes') or '').strip(),
+        )
+        return fields
+    fields['valid'] = False
+    return fields
+
+
+def _fields(matched):
+    span = matched.span('comment')
+    if span == (-1, -1):
+        span = (matched.end(), matched.end())
+    return {
+        'package': matched.group('package'),
+        'markers': matched.group('markers') or '',
+        'comment': (matched.group('comment') or '').rstrip(),
+        'comment_span': span,
+    }
+
+
+def _lockfile_sections():
+    for path in sorted(glob.glob('requirements/*.*') + glob.glob('tests/**/*.txt', recursive=True)):
+        with open(path, encoding='utf-8') as fp:
+            yield from parse_sections(concatenated(fp))
+
+
+def _generated_sections(count):
+    rng = random.Random(0)
+    heads = [
+        'six==1.0', 'Six==1.02.03', 'a==b==c', 'pkg===1', 'x==', '==1', 'pkg==1#x',
+        '-e git+https://g/x.git@v1#egg=pkg', '-egit+x#egg=foo', 'x#egg=a#egg=',
+        'pkg @ https://x/p.zip', '-e pkg @ file:///a', 'pkg@ x', '-r base.txt', '', ' ',
+    ]
+    markers = ['', ' ; python_version >= "3"', ' ;  x', ' ; a#b', ' ; --hash=x', ' ;', ' ; x ']
+    hashes = ['', ' --hash=sha256:abc --hash=sha256:def', ' --HASH=a', ' --hash=', ' --hash=a#b']
+    comments = [
+        '', '  # via pkg', '#x', '\n    # via\n    #   pkg', '\n', '\n\n    # x', '\n  # x\n\n',
+        '\n   ', '\n  x', ' junk', '  ',
+    ]
+    for _ in range(count):
+        yield ''.join(rng.choice(part) for part in [heads, markers, hashes, comments])
+
+
+@pytest.mark.parametrize('line', TRICKY)
+def test_tricky_sections(line):
+    """Corner cases of regular expression backtracking are reproduced."""
+    assert vars(Dependency(line)) == _regex_tokens(line)
+
+
+def test_parity_with_regular_expressions():
+    """Lockfile sections are parsed the same way as with regular expressions."""
+    corpus = list(_lockfile_sections()) + list(_generated_sections(5000))
+    mismatches = [
+        line for line in corpus if vars(Dependency(line)) != _regex_tokens(line)
+    ]
+    assert not mismatches
+
+
+def test_long_invalid_section():
+    """Backtracking regular expressions take exponential time on this."""
+    line = 'six==1.0 --hash=sha256:abc # via' + ' #' * 100 + '\n    x'
+    assert not Dependency(line).valid
@@ -0,0 +1,49 @@
+"""Trace recording tests."""
+
+import json
+import threading
+
+from pipcompilemulti.features import FEATURES
+from pipcompilemulti.features.trace import Trace
+from pipcompilemulti.options import OPTIONS
+
+
+def test_disabled_trace_records_nothing(tmp_path):
+    """Without --trace spans are no-ops and no file is written."""
+    trace = Trace()
+    with trace.span('discover'):
+        pass
+    trace.save()
+    assert not trace.events()
+    assert not list(tmp_path.iterdir())
+
+
+def test_spans_are_tagged_with_section_and_thread(tmp_path):
+    """Events carry arguments, configuration section and thread of the span."""
+    OPTIONS['trace'] = str(tmp_path / 'trace.json')
+    trace = Trace()
+    trace.section = 'requirements:py3'
+
+    def compile_env():
+        with trace.span('fix_lockfile', env='base.in'):
+            pass
+
+    worker = threading.Thread(target=compile_env, name='worker')
+    worker.start()
+    worker.join()
+    trace.save()
+    with open(tmp_path / 'trace.json', encoding='utf-8') as fp:
+        events = json.load(fp)['traceEvents']
+    assert [(event['ph'], event['name']) for event in events] == [
+        ('M', 'thread_name'), ('X', 'fix_lockfile'),
+    ]
+    assert events[0]['args'] == {'name': 'worker'}
+    assert events[1]['args'] == {'env': 'base.in', 'section': 'requirements:py3'}
+    assert events[1]['tid'] == events[0]['tid'] == worker.ident
+
+
+def test_on_discover_is_traced(tmp_path):
+    """Features configuration is visible in trace."""
+    OPTIONS['trace'] = str(tmp_path / 'trace.json')
+    FEATURES.on_discover([{'in_path': 'base.in', 'refs': set()}])
+    assert FEATURES.trace.events()[-1]['name'] == 'FEATURES.on_discover'